@@ -0,0 +1,299 @@
+"""
+Local stand-in for an OpenAI-compatible chat-completions API (DeepSeek speaks the same protocol).
+
+Supports plain and streaming (SSE) responses and JSON mode, with configurable latency,
+jitter, token rate, and injected errors / 429s / malformed output, so generators and
+SmartLocator can be benchmarked offline. Prompt prefix caching is emulated the way
+DeepSeek does it (64-token blocks), so usage reports cache hits for repeated prefixes.
+
+Usage:
+    python benchmarks/fake_openai_server.py --port 8765 --latency-ms 300 --tokens-per-s 80
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8765 DEEPSEEK_API_KEY=fake python src/main.py generate --topic x --provider deepseek
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+class FakeServerConfig:
+    """
+    Behaviour of the fake server. Rates are probabilities per request (0..1).
+    """
+    def __init__(self, latency_ms: float = 200, jitter_ms: float = 50, tokens_per_s: float = 0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, malformed_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        # 0 means "infinitely fast": the whole completion is sent at once after the latency
+        self.tokens_per_s = tokens_per_s
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+
+    def as_dict(self) -> Dict:
+        return {key: value for key, value in vars(self).items() if key != "random"}
+
+
+def _post_json(topic: str) -> str:
+    return json.dumps({
+        "title": f"✨{topic[:12]}小技巧",
+        "content": f"关于{topic}的分享 🌟\n\n第一段内容。\n\n第二段内容。\n\n#分享 #生活 #{topic[:6]}",
+        "image_prompt": f"A bright minimal illustration of {topic}",
+    }, ensure_ascii=False)
+
+
+def _locator_answer(prompt: str) -> str:
+    """Picks the element id whose line contains the quoted text from the description."""
+    lines = re.findall(r"\[(e[0-9a-f]{6})\]([^\n]*)", prompt)
+    description = re.search(r'described as: "(.*?)"', prompt, re.DOTALL)
+    wanted = re.findall(r"'(.+?)'", description.group(1)) if description else []
+    for node_id, line in lines:
+        if any(text in line for text in wanted):
+            return node_id
+    return lines[0][0] if lines else "button"
+
+
+def _tokens(text: str) -> List[str]:
+    # Rough tokenizer: one token per CJK char, per word, or per punctuation mark
+    return re.findall(r"[\u4e00-\u9fff]|\w+|\s+|[^\w\s]", text)
+
+
+CACHE_BLOCK_TOKENS = 64
+
+
+def _cached_prefix_tokens(server, tokens: List[str]) -> int:
+    """Length of the longest 64-token-aligned prefix seen before; remembers this prompt's prefixes."""
+    digest = hashlib.sha256()
+    cached = 0
+    with server.stats_lock:
+        for end in range(CACHE_BLOCK_TOKENS, len(tokens) + 1, CACHE_BLOCK_TOKENS):
+            digest.update("".join(tokens[end - CACHE_BLOCK_TOKENS:end]).encode("utf-8"))
+            key = digest.hexdigest()
+            if key in server.prefix_cache:
+                cached = end
+            server.prefix_cache.add(key)
+    return cached
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    server_version = "FakeOpenAI/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+    @property
+    def config(self) -> FakeServerConfig:
+        return self.server.config
+
+    def _count(self, key: str):
+        with self.server.stats_lock:
+            self.server.stats[key] = self.server.stats.get(key, 0) + 1
+
+    def _send_json(self, status: int, body: Dict, headers: Optional[Dict] = None):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/") == "/stats":
+            with self.server.stats_lock:
+                self._send_json(200, dict(self.server.stats))
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        self._count("requests")
+        rng = self.config.random
+
+        delay = max(0.0, self.config.latency_ms + rng.uniform(-1, 1) * self.config.jitter_ms) / 1000
+        time.sleep(delay)
+
+        roll = rng.random()
+        if roll < self.config.rate_limit_rate:
+            self._count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, {
+                "Retry-After": "1",
+                "x-ratelimit-remaining-requests": "0",
+                "x-ratelimit-reset-requests": "1s",
+            })
+            return
+        if roll < self.config.rate_limit_rate + self.config.error_rate:
+            self._count("errors")
+            self._send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+            return
+
+        messages = request.get("messages", [])
+        prompt = "\n".join(m.get("content", "") for m in messages if isinstance(m.get("content"), str))
+        if "element id" in prompt or re.search(r"\[e[0-9a-f]{6}\]", prompt):
+            text = _locator_answer(prompt)
+        else:
+            topic = re.search(r'post about "(.*?)"', prompt)
+            text = _post_json(topic.group(1) if topic else "topic")
+        if rng.random() < self.config.malformed_rate:
+            self._count("malformed")
+            text = text[: len(text) // 2]
+
+        prompt_token_list = _tokens(prompt)
+        prompt_tokens = len(prompt_token_list)
+        cached_tokens = _cached_prefix_tokens(self.server, prompt_token_list)
+        completion_tokens = _tokens(text)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(completion_tokens),
+            "total_tokens": prompt_tokens + len(completion_tokens),
+            # DeepSeek and OpenAI spellings of the same number
+            "prompt_cache_hit_tokens": cached_tokens,
+            "prompt_cache_miss_tokens": prompt_tokens - cached_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        with self.server.stats_lock:
+            self.server.stats["prompt_tokens"] = self.server.stats.get("prompt_tokens", 0) + prompt_tokens
+            self.server.stats["cached_prompt_tokens"] = self.server.stats.get("cached_prompt_tokens", 0) + cached_tokens
+        headers = {
+            "x-ratelimit-limit-requests": "600",
+            "x-ratelimit-remaining-requests": "599",
+            "x-ratelimit-limit-tokens": "1000000",
+            "x-ratelimit-remaining-tokens": str(1000000 - usage["total_tokens"]),
+        }
+        completion_id = "chatcmpl-" + uuid.uuid4().hex[:12]
+        model = request.get("model", "fake-model")
+
+        if request.get("stream"):
+            self._stream(completion_id, model, completion_tokens, usage, headers)
+            return
+
+        if self.config.tokens_per_s > 0:
+            time.sleep(len(completion_tokens) / self.config.tokens_per_s)
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": usage,
+        }, headers)
+
+    def _stream(self, completion_id: str, model: str, tokens: List[str], usage: Dict, headers: Dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # No Content-Length: close the connection to mark the end of the stream
+        self.send_header("Connection", "close")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta: Dict, finish_reason=None, extra: Optional[Dict] = None):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            chunk.update(extra or {})
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        per_token = 1 / self.config.tokens_per_s if self.config.tokens_per_s > 0 else 0
+        # Send a few tokens per event, like real providers do
+        for start in range(0, len(tokens), 4):
+            if per_token:
+                time.sleep(per_token * len(tokens[start:start + 4]))
+            event({"content": "".join(tokens[start:start + 4])})
+        event({}, finish_reason="stop", extra={"usage": usage})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class FakeOpenAIServer:
+    """
+    Runs the fake API in a background thread.
+
+        with FakeOpenAIServer(FakeServerConfig(latency_ms=100)) as server:
+            os.environ["DEEPSEEK_BASE_URL"] = server.base_url
+    """
+    def __init__(self, config: Optional[FakeServerConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.httpd = ThreadingHTTPServer((host, port), FakeOpenAIHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or FakeServerConfig()
+        self.httpd.stats = {}
+        self.httpd.stats_lock = threading.Lock()
+        self.httpd.prefix_cache = set()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self) -> Dict:
+        with self.httpd.stats_lock:
+            return dict(self.httpd.stats)
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--tokens-per-s", type=float, default=0, help="0 = send the completion at once")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    config = FakeServerConfig(args.latency_ms, args.jitter_ms, args.tokens_per_s, args.error_rate,
+                              args.rate_limit_rate, args.malformed_rate, args.seed)
+    server = FakeOpenAIServer(config, args.host, args.port)
+    print(f"Fake OpenAI server listening on {server.base_url} ({config.as_dict()})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+Record / replay harness for the browser flows (login, check_login_status, publish_note).
+
+record: runs the flows once against the live creator site with the logged-in profile and
+writes <out>/session.har.zip (every request and response), <out>/snapshots/ (the DOM after
+each flow, stored by URL path) and <out>/manifest.json. Publishing a real note only
+happens with --publish.
+
+replay: runs the flows fully offline. Requests are answered from the HAR; documents and
+API calls the HAR doesn't have are served by a local static server (the DOM snapshots,
+or the built-in fixture pages with --fixture, which need no recording at all), and
+everything else is aborted. Every request first goes through a seeded latency profile
+(round trip + jitter + transfer time at the given bandwidth). SmartLocator talks to the
+fake OpenAI server. Reports per-flow and per-step p50/p95 and the publish round trips.
+
+Usage:
+    python benchmarks/har_replay.py record --out benchmarks/recordings/xhs
+    python benchmarks/har_replay.py replay --recording benchmarks/recordings/xhs --runs 10 --latency-ms 80
+    python benchmarks/har_replay.py replay --fixture --runs 20 --json report.json
+    python benchmarks/har_replay.py replay --fixture --baseline report.json   # exit code 1 on regression
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig  # noqa: E402
+from src.browser.routing import DEFAULT_SIZES, is_first_party  # noqa: E402
+from src.utils.stats import summarize_latencies  # noqa: E402
+
+FLOWS = ["login", "check_login_status", "publish_note"]
+
+# 1x1 PNG, the image published during replay
+PIXEL_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8DwHwAFBQIAX8jx0gAAAABJRU5ErkJggg=="
+)
+
+# Built-in stand-in for the creator center: "/" redirects to the home page, the publish
+# page switches tabs, uploads, shows the editor and confirms the publish like the real one
+FIXTURE_PAGES = {
+    "index.html": """<html><body><script>location.replace("/new/home")</script></body></html>""",
+    "new/home.html": """
+<html><body>
+  <div class="avatar-wrapper">creator</div>
+  <a href="/publish/publish">发布笔记</a>
+</body></html>""",
+    "publish/publish.html": """
+<html><body>
+  <div class="tabs"><span>上传视频</span><span id="image-tab">上传图文</span></div>
+  <div id="upload"></div>
+  <div id="editor" style="display: none">
+    <input placeholder="填写标题会有更多赞哦～">
+    <div contenteditable="true" class="ql-editor"></div>
+    <button class="cancel">取消</button><button class="submit">发布</button>
+  </div>
+  <div id="toast"></div>
+  <script>
+    const toast = (text) => { document.getElementById("toast").textContent = text; };
+    document.getElementById("image-tab").addEventListener("click", () => setTimeout(() => {
+      const upload = document.getElementById("upload");
+      upload.innerHTML = '<input type="file" accept="image/*" multiple style="display: none">';
+      upload.firstChild.addEventListener("change", async () => {
+        const response = await fetch("/api/media/v1/upload", {method: "POST", body: "image"});
+        if (response.ok) document.getElementById("editor").style.display = "block";
+        else toast("上传失败");
+      });
+    }, 50));
+    document.querySelector("button.submit").addEventListener("click", async () => {
+      const note = {
+        title: document.querySelector("input[placeholder]").value,
+        content: document.querySelector(".ql-editor").innerText,
+      };
+      const response = await fetch("/web_api/sns/v1/note", {method: "POST", body: JSON.stringify(note)});
+      toast(response.ok ? "发布成功" : "发布失败");
+    });
+  </script>
+</body></html>""",
+}
+
+
+class NetworkProfile:
+    """
+    Seeded per-request delay: round trip + uniform jitter + transfer time of the typical
+    size of the resource type (routing.DEFAULT_SIZES) at the given bandwidth.
+    """
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 10, bandwidth_kbps: float = 0, seed: int = 42):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.bandwidth_kbps = bandwidth_kbps
+        self.random = random.Random(seed)
+
+    def as_dict(self) -> Dict:
+        return {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms, "bandwidth_kbps": self.bandwidth_kbps}
+
+    def delay(self, resource_type: str) -> float:
+        ms = self.latency_ms + self.random.uniform(-1, 1) * self.jitter_ms
+        if self.bandwidth_kbps > 0:
+            size = DEFAULT_SIZES.get(resource_type, DEFAULT_SIZES["other"])
+            ms += size * 8 / self.bandwidth_kbps
+        return max(0.0, ms) / 1000
+
+
+class StaticSiteHandler(BaseHTTPRequestHandler):
+    """Serves <root>/<path>.html for GET; answers every POST with a success JSON."""
+    server_version = "StaticSite/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.strip("/") or "index"
+        file_path = os.path.join(self.server.root, path + ".html")
+        if os.path.abspath(file_path).startswith(self.server.root) and os.path.isfile(file_path):
+            with open(file_path, "rb") as f:
+                self._send(200, f.read(), "text/html; charset=utf-8")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._send(200, json.dumps({"success": True, "code": 0, "data": {}}).encode("utf-8"), "application/json")
+
+
+class StaticSite:
+    """Runs a StaticSiteHandler over a directory in a background thread."""
+    def __init__(self, root: str):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), StaticSiteHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.root = os.path.abspath(root)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StaticSite":
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def snapshot_path(root: str, url: str) -> str:
+    path = urlsplit(url).path.strip("/") or "index"
+    return os.path.join(root, path + ".html")
+
+
+async def install_offline_routes(context, site: StaticSite, network: NetworkProfile, har: Optional[str]):
+    """
+    Routes run in reverse registration order: latency first, then the HAR, then the static
+    site for first-party requests; nothing reaches the real network.
+    """
+    async def offline(route, request):
+        if not is_first_party(request.url):
+            await route.abort("internetdisconnected")
+            return
+        parts = urlsplit(request.url)
+        response = await route.fetch(url=site.base_url + parts.path + (f"?{parts.query}" if parts.query else ""))
+        await route.fulfill(response=response)
+
+    async def latency(route, request):
+        await asyncio.sleep(network.delay(request.resource_type))
+        await route.fallback()
+
+    await context.route("**/*", offline)
+    if har:
+        await context.route_from_har(har, not_found="fallback")
+    await context.route("**/*", latency)
+
+
+async def record(args):
+    from src.browser.context import BrowserManager
+    from src.browser.xhs import XHSOperator
+
+    snapshots = os.path.join(args.out, "snapshots")
+    os.makedirs(snapshots, exist_ok=True)
+    har = os.path.join(args.out, "session.har.zip")
+    # Unrouted, so the HAR also has what the presets would block
+    manager = BrowserManager(args.user_data_dir, headless=args.headless, routing=False, record_har_path=har)
+    manifest: Dict[str, Any] = {"recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "har": "session.har.zip",
+                                "snapshots": {}}
+
+    async def snapshot(flow: str):
+        path = snapshot_path(snapshots, manager.page.url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(await manager.page.content())
+        manifest["snapshots"][flow] = {"url": manager.page.url, "file": os.path.relpath(path, args.out)}
+        print(f"[Record] {flow}: snapshot of {manager.page.url}")
+
+    await manager.launch()
+    try:
+        xhs = XHSOperator(manager.page, profile_dir=manager.user_data_dir)
+        if not await xhs.check_login_status(force_navigation=True):
+            await xhs.login()
+        await snapshot("check_login_status")
+        if args.publish:
+            await xhs.publish_note(args.title, args.content, args.image)
+        else:
+            await manager.page.goto(XHSOperator.PUBLISH_URL)
+        await snapshot("publish_note")
+    finally:
+        await manager.close()
+    with open(os.path.join(args.out, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    print(f"[Record] Wrote {har} and {len(manifest['snapshots'])} snapshot(s)")
+
+
+async def replay_once(browser, site: StaticSite, network: NetworkProfile, har: Optional[str],
+                      image: str, flows: List[str]) -> Dict[str, Any]:
+    from src.browser.xhs import XHSOperator
+
+    context = await browser.new_context(viewport={"width": 1280, "height": 800})
+    try:
+        await install_offline_routes(context, site, network, har)
+        xhs = XHSOperator(await context.new_page())
+        run: Dict[str, Any] = {}
+        for flow in flows:
+            start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if flow == "login":
+                        await xhs.login()
+                    elif flow == "check_login_status":
+                        if not await xhs.check_login_status(force_navigation=True):
+                            raise RuntimeError("login check failed")
+                    else:
+                        timer = await xhs.publish_note("回放测试", "离线回放的正文。\n\n#测试", [image])
+                        run["steps"] = {step["name"]: step["seconds"] * 1000 for step in timer.steps}
+                        run["round_trips"] = timer.round_trips
+                run[flow] = (time.perf_counter() - start) * 1000
+            except Exception as e:
+                run[flow] = None
+                run.setdefault("errors", []).append(f"{flow}: {e}")
+        return run
+    finally:
+        await context.close()
+
+
+async def replay(args) -> Dict[str, Any]:
+    from playwright.async_api import async_playwright
+
+    har = None
+    if args.fixture:
+        site_root = tempfile.mkdtemp(prefix="xhs_fixture_")
+        for name, html in FIXTURE_PAGES.items():
+            os.makedirs(os.path.dirname(os.path.join(site_root, name)), exist_ok=True)
+            with open(os.path.join(site_root, name), "w", encoding="utf-8") as f:
+                f.write(html)
+    else:
+        with open(os.path.join(args.recording, "manifest.json"), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        har = os.path.abspath(os.path.join(args.recording, manifest["har"]))
+        site_root = os.path.abspath(os.path.join(args.recording, "snapshots"))
+
+    network = NetworkProfile(args.latency_ms, args.jitter_ms, args.bandwidth_kbps, args.seed)
+    runs: List[Dict[str, Any]] = []
+    workdir = tempfile.mkdtemp(prefix="xhs_replay_")
+    image = os.path.join(workdir, "cover.png")
+    with open(image, "wb") as f:
+        f.write(PIXEL_PNG)
+
+    cwd = os.getcwd()
+    # The flows write session, selector-cache and state files under user_data/; keep them out of the real one
+    os.chdir(workdir)
+    try:
+        with StaticSite(site_root) as site, FakeOpenAIServer(FakeServerConfig(latency_ms=0, jitter_ms=0)) as llm:
+            os.environ["DEEPSEEK_BASE_URL"] = llm.base_url
+            os.environ.setdefault("DEEPSEEK_API_KEY", "sk-offline-replay")
+            async with async_playwright() as playwright:
+                browser = await playwright.chromium.launch(headless=True)
+                try:
+                    for index in range(args.runs):
+                        run = await replay_once(browser, site, network, har, image, args.flows)
+                        runs.append(run)
+                        print(f"[Replay] run {index + 1}/{args.runs}: "
+                              + ", ".join(f"{flow}={run[flow]:.0f}ms" if run[flow] is not None else f"{flow}=failed"
+                                          for flow in args.flows), file=sys.stderr)
+                finally:
+                    await browser.close()
+    finally:
+        os.chdir(cwd)
+    return summarize_runs(runs, args.flows)
+
+
+def summarize_runs(runs: List[Dict[str, Any]], flows: List[str]) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    for flow in flows:
+        latencies = [run[flow] for run in runs if run.get(flow) is not None]
+        results[flow] = {"errors": len(runs) - len(latencies), "latency_ms": summarize_latencies(latencies)}
+    if "publish_note" in results:
+        step_names: List[str] = []
+        for run in runs:
+            step_names += [name for name in run.get("steps", {}) if name not in step_names]
+        results["publish_note"]["steps"] = {
+            name: summarize_latencies([run["steps"][name] for run in runs if name in run.get("steps", {})])
+            for name in step_names
+        }
+        round_trips = [run["round_trips"] for run in runs if run.get("round_trips") is not None]
+        results["publish_note"]["round_trips"] = max(round_trips) if round_trips else None
+    errors = [error for run in runs for error in run.get("errors", [])]
+    if errors:
+        results["error_samples"] = errors[:5]
+    return results
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Returns human-readable p95 regressions per flow and per publish step, and new round trips."""
+    regressions = []
+
+    def check(name: str, old: Dict, new: Dict):
+        if old["p95"] > 0 and new["p95"] > old["p95"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {old['p95']} ms -> {new['p95']} ms")
+
+    for flow, current in report["results"].items():
+        previous = baseline.get("results", {}).get(flow)
+        if not isinstance(current, dict) or not previous or "latency_ms" not in previous:
+            continue
+        check(flow, previous["latency_ms"], current["latency_ms"])
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{flow}: errors {previous['errors']} -> {current['errors']}")
+        for step, summary in current.get("steps", {}).items():
+            if step in previous.get("steps", {}):
+                check(f"{flow}.{step}", previous["steps"][step], summary)
+        old_trips, new_trips = previous.get("round_trips"), current.get("round_trips")
+        if old_trips is not None and new_trips is not None and new_trips > old_trips:
+            regressions.append(f"{flow}: round trips {old_trips} -> {new_trips}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record / offline replay of the browser flows")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="Record a live session (needs the logged-in profile)")
+    record_parser.add_argument("--out", required=True, help="Recording directory")
+    record_parser.add_argument("--user-data-dir", default="user_data/browser_context")
+    record_parser.add_argument("--headless", action="store_true")
+    record_parser.add_argument("--publish", action="store_true", help="Also publish a real note")
+    record_parser.add_argument("--title", default="测试笔记")
+    record_parser.add_argument("--content", default="测试内容")
+    record_parser.add_argument("--image", nargs="+", default=["test_image.jpg"])
+
+    replay_parser = subparsers.add_parser("replay", help="Replay offline and report per-step timings")
+    source = replay_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--recording", help="Directory written by 'record'")
+    source.add_argument("--fixture", action="store_true", help="Use the built-in fixture pages")
+    replay_parser.add_argument("--flows", nargs="+", choices=FLOWS, default=FLOWS)
+    replay_parser.add_argument("--runs", type=int, default=5)
+    replay_parser.add_argument("--latency-ms", type=float, default=50)
+    replay_parser.add_argument("--jitter-ms", type=float, default=10)
+    replay_parser.add_argument("--bandwidth-kbps", type=float, default=0, help="0 = unlimited")
+    replay_parser.add_argument("--seed", type=int, default=42)
+    replay_parser.add_argument("--json", help="Write the report to this file")
+    replay_parser.add_argument("--baseline", help="Previous report to compare against")
+    replay_parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative p95 increase")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        args.image = [os.path.abspath(path) for path in args.image]
+        asyncio.run(record(args))
+        return
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "source": "fixture" if args.fixture else args.recording,
+        "network": NetworkProfile(args.latency_ms, args.jitter_ms, args.bandwidth_kbps).as_dict(),
+        "runs": args.runs,
+        "results": asyncio.run(replay(args)),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print("\nREGRESSIONS:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+        print("\nNo regressions against baseline.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Offline benchmark suite for the LLM-facing code paths.
+
+Starts the fake OpenAI-compatible server (benchmarks/fake_openai_server.py), points
+DeepSeek at it via DEEPSEEK_BASE_URL and measures throughput, p50/p95/p99 latency and
+parse-failure rates for:
+- DeepSeekGenerator.agenerate (concurrent)
+- DeepSeekGenerator.astream (time to first token)
+- generate_task (the CLI code path, sync client)
+- SmartLocator.find against a static page (needs Playwright + Chromium; skipped otherwise)
+
+Usage:
+    python benchmarks/run_suite.py --requests 100 --concurrency 8 --json report.json
+    python benchmarks/run_suite.py --baseline report.json   # exit code 1 on regression
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_openai_server import FakeOpenAIServer, FakeServerConfig  # noqa: E402
+from src.content.base import is_error_result  # noqa: E402
+from src.utils.rate_limit import rate_limit_states  # noqa: E402
+from src.utils.stats import summarize_latencies  # noqa: E402
+
+# Static stand-in for the XHS publish form
+PUBLISH_FORM_HTML = """
+<html><body>
+  <div class="header"><a href="/home">首页</a><a href="/notes">笔记管理</a><button>帮助</button></div>
+  <div class="editor">
+    <input placeholder="填写标题会有更多赞哦～">
+    <div contenteditable="true" class="ql-editor"></div>
+    <div class="tags">""" + "".join(f'<span role="button" tabindex="0">#话题{i}</span>' for i in range(200)) + """</div>
+  </div>
+  <div class="footer"><button class="cancel">取消</button><button class="submit">发布</button></div>
+</body></html>
+"""
+
+
+def _result(latencies: List[float], errors: int, parse_failures: int, elapsed: float, **extra) -> Dict[str, Any]:
+    count = len(latencies)
+    report = {
+        "count": count,
+        "errors": errors,
+        "parse_failures": parse_failures,
+        "parse_failure_rate": round(parse_failures / count, 4) if count else 0.0,
+        "throughput_per_s": round(count / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": summarize_latencies(latencies),
+    }
+    report.update(extra)
+    return report
+
+
+def _classify(result: Dict[str, Any]) -> str:
+    """ok / api_error / parse_failure for a generator result."""
+    if not is_error_result(result):
+        return "ok"
+    # openai raises APIStatusError("Error code: 429 ...") for HTTP errors; anything else is parsing
+    return "api_error" if "Error code:" in result.get("content", "") else "parse_failure"
+
+
+async def bench_agenerate(requests: int, concurrency: int) -> Dict[str, Any]:
+    from src.content.deepseek_wrapper import DeepSeekGenerator
+
+    generator = DeepSeekGenerator()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, outcomes = [], []
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await generator.agenerate(f"benchmark topic {index}")
+            latencies.append((time.perf_counter() - start) * 1000)
+            outcomes.append(_classify(result))
+
+    start = time.perf_counter()
+    # redirect_stdout swaps the process-wide sys.stdout, so it must wrap all tasks at once
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return _result(latencies, outcomes.count("api_error"), outcomes.count("parse_failure"), elapsed,
+                   concurrency=concurrency)
+
+
+async def bench_stream(requests: int, concurrency: int) -> Dict[str, Any]:
+    from src.content.deepseek_wrapper import DeepSeekGenerator
+    from src.content.streaming import stream_generate
+
+    generator = DeepSeekGenerator()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, ttfts, outcomes = [], [], []
+
+    async def one(index: int):
+        async with semaphore:
+            result, metrics = await stream_generate(generator, f"benchmark topic {index}")
+            latencies.append(metrics.total_ms)
+            if metrics.ttft_ms is not None:
+                ttfts.append(metrics.ttft_ms)
+            outcomes.append(_classify(result))
+
+    start = time.perf_counter()
+    # redirect_stdout swaps the process-wide sys.stdout, so it must wrap all tasks at once
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    return _result(latencies, outcomes.count("api_error"), outcomes.count("parse_failure"), elapsed,
+                   concurrency=concurrency, ttft_ms=summarize_latencies(ttfts))
+
+
+def bench_generate_task(requests: int) -> Dict[str, Any]:
+    from src.main import generate_task
+
+    latencies, outcomes = [], []
+    start = time.perf_counter()
+    for index in range(requests):
+        one_start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            result = generate_task(f"benchmark topic {index}", "deepseek")
+        latencies.append((time.perf_counter() - one_start) * 1000)
+        outcomes.append(_classify(result))
+    elapsed = time.perf_counter() - start
+    return _result(latencies, outcomes.count("api_error"), outcomes.count("parse_failure"), elapsed)
+
+
+async def bench_smart_locator(requests: int) -> Dict[str, Any]:
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError:
+        return {"skipped": "playwright is not installed"}
+    from src.browser.smart_locator import SmartLocator
+
+    latencies = []
+    errors = wrong = 0
+    async with async_playwright() as playwright:
+        try:
+            browser = await playwright.chromium.launch(headless=True)
+        except Exception as e:
+            return {"skipped": f"could not launch Chromium: {e}"}
+        page = await browser.new_page()
+        await page.set_content(PUBLISH_FORM_HTML)
+        expected = await page.locator("button.submit").element_handle()
+        locator = SmartLocator(page, use_cache=False)
+
+        start = time.perf_counter()
+        for _ in range(requests):
+            one_start = time.perf_counter()
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    found = await locator.find("The main submit button that says '发布' or 'Post'")
+                handle = await found.element_handle(timeout=1000)
+                if not await page.evaluate("([a, b]) => a === b", [handle, expected]):
+                    wrong += 1
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - one_start) * 1000)
+        elapsed = time.perf_counter() - start
+        await browser.close()
+    # A selector that resolves to the wrong element counts as a parse failure of the answer
+    return _result(latencies, errors, wrong, elapsed)
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Returns human-readable regressions of p95/p99 latency and parse-failure rate."""
+    regressions = []
+    for name, current in report["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or "latency_ms" not in current or "latency_ms" not in previous:
+            continue
+        for pct in ("p95", "p99"):
+            old, new = previous["latency_ms"][pct], current["latency_ms"][pct]
+            if old > 0 and new > old * (1 + max_regression):
+                regressions.append(f"{name}: {pct} {old} ms -> {new} ms")
+        old_rate, new_rate = previous["parse_failure_rate"], current["parse_failure_rate"]
+        if new_rate > old_rate + 0.01:
+            regressions.append(f"{name}: parse failure rate {old_rate:.2%} -> {new_rate:.2%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline LLM benchmark suite")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per benchmark")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--tokens-per-s", type=float, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--malformed-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="+", choices=["agenerate", "stream", "generate_task", "smart_locator"])
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--baseline", help="Previous report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative p95/p99 increase")
+    args = parser.parse_args()
+
+    config = FakeServerConfig(args.latency_ms, args.jitter_ms, args.tokens_per_s, args.error_rate,
+                              args.rate_limit_rate, args.malformed_rate, args.seed)
+    selected = args.only or ["agenerate", "stream", "generate_task", "smart_locator"]
+    results: Dict[str, Any] = {}
+
+    with FakeOpenAIServer(config) as server:
+        os.environ["DEEPSEEK_BASE_URL"] = server.base_url
+        os.environ["DEEPSEEK_API_KEY"] = "sk-offline-benchmark"
+
+        async def run_async_benchmarks():
+            from src.utils.http_clients import aclose_all
+            try:
+                if "agenerate" in selected:
+                    results["deepseek_agenerate"] = await bench_agenerate(args.requests, args.concurrency)
+                if "stream" in selected:
+                    results["deepseek_stream"] = await bench_stream(args.requests, args.concurrency)
+                if "smart_locator" in selected:
+                    results["smart_locator_find"] = await bench_smart_locator(min(args.requests, 20))
+            finally:
+                await aclose_all()
+
+        asyncio.run(run_async_benchmarks())
+        if "generate_task" in selected:
+            results["generate_task"] = bench_generate_task(min(args.requests, 20))
+        server_stats = server.stats
+
+    prompt_tokens = server_stats.get("prompt_tokens", 0)
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "server_config": config.as_dict(),
+        "server_stats": server_stats,
+        # Share of input tokens a prefix-caching provider would serve from cache
+        "prompt_cache_share": round(server_stats.get("cached_prompt_tokens", 0) / prompt_tokens, 4) if prompt_tokens else 0.0,
+        # Adaptive concurrency / throttling state of the provider controllers after the run
+        "rate_limit": rate_limit_states(),
+        "results": results,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_regression)
+        if regressions:
+            print("\nREGRESSIONS:\n  " + "\n  ".join(regressions), file=sys.stderr)
+            sys.exit(1)
+        print("\nNo regressions against baseline.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
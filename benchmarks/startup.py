@@ -0,0 +1,106 @@
+"""
+CLI startup benchmark based on `python -X importtime`.
+
+Compares the real CLI (`generate --provider mock`, with lazy provider and browser
+imports) against an "eager" reference that imports every provider SDK and the
+browser layer up front, the way src/main.py used to.
+
+Usage:
+    python benchmarks/startup.py [--runs 10] [--json report.json]
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "cli_generate_mock": [sys.executable, "-X", "importtime", os.path.join("src", "main.py"),
+                          "generate", "--topic", "startup benchmark", "--provider", "mock"],
+    "eager_reference": [sys.executable, "-X", "importtime", "-c",
+                        "import src.content.gemini_wrapper, src.content.deepseek_wrapper, "
+                        "src.browser.xhs, src.browser.pool, src.browser.smart_locator"],
+}
+
+# "import time: self [us] | cumulative | imported package"
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def parse_importtime(stderr: str) -> Dict:
+    total_self_us = 0
+    top_level: List[tuple] = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        total_self_us += self_us
+        # One leading space means a top-level import (nested ones are indented further)
+        if len(indent) == 1:
+            top_level.append((module, cumulative_us))
+    top_level.sort(key=lambda item: -item[1])
+    return {
+        "import_total_ms": round(total_self_us / 1000, 2),
+        "top_imports_ms": {module: round(us / 1000, 2) for module, us in top_level[:10]},
+    }
+
+
+def run_scenario(command: List[str], runs: int) -> Dict:
+    wall_ms = []
+    last_stderr = ""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="0")
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+        wall_ms.append((time.perf_counter() - start) * 1000)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{' '.join(command)} failed:\n{completed.stderr[-2000:]}")
+        last_stderr = completed.stderr
+    report = parse_importtime(last_stderr)
+    report["wall_ms_median"] = round(statistics.median(wall_ms), 2)
+    report["wall_ms_min"] = round(min(wall_ms), 2)
+    report["runs"] = runs
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup benchmark (-X importtime)")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per scenario (the first one warms the bytecode cache)")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, command in SCENARIOS.items():
+        try:
+            results[name] = run_scenario(command, args.runs)
+        except RuntimeError as e:
+            # The eager reference needs every SDK installed; report instead of crashing
+            results[name] = {"error": str(e)}
+
+    for name, report in results.items():
+        print(f"== {name}")
+        if "error" in report:
+            print(f"   error: {report['error'].splitlines()[-1]}")
+            continue
+        print(f"   wall median {report['wall_ms_median']} ms (min {report['wall_ms_min']} ms), "
+              f"imports {report['import_total_ms']} ms")
+        for module, ms in report["top_imports_ms"].items():
+            print(f"   {ms:>9.2f} ms  {module}")
+
+    lazy, eager = results.get("cli_generate_mock", {}), results.get("eager_reference", {})
+    if "wall_ms_median" in lazy and "wall_ms_median" in eager:
+        print(f"\nLazy CLI imports save {eager['import_total_ms'] - lazy['import_total_ms']:.2f} ms of import time per launch.")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 from playwright.async_api import async_playwright, BrowserContext, Page
 from typing import Optional
+from .routing import RequestRouter
 
 class BrowserManager:
     """
@@ -9,10 +10,19 @@ class BrowserManager:
     Attributes:
         user_data_dir (str): Path to the directory where browser data (cookies, local storage) is stored.
         headless (bool): Whether to run the browser in headless mode.
+        router (RequestRouter): Request interception for the context, None when disabled
+            (routing=False or BROWSER_ROUTING=0). Flows pick their preset with router.use().
+        record_har_path (str): If set, all traffic of the context is recorded to this HAR file
+            (written on close; a .zip path stores response bodies as attachments).
     """
-    def __init__(self, user_data_dir: str = "user_data/browser_context", headless: bool = False):
+    def __init__(self, user_data_dir: str = "user_data/browser_context", headless: bool = False,
+                 routing: Optional[bool] = None, record_har_path: Optional[str] = None):
         self.user_data_dir = os.path.abspath(user_data_dir)
         self.headless = headless
+        if routing is None:
+            routing = os.getenv("BROWSER_ROUTING", "1") != "0"
+        self.router: Optional[RequestRouter] = RequestRouter() if routing else None
+        self.record_har_path = record_har_path
         self.playwright = None
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
@@ -26,6 +36,7 @@ class BrowserManager:
             os.makedirs(self.user_data_dir, exist_ok=True)
 
         self.playwright = await async_playwright().start()
+        har_options = {"record_har_path": self.record_har_path} if self.record_har_path else {}
         
         # launch_persistent_context is key for anti-detection and session persistence
         # It acts like a regular Chrome profile.
@@ -38,8 +49,13 @@ class BrowserManager:
                 "--disable-blink-features=AutomationControlled",
                 "--no-sandbox",
             ],
-            ignore_default_args=["--enable-automation"]
+            ignore_default_args=["--enable-automation"],
+            **har_options
         )
+
+        # Before any page loads, so the first navigation is already filtered
+        if self.router:
+            await self.router.install(self.context)
         
         # Create a default page
         if len(self.context.pages) > 0:
@@ -56,6 +72,8 @@ class BrowserManager:
 
     async def close(self):
         """Closes the browser and playwright instance."""
+        if self.router and self.router.stats:
+            print(self.router.summary())
         if self.context:
             await self.context.close()
         if self.playwright:
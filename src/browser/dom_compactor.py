@@ -0,0 +1,201 @@
+import hashlib
+import re
+from typing import Dict, List
+
+from playwright.async_api import Page
+
+# Single in-page walk that collects visible interactive or labelled elements,
+# together with a robust CSS selector for each of them.
+COLLECT_NODES_JS = """
+() => {
+    const INTERACTIVE = 'a[href],button,input,select,textarea,summary,[contenteditable=""],[contenteditable="true"],'
+        + '[role=button],[role=link],[role=tab],[role=checkbox],[role=radio],[role=menuitem],[role=option],'
+        + '[role=switch],[role=textbox],[onclick],[tabindex]';
+    const LABELLED = '[aria-label],[placeholder],[title],label';
+    const clip = (s, n) => (s || '').replace(/\\s+/g, ' ').trim().slice(0, n);
+    const esc = (s) => (window.CSS && CSS.escape) ? CSS.escape(s) : s.replace(/([^a-zA-Z0-9_-])/g, '\\\\$1');
+    const unique = (sel) => { try { return document.querySelectorAll(sel).length === 1; } catch (e) { return false; } };
+    const attrSel = (el, name) => {
+        const v = el.getAttribute(name);
+        return v ? el.tagName.toLowerCase() + '[' + name + '="' + v.replace(/"/g, '\\\\"') + '"]' : null;
+    };
+    const selectorFor = (el) => {
+        // Ids that look generated (digits / long hashes) are not stable across page loads
+        if (el.id && !/\\d{3,}|[0-9a-f]{8,}/i.test(el.id) && unique('#' + esc(el.id))) return '#' + esc(el.id);
+        for (const name of ['data-testid', 'name', 'placeholder', 'aria-label']) {
+            const sel = attrSel(el, name);
+            if (sel && unique(sel)) return sel;
+        }
+        const path = [];
+        let cur = el;
+        while (cur && cur.nodeType === 1 && cur !== document.body) {
+            let part = cur.tagName.toLowerCase();
+            const parent = cur.parentElement;
+            if (parent) {
+                const same = Array.from(parent.children).filter(c => c.tagName === cur.tagName);
+                if (same.length > 1) part += ':nth-of-type(' + (same.indexOf(cur) + 1) + ')';
+            }
+            path.unshift(part);
+            const sel = 'body > ' + path.join(' > ');
+            if (unique(sel)) return sel;
+            cur = parent;
+        }
+        return 'body > ' + path.join(' > ');
+    };
+    const visible = (el) => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width === 0 && rect.height === 0) return false;
+        const style = getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+    const nodes = [];
+    const seen = new Set();
+    if (!document.body) return nodes;
+    for (const el of document.body.querySelectorAll(INTERACTIVE + ',' + LABELLED)) {
+        if (seen.has(el)) continue;
+        seen.add(el);
+        // File inputs are usually hidden behind a styled drop zone but are still actionable
+        const isFile = el.tagName === 'INPUT' && el.type === 'file';
+        if (!isFile && !visible(el)) continue;
+        nodes.push({
+            tag: el.tagName.toLowerCase(),
+            type: el.getAttribute('type') || '',
+            role: el.getAttribute('role') || '',
+            text: clip(el.innerText || el.value, 80),
+            label: clip(el.getAttribute('aria-label') || el.getAttribute('title'), 60),
+            placeholder: clip(el.getAttribute('placeholder'), 60),
+            disabled: !!el.disabled || el.getAttribute('aria-disabled') === 'true',
+            selector: selectorFor(el),
+        });
+    }
+    return nodes;
+}
+"""
+
+# Tags that are actionable by themselves get a small boost over plain labelled elements
+_ACTIONABLE_TAGS = {"button", "input", "textarea", "select", "a"}
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token estimate: CJK characters count as one token each,
+    everything else as ~4 characters per token.
+    """
+    cjk = len(re.findall(r"[\u3000-\u9fff\uff00-\uffef]", text))
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def _terms(text: str) -> set:
+    """Lower-cased words plus single CJK characters, used for relevance scoring."""
+    text = text.lower()
+    words = set(re.findall(r"[a-z0-9_]{2,}", text))
+    words.update(re.findall(r"[\u4e00-\u9fff]", text))
+    return words
+
+
+class CompactDom:
+    """
+    Result of a compaction: the text sent to the LLM and the id -> selector map.
+    """
+    def __init__(self, lines: List[str], selectors: Dict[str, str], total_nodes: int):
+        self.lines = lines
+        self.selectors = selectors
+        self.total_nodes = total_nodes
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+    def selector_for(self, node_id: str) -> str:
+        return self.selectors[node_id.strip().strip("[]")]
+
+
+class DomCompactor:
+    """
+    Builds a token-budgeted, one-line-per-node view of the interactive
+    and labelled elements of a page.
+
+    Attributes:
+        token_budget (int): Max estimated tokens of the compacted output.
+    """
+    def __init__(self, token_budget: int = 3000):
+        self.token_budget = token_budget
+
+    @staticmethod
+    def node_id(selector: str, length: int = 6) -> str:
+        # Derived from the selector, so the same element gets the same id across calls
+        return "e" + hashlib.sha1(selector.encode("utf-8")).hexdigest()[:length]
+
+    @staticmethod
+    def format_node(node_id: str, node: Dict) -> str:
+        parts = [f"[{node_id}]", node["tag"]]
+        if node.get("type"):
+            parts.append(f"type={node['type']}")
+        if node.get("role"):
+            parts.append(f"role={node['role']}")
+        if node.get("text"):
+            parts.append(f"\"{node['text']}\"")
+        if node.get("label"):
+            parts.append(f"label=\"{node['label']}\"")
+        if node.get("placeholder"):
+            parts.append(f"placeholder=\"{node['placeholder']}\"")
+        if node.get("disabled"):
+            parts.append("disabled")
+        return " ".join(parts)
+
+    @staticmethod
+    def score(description: str, node: Dict) -> float:
+        """Relevance of a node to the description (higher is better)."""
+        wanted = _terms(description)
+        haystack = " ".join([node.get("text", ""), node.get("label", ""), node.get("placeholder", ""),
+                             node.get("tag", ""), node.get("type", ""), node.get("role", "")])
+        score = float(len(wanted & _terms(haystack)))
+        # Quoted strings in the description are usually the exact visible text
+        for quoted in re.findall(r"['\"\u201c\u2018](.+?)['\"\u201d\u2019]", description):
+            if quoted and quoted in haystack:
+                score += 5
+        if node.get("tag") in _ACTIONABLE_TAGS:
+            score += 0.5
+        if node.get("disabled"):
+            score -= 1
+        return score
+
+    def compact_nodes(self, nodes: List[Dict], description: str) -> CompactDom:
+        """
+        Ranks nodes by relevance and keeps as many as fit into the token budget.
+        The kept nodes are emitted in document order to preserve page context.
+        """
+        entries = []
+        selectors: Dict[str, str] = {}
+        for position, node in enumerate(nodes):
+            length = 6
+            node_id = self.node_id(node["selector"])
+            # Short ids collide now and then on large pages: lengthen until the id is free
+            while node_id in selectors and selectors[node_id] != node["selector"]:
+                length += 2
+                node_id = self.node_id(node["selector"], length)
+            if node_id in selectors:
+                continue
+            selectors[node_id] = node["selector"]
+            line = self.format_node(node_id, node)
+            entries.append((self.score(description, node), position, node_id, line))
+
+        kept = []
+        used = 0
+        for score, position, node_id, line in sorted(entries, key=lambda e: (-e[0], e[1])):
+            cost = estimate_tokens(line)
+            if used + cost > self.token_budget:
+                continue
+            kept.append((position, node_id, line))
+            used += cost
+
+        kept.sort()
+        return CompactDom(
+            lines=[line for _, _, line in kept],
+            selectors={node_id: selectors[node_id] for _, node_id, _ in kept},
+            total_nodes=len(entries),
+        )
+
+    async def compact(self, page: Page, description: str) -> CompactDom:
+        nodes = await page.evaluate(COLLECT_NODES_JS)
+        return self.compact_nodes(nodes, description)
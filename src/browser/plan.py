@@ -0,0 +1,281 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Union
+
+from playwright.async_api import FrameLocator, Locator, Page
+
+from .waits import FlowTimer, StepFailed, WaitStrategy
+
+# Runs a batch of DOM operations in one page-side evaluation. Fills use the native value
+# setter plus input/change events (what frameworks listen to), or insertText for
+# contenteditable editors, so the page sees the same events as from typing.
+DOM_BATCH_JS = r"""
+(ops) => {
+  const norm = (text) => text.replace(/\s+/g, " ").trim();
+  const visible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+  const byText = (text) => {
+    const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_ELEMENT);
+    let match = null;
+    // Keep the deepest element whose own text is the wanted text
+    while (walker.nextNode()) {
+      const el = walker.currentNode;
+      if (visible(el) && el.textContent.trim() === text) match = el;
+    }
+    return match;
+  };
+  const first = (selectors) => {
+    for (const selector of selectors) {
+      for (const el of document.querySelectorAll(selector)) {
+        if (visible(el)) return el;
+      }
+    }
+    return null;
+  };
+  return ops.map((op) => {
+    const el = op.op === "click_text" ? byText(op.text) : first(op.selectors);
+    if (!el) return {ok: false, reason: "no visible element"};
+    if (op.op === "click_text") {
+      el.click();
+      return {ok: true};
+    }
+    el.focus();
+    if (el.isContentEditable) {
+      document.execCommand("selectAll", false);
+      if (!document.execCommand("insertText", false, op.value)) el.textContent = op.value;
+    } else {
+      const proto = el instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+      Object.getOwnPropertyDescriptor(proto, "value").set.call(el, op.value);
+    }
+    el.dispatchEvent(new Event("input", {bubbles: true}));
+    el.dispatchEvent(new Event("change", {bubbles: true}));
+    // Editors re-render line breaks as paragraphs, so compare text modulo whitespace
+    const value = el.isContentEditable ? el.innerText : el.value;
+    return {ok: norm(value) === norm(op.value), reason: "value did not stick"};
+  });
+}
+"""
+
+
+class Step:
+    """
+    One declarative step of a browser flow.
+
+    Args:
+        name: Step name, used for timings, traces and errors.
+        op: What to do:
+            "click_text" - click the visible element whose text is `text` (page-side, batchable)
+            "fill" - fill the first visible element matching one of `selectors` with
+                context[`value`] (page-side, batchable)
+            "listen" - start listening for a response whose URL matches `pattern` (call it
+                before the triggering action); the pending response is stored in context[name]
+                and its arrival time recorded on the timer
+            "set_files" - set context[`files`] on the first of `selectors` that accepts them
+            "wait" - wait until one of `successes` fires, failing fast on `failures`
+                ({label: ("selector", selector[, state]) | ("response", listen step name) | ("url", glob)});
+                a non-2xx response fails the step at once
+            "call" - await func(executor), for flow-specific logic; the result goes to context[name]
+        budget: Seconds the step may take (None: not timed).
+        optional: Log failures instead of raising them.
+    """
+    BATCHABLE = ("click_text", "fill")
+
+    def __init__(self, name: str, op: str, budget: Optional[float] = None, optional: bool = False, **params):
+        self.name = name
+        self.op = op
+        self.budget = budget
+        self.optional = optional
+        self.params = params
+
+
+class Parallel:
+    """
+    Steps with no dependency on each other; they run concurrently. The batchable
+    steps of the group still share one page-side evaluation.
+    """
+    def __init__(self, *steps: Union[Step, "Parallel"]):
+        self.steps = list(steps)
+
+
+class RoundTripCounter:
+    """
+    Wraps a Page and counts its async method calls, i.e. client -> browser protocol round trips.
+    Locators obtained through it (page.locator(...).first, get_by_text(...), nth(...)) are
+    wrapped the same way, so waits, SmartLocator validation and clicks on located elements
+    are all counted here rather than by hand at each call site.
+    """
+    def __init__(self, page: Page):
+        self._page = page
+        self.round_trips = 0
+
+    def __getattr__(self, name: str):
+        return self._wrap(getattr(self._page, name))
+
+    def _wrap(self, attribute: Any) -> Any:
+        if isinstance(attribute, (Locator, FrameLocator)):
+            return _CountedLocator(attribute, self)
+        if inspect.iscoroutinefunction(attribute):
+            async def counted(*args, **kwargs):
+                self.round_trips += 1
+                return await attribute(*args, **kwargs)
+            return counted
+        if inspect.ismethod(attribute):
+            # Sync methods (locator(), nth(), filter()) hand out locators to count as well
+            def wrapped(*args, **kwargs):
+                return self._wrap_result(attribute(*args, **kwargs))
+            return wrapped
+        return attribute
+
+    def _wrap_result(self, value: Any) -> Any:
+        if isinstance(value, (Locator, FrameLocator)):
+            return _CountedLocator(value, self)
+        return value
+
+
+class _CountedLocator:
+    """A Locator whose round trips go to the RoundTripCounter of the page it came from."""
+    def __init__(self, locator: Union[Locator, FrameLocator], counter: RoundTripCounter):
+        self._locator = locator
+        self._counter = counter
+
+    def __getattr__(self, name: str):
+        return self._counter._wrap(getattr(self._locator, name))
+
+
+class PlanExecutor:
+    """
+    Runs a list of Steps against a page.
+
+    Consecutive batchable steps (clicks by text, fills) become one page-side evaluation
+    instead of one round trip each; Parallel groups run concurrently. Every step with a
+    budget is timed through the FlowTimer, and the number of protocol round trips of the
+    run is recorded on it.
+
+    Attributes:
+        page (RoundTripCounter): The counted page; steps should go through it.
+        context (dict): Values steps read (fill values, files) and write (listeners, call results).
+    """
+    def __init__(self, page: Page, timer: FlowTimer, context: Optional[Dict[str, Any]] = None):
+        self.page = RoundTripCounter(page)
+        self.timer = timer
+        self.context: Dict[str, Any] = context if context is not None else {}
+        self.waits = WaitStrategy(self.page)
+        self._listeners: List[asyncio.Future] = []
+
+    @property
+    def round_trips(self) -> int:
+        return self.page.round_trips
+
+    async def run(self, plan: List[Union[Step, Parallel]]):
+        try:
+            index = 0
+            while index < len(plan):
+                item = plan[index]
+                if isinstance(item, Step) and item.op in Step.BATCHABLE:
+                    batch = [item]
+                    while (index + 1 < len(plan) and isinstance(plan[index + 1], Step)
+                           and plan[index + 1].op in Step.BATCHABLE):
+                        index += 1
+                        batch.append(plan[index])
+                    await self._run_batch(batch)
+                else:
+                    await self._run_item(item)
+                index += 1
+        finally:
+            for listener in self._listeners:
+                listener.cancel()
+            self.timer.round_trips = self.round_trips
+
+    async def _run_item(self, item: Union[Step, Parallel]):
+        if isinstance(item, Parallel):
+            batch = [step for step in item.steps if isinstance(step, Step) and step.op in Step.BATCHABLE]
+            others = [step for step in item.steps if step not in batch]
+            await asyncio.gather(*([self._run_batch(batch)] if batch else []),
+                                 *(self._run_item(step) for step in others))
+            return
+        await self._timed(item.name, item.budget, item.optional, self._execute(item))
+
+    async def _timed(self, name: str, budget: Optional[float], optional: bool, awaitable: Awaitable) -> Any:
+        try:
+            if budget is None:
+                return await awaitable
+            return await self.timer.run(name, awaitable, budget)
+        except Exception as e:
+            if not optional:
+                raise
+            print(f"Warning: optional step '{name}' failed: {e}")
+
+    async def _execute(self, step: Step) -> Any:
+        params = step.params
+        if step.op == "listen":
+            listener = self.waits.response(params["pattern"])
+            started = time.perf_counter()
+
+            def arrived(task: asyncio.Future):
+                # Network-level time, recorded separately from the DOM signals of the flow
+                if not task.cancelled() and task.exception() is None:
+                    self.timer.record(step.name, time.perf_counter() - started)
+            listener.add_done_callback(arrived)
+            self._listeners.append(listener)
+            self.context[step.name] = listener
+            return listener
+        if step.op == "set_files":
+            files = self.context[params["files"]]
+            last_error: Optional[Exception] = None
+            for selector in params["selectors"]:
+                try:
+                    return await self.page.set_input_files(selector, files, timeout=params.get("timeout", 2000))
+                except Exception as e:
+                    print(f"set_input_files failed for {selector}: {e}")
+                    last_error = e
+            raise StepFailed(step.name, f"no file input accepted the files ({last_error})")
+        if step.op == "wait":
+            successes = {label: self._signal(spec) for label, spec in params["successes"].items()}
+            failures = {label: self._signal(spec) for label, spec in params.get("failures", {}).items()}
+            return await self.waits.first(successes, failures)
+        if step.op == "call":
+            result = await params["func"](self)
+            self.context[step.name] = result
+            return result
+        raise ValueError(f"Unknown step op '{step.op}'")
+
+    def _signal(self, spec) -> Awaitable:
+        kind = spec[0]
+        if kind == "selector":
+            return self.waits.selector(spec[1], state=spec[2] if len(spec) > 2 else "visible")
+        if kind == "response":
+            return self._ok(self.context[spec[1]], spec[1])
+        if kind == "url":
+            return asyncio.ensure_future(self.page.wait_for_url(spec[1], timeout=0))
+        raise ValueError(f"Unknown signal '{kind}'")
+
+    @staticmethod
+    async def _ok(response_task: Awaitable, name: str):
+        """Resolves when the response arrives; fails the step at once on a non-2xx status."""
+        response = await asyncio.shield(response_task)
+        if not response.ok:
+            raise StepFailed(name, f"HTTP {response.status} from {response.url}")
+        return response
+
+    def _dom_op(self, step: Step) -> Dict[str, Any]:
+        if step.op == "click_text":
+            return {"op": "click_text", "text": step.params["text"]}
+        return {"op": "fill", "selectors": step.params["selectors"], "value": self.context[step.params["value"]]}
+
+    async def _run_batch(self, batch: List[Step]):
+        name = "+".join(step.name for step in batch)
+        budget = max((step.budget for step in batch if step.budget is not None), default=None)
+        results = await self._timed(name, budget, all(step.optional for step in batch),
+                                    self.page.evaluate(DOM_BATCH_JS, [self._dom_op(step) for step in batch]))
+        # Anything the page-side pass couldn't do goes through regular Playwright actions
+        for step, result in zip(batch, results or [{"ok": False}] * len(batch)):
+            if result.get("ok"):
+                continue
+            print(f"[Plan] '{step.name}' not applied page-side ({result.get('reason')}), using Playwright")
+            await self._timed(f"{step.name}_fallback", step.budget, step.optional, self._playwright_action(step))
+
+    async def _playwright_action(self, step: Step):
+        if step.op == "click_text":
+            return await self.page.click(f"text={step.params['text']}", timeout=(step.budget or 5) * 1000)
+        return await self.page.fill(", ".join(step.params["selectors"]), self.context[step.params["value"]])
+
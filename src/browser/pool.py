@@ -0,0 +1,167 @@
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+from .context import BrowserManager
+from .xhs import XHSOperator
+
+
+class PublishJob:
+    """
+    A single publish request for the browser pool.
+
+    Attributes:
+        title (str): Note title.
+        content (str): Note body.
+        image_paths (list): Ready-to-upload images, in display order.
+        profile (str): Browser profile (user data) directory the job must run in.
+    """
+    def __init__(self, title: str, content: str, image_paths: List[str], profile: str = "user_data/browser_context"):
+        self.title = title
+        self.content = content
+        self.image_paths = image_paths
+        self.profile = os.path.abspath(profile)
+        self.submitted_at = time.perf_counter()
+
+
+class BrowserWorker:
+    """
+    Owns one warm persistent context for a profile directory and runs jobs on it sequentially.
+
+    The context is recycled (closed and relaunched on the next job) after
+    max_jobs jobs, or when the page's JS heap grew by more than max_heap_growth_mb
+    since launch.
+    """
+    def __init__(self, profile: str, headless: bool = False, max_jobs: int = 20, max_heap_growth_mb: float = 300):
+        self.profile = profile
+        self.headless = headless
+        self.max_jobs = max_jobs
+        self.max_heap_growth_mb = max_heap_growth_mb
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.browser_manager: Optional[BrowserManager] = None
+        self.jobs_since_launch = 0
+        self.baseline_heap_mb = 0.0
+        self.logged_in = False
+        self.stats = {"jobs": 0, "failures": 0, "launches": 0, "recycles": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _heap_mb(self) -> float:
+        # performance.memory is Chromium-only, which is the only browser we launch
+        try:
+            used = await self.browser_manager.page.evaluate("performance.memory ? performance.memory.usedJSHeapSize : 0")
+            return used / (1024 * 1024)
+        except Exception:
+            return 0.0
+
+    async def _ensure_launched(self):
+        if self.browser_manager is not None:
+            return
+        print(f"[Pool] Launching browser for profile {self.profile}...")
+        self.browser_manager = BrowserManager(user_data_dir=self.profile, headless=self.headless)
+        await self.browser_manager.launch()
+        self.stats["launches"] += 1
+        self.jobs_since_launch = 0
+        self.logged_in = False
+        self.baseline_heap_mb = await self._heap_mb()
+
+    async def _close(self):
+        if self.browser_manager is not None:
+            manager, self.browser_manager = self.browser_manager, None
+            try:
+                await manager.close()
+            except Exception as e:
+                # A crashed browser may fail to close; the worker must keep serving its queue
+                print(f"[Pool] Closing the context for {self.profile} failed: {e}")
+
+    async def _maybe_recycle(self):
+        growth = await self._heap_mb() - self.baseline_heap_mb
+        if self.jobs_since_launch >= self.max_jobs or growth > self.max_heap_growth_mb:
+            print(f"[Pool] Recycling context for {self.profile} "
+                  f"(jobs={self.jobs_since_launch}, heap growth={growth:.0f}MB)")
+            self.stats["recycles"] += 1
+            await self._close()
+
+    async def _publish(self, job: PublishJob):
+        await self._ensure_launched()
+        xhs = XHSOperator(self.browser_manager.page, self.browser_manager.router,
+                          self.browser_manager.user_data_dir)
+        # The login check costs a full page load, so only do it once per launch
+        if not self.logged_in:
+            if not await xhs.check_login_status():
+                raise RuntimeError(f"Not logged in for profile {self.profile}. Please run 'login' command first.")
+            self.logged_in = True
+        await xhs.publish_note(title=job.title, content=job.content, image_paths=job.image_paths)
+
+    async def _run(self):
+        while True:
+            job, future = await self.queue.get()
+            if job is None:
+                break
+            try:
+                await self._publish(job)
+                self.stats["jobs"] += 1
+                if not future.done():
+                    future.set_result(time.perf_counter() - job.submitted_at)
+            except Exception as e:
+                self.stats["failures"] += 1
+                if not future.done():
+                    future.set_exception(e)
+                # A failed flow can leave the page in any state; start clean next time
+                await self._close()
+            else:
+                self.jobs_since_launch += 1
+                await self._maybe_recycle()
+        await self._close()
+
+    async def stop(self):
+        await self.queue.put((None, None))
+        if self._task:
+            await self._task
+
+
+class BrowserPool:
+    """
+    Resident pool of browser workers, one per profile directory.
+
+    Jobs for the same profile run one after another on the same warm context
+    (a persistent profile cannot be opened twice); different profiles run in parallel.
+    """
+    def __init__(self, headless: bool = False, max_jobs_per_context: int = 20, max_heap_growth_mb: float = 300):
+        self.headless = headless
+        self.max_jobs_per_context = max_jobs_per_context
+        self.max_heap_growth_mb = max_heap_growth_mb
+        self.workers: Dict[str, BrowserWorker] = {}
+
+    def _worker_for(self, profile: str) -> BrowserWorker:
+        worker = self.workers.get(profile)
+        if worker is None:
+            worker = BrowserWorker(profile, headless=self.headless, max_jobs=self.max_jobs_per_context,
+                                   max_heap_growth_mb=self.max_heap_growth_mb)
+            worker.start()
+            self.workers[profile] = worker
+        return worker
+
+    def submit(self, job: PublishJob) -> asyncio.Future:
+        """
+        Queues a job and returns a future resolving to the job's total latency in seconds
+        (or raising the publish error).
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._worker_for(job.profile).queue.put_nowait((job, future))
+        return future
+
+    async def publish(self, job: PublishJob) -> float:
+        return await self.submit(job)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {profile: dict(worker.stats, queued=worker.queue.qsize()) for profile, worker in self.workers.items()}
+
+    async def shutdown(self):
+        """Drains every worker's queue and closes all contexts."""
+        workers: List[BrowserWorker] = list(self.workers.values())
+        await asyncio.gather(*(worker.stop() for worker in workers))
+        self.workers.clear()
@@ -0,0 +1,187 @@
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from playwright.async_api import BrowserContext, Request, Response, Route
+
+# Hosts the creator center itself is served from; anything else is third party
+FIRST_PARTY_HOSTS = ("xiaohongshu.com", "xhscdn.com")
+
+# Analytics / monitoring beacons. Best-effort list: none of these carry data the flows wait on.
+TRACKING_PATTERN = (
+    r"google-analytics\.com|googletagmanager\.com|doubleclick\.net|hm\.baidu\.com|cnzz\.com"
+    r"|sentry|apm-fe\.xiaohongshu\.com|t2\.xiaohongshu\.com|/api/v\d+/(collect|track)|beacon"
+)
+
+# Typical transfer size per resource type, used to estimate bytes saved by blocked
+# requests until real sizes of that type have been observed in this context
+DEFAULT_SIZES = {
+    "image": 40_000, "media": 500_000, "font": 60_000, "script": 80_000,
+    "stylesheet": 30_000, "xhr": 2_000, "fetch": 2_000, "ping": 300, "other": 1_000,
+}
+
+
+class RouteRule:
+    """
+    One allow/deny rule. A request matches when its resource type is in
+    resource_types (None: any type) and its URL matches url_pattern (None: any URL).
+
+    Args:
+        action: "allow" or "block".
+        resource_types: Playwright resource types (document, script, image, font, media, xhr, ...).
+        url_pattern: Regular expression searched in the request URL.
+        third_party: If True, only matches hosts outside FIRST_PARTY_HOSTS.
+    """
+    def __init__(self, action: str, resource_types: Optional[List[str]] = None,
+                 url_pattern: Optional[str] = None, third_party: bool = False):
+        if action not in ("allow", "block"):
+            raise ValueError(f"Unknown rule action '{action}' (expected allow or block)")
+        self.action = action
+        self.resource_types = set(resource_types) if resource_types else None
+        self.url_pattern = url_pattern
+        self._regex = re.compile(url_pattern) if url_pattern else None
+        self.third_party = third_party
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RouteRule":
+        return cls(data["action"], data.get("resource_types"), data.get("url_pattern"), data.get("third_party", False))
+
+    def matches(self, resource_type: str, url: str) -> bool:
+        if self.resource_types is not None and resource_type not in self.resource_types:
+            return False
+        if self.third_party and is_first_party(url):
+            return False
+        return self._regex is None or self._regex.search(url) is not None
+
+
+class RoutingPolicy:
+    """Ordered rules; the first matching rule decides, unmatched requests are allowed."""
+    def __init__(self, name: str, rules: List[RouteRule]):
+        self.name = name
+        self.rules = rules
+
+    @classmethod
+    def from_dict(cls, name: str, data: List[Dict[str, Any]]) -> "RoutingPolicy":
+        return cls(name, [RouteRule.from_dict(rule) for rule in data])
+
+    def allows(self, resource_type: str, url: str) -> bool:
+        for rule in self.rules:
+            if rule.matches(resource_type, url):
+                return rule.action == "allow"
+        return True
+
+
+def is_first_party(url: str) -> bool:
+    host = urlsplit(url).hostname or ""
+    return any(host == suffix or host.endswith("." + suffix) for suffix in FIRST_PARTY_HOSTS)
+
+
+# Presets per automation flow. Every flow drops beacons, media, fonts and third-party scripts;
+# they differ in what the page must still render for the flow to work.
+PRESETS: Dict[str, RoutingPolicy] = {
+    # Manual QR-code login: the user looks at the page, so keep images and styles
+    "login": RoutingPolicy("login", [
+        RouteRule("block", url_pattern=TRACKING_PATTERN),
+        RouteRule("block", ["media", "font"]),
+        RouteRule("block", ["script"], third_party=True),
+    ]),
+    # Session check: only the redirect to /home matters, nothing needs to be seen
+    "check": RoutingPolicy("check", [
+        RouteRule("block", url_pattern=TRACKING_PATTERN),
+        RouteRule("block", ["image", "media", "font", "stylesheet"]),
+        RouteRule("block", ["script"], third_party=True),
+    ]),
+    # Publish form: keep styles (visibility checks depend on layout) and first-party
+    # images (upload previews); everything else decorative goes
+    "publish": RoutingPolicy("publish", [
+        RouteRule("block", url_pattern=TRACKING_PATTERN),
+        RouteRule("block", ["media", "font"]),
+        RouteRule("block", ["image", "script"], third_party=True),
+    ]),
+    "off": RoutingPolicy("off", []),
+}
+
+
+def load_presets(path: str):
+    """
+    Overrides / adds presets from a JSON file:
+    {"publish": [{"action": "block", "resource_types": ["image"]}, ...], ...}
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for name, rules in json.load(f).items():
+            PRESETS[name] = RoutingPolicy.from_dict(name, rules)
+
+
+class RequestRouter:
+    """
+    Request interception for a browser context. One route handler is installed per
+    context; use() switches the active preset as the automation moves between flows.
+
+    Blocked requests never hit the network, so their size is estimated from the average
+    size of allowed responses of the same type (DEFAULT_SIZES until one was seen).
+
+    Attributes:
+        policy (RoutingPolicy): The active preset.
+        stats (dict): Per preset: requests, blocked, bytes_loaded, bytes_saved_est, blocked_by_type.
+    """
+    def __init__(self, preset: str = "publish"):
+        if os.getenv("BROWSER_ROUTING_RULES"):
+            load_presets(os.environ["BROWSER_ROUTING_RULES"])
+        self.policy = PRESETS[preset]
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._sizes: Dict[str, List[int]] = {}
+
+    async def install(self, context: BrowserContext):
+        await context.route("**/*", self._handle)
+        context.on("response", self._on_response)
+
+    def use(self, preset: str):
+        """Switches the active preset (takes effect for the next requests)."""
+        if preset not in PRESETS:
+            raise ValueError(f"Unknown routing preset '{preset}'. Available: {', '.join(PRESETS)}")
+        self.policy = PRESETS[preset]
+
+    def _bucket(self) -> Dict[str, Any]:
+        return self.stats.setdefault(self.policy.name, {
+            "requests": 0, "blocked": 0, "bytes_loaded": 0, "bytes_saved_est": 0, "blocked_by_type": {},
+        })
+
+    def _estimated_size(self, resource_type: str) -> int:
+        seen = self._sizes.get(resource_type)
+        if seen:
+            return sum(seen) // len(seen)
+        return DEFAULT_SIZES.get(resource_type, DEFAULT_SIZES["other"])
+
+    async def _handle(self, route: Route, request: Request):
+        bucket = self._bucket()
+        bucket["requests"] += 1
+        # Never block the page itself or anything the flows wait on (API calls, uploads)
+        if request.resource_type == "document" or self.policy.allows(request.resource_type, request.url):
+            await route.continue_()
+            return
+        bucket["blocked"] += 1
+        bucket["bytes_saved_est"] += self._estimated_size(request.resource_type)
+        by_type = bucket["blocked_by_type"]
+        by_type[request.resource_type] = by_type.get(request.resource_type, 0) + 1
+        await route.abort("blockedbyclient")
+
+    def _on_response(self, response: Response):
+        # content-length is free to read; chunked responses without it are not counted
+        length = response.headers.get("content-length")
+        if not length or not length.isdigit():
+            return
+        size = int(length)
+        self._bucket()["bytes_loaded"] += size
+        samples = self._sizes.setdefault(response.request.resource_type, [])
+        if len(samples) < 200:
+            samples.append(size)
+
+    def summary(self) -> str:
+        parts = []
+        for preset, bucket in self.stats.items():
+            parts.append(f"{preset}: blocked {bucket['blocked']}/{bucket['requests']} requests, "
+                         f"~{bucket['bytes_saved_est'] / 1024:.0f} KB saved, "
+                         f"{bucket['bytes_loaded'] / 1024:.0f} KB loaded {bucket['blocked_by_type']}")
+        return "[Routing] " + ("; ".join(parts) if parts else "no requests")
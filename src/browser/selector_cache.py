@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from playwright.async_api import Page
+
+# JS snippet that builds a structural "skeleton" of the page.
+# Only tag names, input types and roles are used (no text, no classes), so the
+# fingerprint survives content changes and hashed CSS class names but changes
+# when the layout of the page really changes.
+FINGERPRINT_JS = """
+() => {
+    const parts = [];
+    const interactive = 'a,button,input,textarea,select,[contenteditable],[role]';
+    const walk = (el, depth) => {
+        if (depth > 6) return;
+        for (const child of el.children) {
+            parts.push(depth + ':' + child.tagName);
+            walk(child, depth + 1);
+        }
+    };
+    if (document.body) {
+        walk(document.body, 0);
+        for (const el of document.body.querySelectorAll(interactive)) {
+            parts.push(el.tagName + '|' + (el.getAttribute('type') || '') + '|' + (el.getAttribute('role') || ''));
+        }
+    }
+    return parts.join(';');
+}
+"""
+
+
+class SelectorCache:
+    """
+    On-disk cache of selectors resolved by SmartLocator.
+
+    Entries are keyed by (description, URL pattern, DOM fingerprint), so a
+    cached selector is only reused on a page with the same structure.
+
+    Attributes:
+        path (str): JSON file where the cache is persisted.
+        stats (dict): hits / misses / revalidations counters for this process.
+    """
+    _shared: Optional["SelectorCache"] = None
+
+    def __init__(self, path: str = "user_data/selector_cache.json"):
+        self.path = os.path.abspath(path)
+        self.entries: Dict[str, Dict] = {}
+        self.stats = {"hits": 0, "misses": 0, "revalidations": 0}
+        self._load()
+
+    @classmethod
+    def shared(cls) -> "SelectorCache":
+        """Returns the process-wide default cache (lazily created)."""
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[SelectorCache] Ignoring unreadable cache file {self.path}: {e}")
+            self.entries = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Write to a temp file first so a crash never leaves a half-written cache
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    @staticmethod
+    def url_pattern(url: str) -> str:
+        """
+        Normalizes a URL so that pages of the same kind share cache entries.
+        Query strings and fragments are dropped, and id-like path segments
+        (numbers, long hex strings) are replaced with '*'.
+        """
+        parts = urlsplit(url)
+        segments = []
+        for segment in parts.path.split("/"):
+            if re.fullmatch(r"\d+|[0-9a-fA-F]{16,}", segment):
+                segment = "*"
+            segments.append(segment)
+        return f"{parts.netloc}{'/'.join(segments)}"
+
+    @staticmethod
+    async def fingerprint(page: Page) -> str:
+        """Computes a structural fingerprint of the current DOM."""
+        skeleton = await page.evaluate(FINGERPRINT_JS)
+        return hashlib.sha1(skeleton.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_key(description: str, url: str, fingerprint: str) -> str:
+        raw = "\x00".join([description, SelectorCache.url_pattern(url), fingerprint])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+        return entry["selector"] if entry else None
+
+    def put(self, key: str, selector: str, description: str = "", url: str = ""):
+        self.entries[key] = {
+            "selector": selector,
+            "description": description,
+            "url_pattern": self.url_pattern(url) if url else "",
+            "updated_at": time.time(),
+        }
+        self._save()
+
+    def invalidate(self, key: str):
+        if self.entries.pop(key, None) is not None:
+            self._save()
+
+    @staticmethod
+    async def validate(page: Page, selector: str) -> bool:
+        """A selector is valid if it matches exactly one visible element."""
+        try:
+            locator = page.locator(selector)
+            if await locator.count() != 1:
+                return False
+            return await locator.first.is_visible()
+        except Exception:
+            # Invalid CSS from the LLM raises here; treat it as a failed validation
+            return False
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from playwright.async_api import BrowserContext
+
+
+class SessionStateService:
+    """
+    Decides whether the XHS creator session is still valid without loading a page.
+
+    Checks, cheapest first:
+    1. Session cookies of the live context exist and have not expired.
+    2. The session was verified recently (cached timestamp, tied to the cookie values).
+    3. A lightweight authenticated API request.
+    Only when all of these are inconclusive does the caller need a full navigation check.
+
+    Only cookies the context actually sends count: a saved storage state of some other
+    login never vouches for this context.
+
+    Args:
+        context: The browser context to check.
+        profile_dir: The context's user data directory; the verification cache lives in it,
+            so profiles never share (or overwrite) each other's verification. None disables
+            the cache (non-persistent contexts).
+        verify_ttl: Seconds a successful verification is trusted.
+    """
+    # Cookies that carry the creator-center login; any of them being valid is enough
+    SESSION_COOKIES = ("galaxy_creator_session_id", "access-token-creator.xiaohongshu.com", "web_session")
+    PROBE_URL = "https://creator.xiaohongshu.com/api/galaxy/user/info"
+    COOKIE_DOMAIN = "xiaohongshu.com"
+
+    CACHE_FILE = "session_cache.json"
+
+    def __init__(self, context: BrowserContext, profile_dir: Optional[str] = None, verify_ttl: float = 1800):
+        self.context = context
+        self.cache_path = os.path.join(profile_dir, self.CACHE_FILE) if profile_dir else None
+        self.verify_ttl = verify_ttl
+        self.stats = {"cached": 0, "probed": 0, "expired": 0, "inconclusive": 0}
+
+    async def session_cookies(self) -> List[Dict]:
+        """Session cookies of the live context."""
+        cookies = []
+        try:
+            cookies = await self.context.cookies()
+        except Exception as e:
+            print(f"[Session] Could not read cookies from context: {e}")
+        return [c for c in cookies if c.get("name") in self.SESSION_COOKIES and self.COOKIE_DOMAIN in c.get("domain", "")]
+
+    @staticmethod
+    def _unexpired(cookies: List[Dict], margin: float = 60) -> List[Dict]:
+        now = time.time()
+        # expires == -1 means a session cookie, which lives as long as the persistent profile
+        return [c for c in cookies if c.get("expires", -1) < 0 or c["expires"] > now + margin]
+
+    @staticmethod
+    def _fingerprint(cookies: List[Dict]) -> str:
+        raw = "|".join(sorted(f"{c['name']}={c.get('value', '')}" for c in cookies))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _read_cache(self) -> Dict:
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def mark_verified(self, cookies: List[Dict]):
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.cache_path)), exist_ok=True)
+        with open(self.cache_path, "w", encoding="utf-8") as f:
+            json.dump({"verified_at": time.time(), "fingerprint": self._fingerprint(self._unexpired(cookies))}, f)
+
+    def invalidate(self):
+        if self.cache_path and os.path.exists(self.cache_path):
+            os.remove(self.cache_path)
+
+    async def probe(self) -> Optional[bool]:
+        """
+        Cheap authenticated request. Returns True / False when the answer is
+        clear, None when the probe itself was inconclusive.
+        """
+        try:
+            response = await self.context.request.get(self.PROBE_URL, timeout=5000)
+        except Exception as e:
+            print(f"[Session] Probe request failed: {e}")
+            return None
+        if response.status in (401, 403):
+            return False
+        if not response.ok:
+            return None
+        try:
+            body = await response.json()
+        except Exception:
+            return None
+        if body.get("success") is True or body.get("code") == 0:
+            return True
+        if body.get("success") is False:
+            return False
+        return None
+
+    async def check(self) -> Optional[bool]:
+        """
+        Returns True (valid), False (definitely logged out) or None (a full
+        navigation check is needed).
+        """
+        all_cookies = await self.session_cookies()
+        if not all_cookies:
+            # Nothing we recognize; the cookie names may have changed, so let the page decide
+            self.stats["inconclusive"] += 1
+            return None
+        cookies = self._unexpired(all_cookies)
+        if not cookies:
+            self.stats["expired"] += 1
+            print("[Session] All session cookies have expired.")
+            self.invalidate()
+            return False
+
+        cache = self._read_cache()
+        fresh = time.time() - cache.get("verified_at", 0) < self.verify_ttl
+        if fresh and cache.get("fingerprint") == self._fingerprint(cookies):
+            self.stats["cached"] += 1
+            print("[Session] Session verified recently, skipping check.")
+            return True
+
+        self.stats["probed"] += 1
+        valid = await self.probe()
+        if valid:
+            self.mark_verified(cookies)
+        elif valid is False:
+            self.invalidate()
+        else:
+            self.stats["inconclusive"] += 1
+        return valid
@@ -1,73 +1,113 @@
 import os
-from openai import OpenAI
-from playwright.async_api import Page, Locator
-from bs4 import BeautifulSoup
 import re
+from openai import AsyncOpenAI
+from playwright.async_api import Page, Locator
+from typing import Optional
+from .selector_cache import SelectorCache
+from .dom_compactor import DomCompactor, CompactDom, estimate_tokens
+from src.utils.http_clients import get_async_openai_client
+from src.utils.rate_limit import estimate_request_tokens, get_rate_limiter
+from src.content.prompts import LOCATOR_SYSTEM, record_usage
+from src.utils.tracing import span
 
 class SmartLocator:
     """
     Uses LLM (DeepSeek) to find elements on the page using natural language descriptions.
+
+    Resolved selectors are stored in a SelectorCache, so the LLM is only called
+    when the page structure changed or the cached selector no longer validates.
     """
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, cache: Optional[SelectorCache] = None, use_cache: bool = True, token_budget: int = 3000):
         self.page = page
+        self.compactor = DomCompactor(token_budget=token_budget)
+        self.cache = (cache or SelectorCache.shared()) if use_cache else None
         api_key = os.getenv("DEEPSEEK_API_KEY")
         if not api_key:
             raise ValueError("DEEPSEEK_API_KEY not found.")
         
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url="https://api.deepseek.com"
-        )
+        self.api_key = api_key
+        self.base_url = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
         self.model = "deepseek-chat"
 
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Async client: find() runs inside the Playwright event loop and must not block it.
+        # Shared with DeepSeekGenerator, so a new SmartLocator per publish reuses warm connections.
+        return get_async_openai_client(self.base_url, self.api_key)
+
+    @staticmethod
+    def _resolve_answer(answer: str, compact: CompactDom) -> str:
+        """Maps the LLM answer (a node id) back to a CSS selector."""
+        match = re.search(r"e[0-9a-f]{6}", answer)
+        if match and match.group(0) in compact.selectors:
+            return compact.selector_for(match.group(0))
+        # The model ignored the instructions and answered with a selector; use it as-is
+        return answer.replace("```css", "").replace("```", "").strip()
+
     async def find(self, description: str) -> Locator:
         """
         Finds an element based on description.
         """
-        # 1. Get simplified HTML
-        # We only want the body, and we want to strip scripts/styles to save tokens
-        html_content = await self.page.content()
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Remove clutter
-        for tag in soup(['script', 'style', 'svg', 'path', 'meta', 'link', 'noscript']):
-            tag.decompose()
-            
-        # Further simplify: remove comments and empty lines
-        clean_html = "\n".join([line.strip() for line in soup.body.prettify().split("\n") if line.strip()])
-        
-        # Truncate if too long (simple safety mechanism)
-        # DeepSeek has 32k context, but let's be safe and efficient.
-        # If the page is huge, this approach needs refinement (e.g. accessibility tree).
-        if len(clean_html) > 20000:
-            clean_html = clean_html[:20000] + "...(truncated)"
+        with span("smart_locator.find", description=description) as find_span:
+            return await self._find(description, find_span)
+
+    async def _find(self, description: str, find_span) -> Locator:
+        # 0. Try the selector cache first
+        cache_key = None
+        if self.cache is not None:
+            fingerprint = await SelectorCache.fingerprint(self.page)
+            cache_key = SelectorCache.make_key(description, self.page.url, fingerprint)
+            cached = self.cache.get(cache_key)
+            if cached is None:
+                self.cache.stats["misses"] += 1
+                find_span.set(cache="miss")
+            elif await SelectorCache.validate(self.page, cached):
+                self.cache.stats["hits"] += 1
+                find_span.set(cache="hit", selector=cached)
+                print(f"[SmartLocator] Cache hit: '{description}' -> Selector: '{cached}'")
+                return self.page.locator(cached).first
+            else:
+                # Stale entry: drop it and ask the LLM again
+                self.cache.stats["revalidations"] += 1
+                find_span.set(cache="stale")
+                self.cache.invalidate(cache_key)
+                print(f"[SmartLocator] Cached selector '{cached}' no longer valid, re-resolving...")
+
+        # 1. Get a compact, token-budgeted view of the interactive elements
+        compact = await self.compactor.compact(self.page, description)
+        print(f"[SmartLocator] Compacted {compact.total_nodes} nodes to {len(compact.lines)} lines "
+              f"(~{estimate_tokens(compact.text)} tokens)")
+        find_span.set(nodes=compact.total_nodes, lines=len(compact.lines))
 
         # 2. Ask LLM
-        prompt = f"""
-        I have an HTML page. I need to find the CSS selector for an element described as: "{description}".
-        
-        Here is the cleaned HTML of the page:
-        ```html
-        {clean_html}
-        ```
-        
-        Return ONLY the CSS selector. Do not include any explanation or markdown formatting. 
-        If there are multiple matches, choose the most specific and robust one.
-        """
+        # Static instructions go in the system message (a cacheable prefix), page and description last
+        prompt = f"""Elements:
+{compact.text}
+
+Find the element described as: "{description}"."""
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a helpful QA automation engineer. Return only the CSS selector."},
+            with span("llm.call", provider="deepseek", model=self.model) as llm_span:
+                messages = [
+                    {"role": "system", "content": LOCATOR_SYSTEM},
                     {"role": "user", "content": prompt}
                 ]
-            )
-            selector = response.choices[0].message.content.strip()
-            # Clean up if LLM returns code blocks
-            selector = selector.replace("```css", "").replace("```", "").strip()
+                # Same DeepSeek quota as the generators; the limiter owns 429 retries
+                response = await get_rate_limiter("deepseek").acall(
+                    lambda: self.client.with_options(max_retries=0).chat.completions.with_raw_response.create(
+                        model=self.model,
+                        messages=messages
+                    ),
+                    estimate_request_tokens(messages, expected_output=16)
+                )
+                record_usage(llm_span, "deepseek", response.usage)
+            answer = response.choices[0].message.content.strip()
+            selector = self._resolve_answer(answer, compact)
             
             print(f"[SmartLocator] Description: '{description}' -> Selector: '{selector}'")
+            find_span.set(selector=selector)
+            if cache_key is not None and await SelectorCache.validate(self.page, selector):
+                self.cache.put(cache_key, selector, description=description, url=self.page.url)
             return self.page.locator(selector).first
             
         except Exception as e:
@@ -0,0 +1,134 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, List, Optional, Pattern
+
+from playwright.async_api import Page, Response
+
+from src.utils.tracing import get_tracer, span
+
+
+class StepFailed(Exception):
+    """Raised as soon as a step sees an explicit failure signal or runs over its budget."""
+    def __init__(self, step: str, reason: str):
+        super().__init__(f"Step '{step}' failed: {reason}")
+        self.step = step
+        self.reason = reason
+
+
+class FlowTimer:
+    """
+    Runs the steps of a browser flow under per-step latency budgets and records their timings.
+
+    Attributes:
+        flow (str): Name of the flow (e.g. "publish_note").
+        steps (list): One dict per step: name, seconds, budget, status.
+        round_trips (int): Browser protocol round trips of the flow, if counted (see PlanExecutor).
+    """
+    def __init__(self, flow: str):
+        self.flow = flow
+        self.steps: List[Dict[str, Any]] = []
+        self.round_trips: Optional[int] = None
+        self.started_at = time.perf_counter()
+
+    async def run(self, name: str, awaitable: Awaitable, budget: float) -> Any:
+        """
+        Awaits a step, failing it with StepFailed once `budget` seconds have passed.
+        """
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            with span(f"{self.flow}.{name}", budget_s=budget):
+                return await asyncio.wait_for(awaitable, timeout=budget)
+        except asyncio.TimeoutError:
+            status = "over_budget"
+            raise StepFailed(name, f"no completion signal within {budget:.0f}s budget")
+        except Exception:
+            status = "failed"
+            raise
+        finally:
+            self.steps.append({
+                "name": name,
+                "seconds": round(time.perf_counter() - start, 3),
+                "budget": budget,
+                "status": status,
+            })
+
+    def record(self, name: str, seconds: float, status: str = "ok"):
+        """Records a step that was timed elsewhere (e.g. a background signal)."""
+        self.steps.append({"name": name, "seconds": round(seconds, 3), "budget": None, "status": status})
+        get_tracer().record(f"{self.flow}.{name}", seconds * 1000, status=status)
+
+    @property
+    def total_seconds(self) -> float:
+        return round(time.perf_counter() - self.started_at, 3)
+
+    def summary(self) -> str:
+        parts = [f"{step['name']}={step['seconds']:.2f}s" + ("" if step["status"] == "ok" else f"({step['status']})")
+                 for step in self.steps]
+        round_trips = "" if self.round_trips is None else f" round_trips={self.round_trips}"
+        return f"[{self.flow}] total={self.total_seconds:.2f}s{round_trips} " + " ".join(parts)
+
+
+class WaitStrategy:
+    """
+    Signal-based waits for a page: network responses, DOM changes and
+    races between success and failure signals. No fixed sleeps.
+    """
+    def __init__(self, page: Page):
+        self.page = page
+
+    def response(self, url_pattern: Pattern) -> "asyncio.Task[Response]":
+        """
+        Starts listening for the next response whose URL matches. Call this
+        BEFORE triggering the action, then await the returned task.
+        """
+        return asyncio.ensure_future(self.page.wait_for_event(
+            "response", predicate=lambda r: bool(url_pattern.search(r.url)), timeout=0
+        ))
+
+    def selector(self, selector: str, state: str = "visible") -> "asyncio.Task":
+        # Playwright re-checks selectors on DOM mutations; the step budget bounds the wait
+        return asyncio.ensure_future(self.page.wait_for_selector(selector, state=state, timeout=0))
+
+    def condition(self, js_predicate: str) -> "asyncio.Task":
+        """Waits for a JS predicate, re-evaluated on every DOM mutation."""
+        return asyncio.ensure_future(self.page.wait_for_function(js_predicate, polling="mutation", timeout=0))
+
+    @staticmethod
+    async def first(successes: Dict[str, Awaitable], failures: Optional[Dict[str, Awaitable]] = None) -> str:
+        """
+        Waits until one success signal fires and returns its name. Raises
+        StepFailed as soon as a failure signal fires or a success signal raises
+        StepFailed. Other errors are ignored unless all success signals fail. Remaining waits are cancelled.
+        """
+        failures = failures or {}
+        names = {}
+        for name, awaitable in successes.items():
+            names[asyncio.ensure_future(awaitable)] = ("success", name)
+        for name, awaitable in failures.items():
+            names[asyncio.ensure_future(awaitable)] = ("failure", name)
+
+        pending = set(names)
+        last_error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    kind, name = names[task]
+                    if task.cancelled():
+                        continue
+                    if isinstance(task.exception(), StepFailed):
+                        # A signal that knows it failed (e.g. a non-2xx response) fails fast
+                        raise task.exception()
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        continue
+                    if kind == "failure":
+                        raise StepFailed(name, "failure signal observed")
+                    return name
+                if not any(names[task][0] == "success" for task in pending):
+                    break
+            raise StepFailed("wait", f"no success signal fired ({last_error})")
+        finally:
+            for task in pending:
+                task.cancel()
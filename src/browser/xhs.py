@@ -1,21 +1,59 @@
-import asyncio
 import os
+import re
+from typing import List, Optional, Union
 from playwright.async_api import Page
+from .plan import Parallel, PlanExecutor, Step
+from .routing import RequestRouter
+from .waits import FlowTimer
+from .session import SessionStateService
+from src.utils.tracing import span
 
 class XHSOperator:
     """
     Handles operations specific to Xiaohongshu (Little Red Book).
+
+    Args:
+        page: The page to drive.
+        router: Request router of the context, switched per flow.
+        profile_dir: User data directory of the page's persistent context; the saved
+            storage state and the session verification cache are kept per profile in it.
     """
     CREATOR_URL = "https://creator.xiaohongshu.com"
+    PUBLISH_URL = "https://creator.xiaohongshu.com/publish/publish"
     LOGIN_SUCCESS_SELECTOR = "div.avatar-wrapper" # Example selector, might need adjustment
+    FILE_INPUT_SELECTOR = "input[type='file']"
+    TITLE_SELECTOR = "input[placeholder*='标题']"
+    # The body editor: Quill, a plain textarea, or any contenteditable div
+    CONTENT_SELECTORS = [".ql-editor", "#post-textarea", "div[contenteditable='true']"]
+    # Network signals of the publish flow (image upload and note creation endpoints)
+    UPLOAD_URL_PATTERN = re.compile(r"ros-upload\.xiaohongshu\.com|/api/media/.*upload")
+    PUBLISH_URL_PATTERN = re.compile(r"/web_api/sns/v\d+/note")
+    # Per-step latency budgets (seconds) for publish_note
+    BUDGETS = {
+        "open_editor": 15,
+        "switch_tab": 5,
+        "upload_ready": 10,
+        "upload": 60,
+        "fill": 10,
+        "locate_submit": 30,
+        "publish": 20,
+    }
     
-    def __init__(self, page: Page):
+    def __init__(self, page: Page, router: Optional[RequestRouter] = None, profile_dir: Optional[str] = None):
         self.page = page
+        self.router = router
+        self.profile_dir = profile_dir
+
+    def _route(self, preset: str):
+        """Switches request routing to the preset for the flow about to run."""
+        if self.router:
+            self.router.use(preset)
 
     async def login(self):
         """
         Navigates to the creator center and waits for the user to log in manually.
         """
+        self._route("login")
         print(f"Navigating to {self.CREATOR_URL}...")
         await self.page.goto(self.CREATOR_URL)
         
@@ -47,7 +85,7 @@ class XHSOperator:
             print("Login successful.")
             
             # Save storage state explicitly as a backup (though persistent context handles it mostly)
-            state_path = "user_data/xhs_state.json"
+            state_path = os.path.join(self.profile_dir or "user_data", "xhs_state.json")
             await self.page.context.storage_state(path=state_path)
             print(f"Session state saved to {state_path}")
             
@@ -55,10 +93,29 @@ class XHSOperator:
             print(f"Login timed out or failed: {e}")
             raise e
 
-    async def check_login_status(self) -> bool:
+    async def check_login_status(self, force_navigation: bool = False) -> bool:
         """
         Checks if the current session is valid.
+
+        Uses SessionStateService (cookie expiry, cached verification, a cheap API probe)
+        and only falls back to loading the creator home page when those are inconclusive.
         """
+        self._route("check")
+        with span("check_login_status") as login_span:
+            valid = await self._check_login_status(force_navigation, login_span)
+            login_span.set(valid=valid)
+            return valid
+
+    async def _check_login_status(self, force_navigation: bool, login_span) -> bool:
+        session = SessionStateService(self.page.context, self.profile_dir)
+        if not force_navigation:
+            valid = await session.check()
+            if valid is not None:
+                print(f"Login check {'passed' if valid else 'failed'} without page load.")
+                login_span.set(method="session")
+                return valid
+
+        login_span.set(method="navigation")
         print(f"Checking login status at {self.CREATOR_URL}...")
         try:
             await self.page.goto(self.CREATOR_URL)
@@ -67,98 +124,101 @@ class XHSOperator:
             # URL can be /creator/home or /new/home
             await self.page.wait_for_url(lambda url: "/home" in url, timeout=15000)
             print("Login check passed: URL is at creator home.")
+            session.mark_verified(await session.session_cookies())
             return True
         except Exception as e:
             print(f"Login check failed. Current URL: {self.page.url}")
             print(f"Error details: {e}")
+            session.invalidate()
             return False
 
-    async def publish_note(self, title: str, content: str, image_path: str):
+    async def publish_note(self, title: str, content: str, image_paths: List[str]) -> FlowTimer:
         """
-        Publishes a note with the given title, content, and image.
+        Publishes a note with the given title, content, and images (in display order).
+
+        Every step waits on the real signal (network response, DOM change) under
+        its own latency budget, and fails immediately on an explicit failure signal.
+        Returns the FlowTimer with the per-step timings and the number of browser round trips.
         """
-        print("Starting publish process...")
-        
-        # 1. Go to Creator Home if not already there
-        if "/home" not in self.page.url:
-            await self.page.goto(self.CREATOR_URL)
-            await self.page.wait_for_selector("text=发布笔记")
+        timer = FlowTimer("publish_note")
+        self._route("publish")
+        with span("publish_note", title=title, images=len(image_paths)) as publish_span:
+            try:
+                await self._publish_steps(title, content, image_paths, timer)
+            finally:
+                publish_span.set(round_trips=timer.round_trips)
+        return timer
 
-        # 2. Click "Publish Note" button
-        print("Clicking 'Publish Note'...")
-        # There might be a specific button or a side menu. 
-        # Usually it's a big button or a menu item "发布笔记"
-        await self.page.click("text=发布笔记")
-        
-        # 3. Handle Image Upload
-        print(f"Uploading image: {image_path}...")
-        await self.page.wait_for_url("**/publish/publish**")
-        
-        # CRITICAL: Switch to "上传图文" (Image/Text) tab
-        # The default might be Video, so we must switch.
-        print("Switching to '上传图文' tab...")
-        try:
-            # Try to click the tab. Selector might vary, checking text is safest.
-            await self.page.click("text=上传图文")
-            # Wait for the image upload area to be ready (e.g. "拖拽图片" or similar text, or just a short sleep)
-            await asyncio.sleep(2) 
-        except Exception as e:
-            print(f"Warning: Could not switch tab (maybe already there?): {e}")
+    def _publish_plan(self) -> List[Union[Step, Parallel]]:
+        """
+        The publish flow as declared steps. Fills (and the tab click) run page-side in
+        batches. The submit button is located before the fills: SmartLocator keys its
+        selector cache on a DOM fingerprint, which must not be taken while the editor
+        is still changing.
+        """
+        return [
+            Step("open_editor", "call", self.BUDGETS["open_editor"], func=self._open_editor),
+            # The default tab might be Video, so switch to "上传图文" (Image/Text); it may already be active
+            Step("switch_tab", "click_text", self.BUDGETS["switch_tab"], optional=True, text="上传图文"),
+            # Instead of a fixed sleep, wait until the image input is actually in the DOM
+            Step("upload_ready", "wait", self.BUDGETS["upload_ready"],
+                 successes={"file_input": ("selector", self.FILE_INPUT_SELECTOR, "attached")}),
+            Step("upload_response", "listen", pattern=self.UPLOAD_URL_PATTERN),
+            # Set the files directly on the (hidden) input, preferring the one that accepts images
+            Step("set_input_files", "set_files", files="image_paths",
+                 selectors=["input[accept*='image']", self.FILE_INPUT_SELECTOR]),
+            # The title input appears once the upload was accepted and we are in edit mode.
+            # An upload error shows up as a toast, so fail on it right away instead of running out the clock.
+            Step("upload", "wait", self.BUDGETS["upload"],
+                 successes={"editor_ready": ("selector", self.TITLE_SELECTOR)},
+                 failures={"upload_failed": ("selector", "text=上传失败")}),
+            Step("locate_submit", "call", self.BUDGETS["locate_submit"], func=self._locate_submit),
+            Parallel(
+                Step("fill_title", "fill", self.BUDGETS["fill"], selectors=[self.TITLE_SELECTOR], value="title"),
+                Step("fill_content", "fill", self.BUDGETS["fill"], selectors=self.CONTENT_SELECTORS, value="content"),
+            ),
+            Step("publish_response", "listen", pattern=self.PUBLISH_URL_PATTERN),
+            Step("click_submit", "call", func=self._click_submit),
+            # Either the publish API answers 2xx or the success toast shows up; an error response fails at once
+            Step("publish", "wait", self.BUDGETS["publish"],
+                 successes={"publish_response": ("response", "publish_response"),
+                            "success_toast": ("selector", "text=发布成功")},
+                 failures={"publish_failed": ("selector", "text=发布失败")}),
+        ]
 
-        # Upload file
-        # We use set_input_files directly on the input element. 
-        # We don't use expect_file_chooser because we are not clicking a button to open a dialog,
-        # we are directly setting the file on the hidden input.
-        try:
-            # Try to find the file input. 
-            # XHS might have multiple, we want the one that accepts images.
-            await self.page.set_input_files("input[type='file']", image_path)
-        except Exception as e:
-            print(f"Upload failed with generic selector, trying specific accept attribute: {e}")
-            # Fallback: try to find input with accept image
-            await self.page.set_input_files("input[accept*='image']", image_path)
-
-        print("Image uploaded. Waiting for editor to load...")
-        # Wait for the title input to appear. This indicates the upload was accepted and we are in edit mode.
-        # The previous selector .file-list might be outdated or dynamic.
-        await self.page.wait_for_selector("input[placeholder*='标题']", timeout=60000)
-        
-        # 4. Fill Title
-        print(f"Filling title: {title}...")
-        # Selector for title input. Usually has placeholder "填写标题..."
-        await self.page.fill("input[placeholder*='标题']", title)
-        
-        # 5. Fill Content
-        print("Filling content...")
-        # Selector for content editor. Usually a div with contenteditable or specific class.
-        # XHS often uses a div with id="post-textarea" or similar, or just look for placeholder "填写正文"
-        await self.page.fill(".ql-editor, #post-textarea, div[contenteditable='true']", content)
-        
-        # 6. Click Publish
-        print("Clicking Publish button...")
-        
+    async def _open_editor(self, executor: PlanExecutor):
+        page = executor.page
+        if "/home" in page.url:
+            # Usually a big button or a menu item "发布笔记"
+            print("Clicking 'Publish Note'...")
+            await page.click("text=发布笔记")
+            await page.wait_for_url("**/publish/publish**", timeout=0)
+        elif "/publish/publish" not in page.url:
+            # The login check may have skipped the home page; go straight to the editor
+            await page.goto(self.PUBLISH_URL)
+
+    async def _locate_submit(self, executor: PlanExecutor):
         # --- AGENTIC WORKFLOW DEMO ---
         # Instead of hardcoded selector, we use SmartLocator
         from src.browser.smart_locator import SmartLocator
-        smart = SmartLocator(self.page)
-        
         print("[Agent] Asking AI to find the 'Publish' button...")
         # We describe what we want, not how to find it
-        submit_btn = await smart.find("The main submit button that says '发布' or 'Post'")
-        
-        if await submit_btn.count() > 0:
-            await submit_btn.click()
-        else:
+        return await SmartLocator(executor.page).find("The main submit button that says '发布' or 'Post'")
+
+    async def _click_submit(self, executor: PlanExecutor):
+        submit_btn = executor.context["locate_submit"]
+        if submit_btn is None or await submit_btn.count() == 0:
             print("[Agent] AI failed to find button, falling back to hardcoded selector.")
-            submit_btn = self.page.locator("button.submit, button:has-text('发布')").last
-            await submit_btn.click()
-        # -----------------------------
-        
+            submit_btn = executor.page.locator("button.submit, button:has-text('发布')").last
+        await submit_btn.click()
         print("Publish clicked. Waiting for success...")
-        # 7. Wait for success
-        # Usually redirects to success page or shows a toast
+
+    async def _publish_steps(self, title: str, content: str, image_paths: List[str], timer: FlowTimer):
+        print("Starting publish process...")
+        print(f"Uploading {len(image_paths)} image(s): {', '.join(image_paths)}...")
+        executor = PlanExecutor(self.page, timer, {"title": title, "content": content, "image_paths": image_paths})
         try:
-            await self.page.wait_for_selector("text=发布成功", timeout=10000)
+            await executor.run(self._publish_plan())
             print("Publish Successful!")
-        except:
-            print("Warning: Did not see 'Publish Successful' message, but button was clicked. Check browser.")
+        finally:
+            print(timer.summary())
@@ -0,0 +1,151 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Union
+
+from PIL import Image, ImageOps
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".gif"}
+
+
+def process_image(src_path: str, out_path: str, max_width: int, max_height: int, max_bytes: int) -> str:
+    """
+    Resizes an image to fit max_width x max_height and re-encodes it as JPEG,
+    lowering the quality until it fits into max_bytes.
+
+    Module-level so it can run in a ProcessPoolExecutor worker.
+    """
+    with Image.open(src_path) as img:
+        # Respect the camera orientation before resizing, then drop the EXIF blob
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha channel: flatten onto white
+            rgba = img.convert("RGBA")
+            img = Image.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.split()[-1])
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+        img.thumbnail((max_width, max_height), Image.LANCZOS)
+
+        data = b""
+        for quality in (88, 80, 72, 64, 56, 48):
+            buffer = io.BytesIO()
+            img.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+            data = buffer.getvalue()
+            if len(data) <= max_bytes:
+                break
+        else:
+            print(f"[Assets] {src_path} is still {len(data)} bytes at the lowest quality "
+                  f"(limit {max_bytes}); the upload may be rejected.")
+
+    # Write to a temp file first so a half-written file is never taken for a cache hit.
+    # The name is unique: another process may be writing the same output right now.
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(out_path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return out_path
+
+
+class AssetPipeline:
+    """
+    Prepares images for upload: resize + recompress in a process pool, with
+    results cached by content hash so a reused image is only processed once.
+
+    Attributes:
+        cache_dir (str): Where processed images are stored.
+        max_width / max_height (int): Target bounding box (XHS displays 3:4 at 1080x1440).
+        max_bytes (int): Size limit for each processed image.
+        stats (dict): processed / cache_hits counters for this process.
+    """
+    # XHS accepts up to 18 images per note
+    MAX_IMAGES = 18
+
+    def __init__(self, cache_dir: str = "user_data/asset_cache", max_width: int = 1080, max_height: int = 1440,
+                 max_bytes: int = 1_000_000, max_workers: Optional[int] = None):
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_width = max_width
+        self.max_height = max_height
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        self.stats = {"processed": 0, "cache_hits": 0}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Concurrent prepare() calls for the same content share one processing task
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def collect(inputs: Union[str, Iterable[str]]) -> List[str]:
+        """
+        Expands a directory, a single file or a list of both into image file paths.
+        Files inside a directory are taken in name order.
+        """
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        paths = []
+        for item in inputs:
+            if os.path.isdir(item):
+                for name in sorted(os.listdir(item)):
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                        paths.append(os.path.abspath(os.path.join(item, name)))
+            elif os.path.exists(item):
+                paths.append(os.path.abspath(item))
+            else:
+                raise FileNotFoundError(f"Image not found at {item}")
+        return paths
+
+    def _cache_key(self, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        # The target spec is part of the key, so changing limits re-processes images
+        digest.update(f"{self.max_width}x{self.max_height}:{self.max_bytes}".encode("utf-8"))
+        return digest.hexdigest()
+
+    async def _prepare_one(self, path: str) -> str:
+        key = await asyncio.to_thread(self._cache_key, path)
+        out_path = os.path.join(self.cache_dir, key + ".jpg")
+        if os.path.exists(out_path):
+            self.stats["cache_hits"] += 1
+            return out_path
+
+        future = self._in_flight.get(key)
+        if future is None:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, process_image, path, out_path,
+                                          self.max_width, self.max_height, self.max_bytes)
+            self._in_flight[key] = future
+            self.stats["processed"] += 1
+        else:
+            self.stats["cache_hits"] += 1
+        try:
+            return await future
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def prepare(self, inputs: Union[str, Iterable[str]]) -> List[str]:
+        """
+        Returns ready-to-upload file paths for the given images, in input order.
+        """
+        paths = self.collect(inputs)
+        if not paths:
+            raise ValueError("No images to prepare")
+        if len(paths) > self.MAX_IMAGES:
+            print(f"[Assets] {len(paths)} images given, only the first {self.MAX_IMAGES} will be used.")
+            paths = paths[:self.MAX_IMAGES]
+        return list(await asyncio.gather(*(self._prepare_one(path) for path in paths)))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
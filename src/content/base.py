@@ -1,5 +1,9 @@
+import asyncio
+import json
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, List, Optional
+
+from .output_parser import POST_SCHEMA
 
 class ContentGenerator(ABC):
     """
@@ -22,3 +26,67 @@ class ContentGenerator(ABC):
             - image_prompt: str (optional)
         """
         pass
+
+    def cache_key_parts(self, topic: str) -> Dict[str, Any]:
+        """
+        Describes everything that determines the output for a topic:
+        provider, model, the fully rendered prompt and generation params.
+        Used by CachedGenerator to build content-addressed cache keys.
+        """
+        return {
+            "provider": type(self).__name__,
+            "model": None,
+            "prompt": topic,
+            "params": {},
+        }
+
+    async def agenerate(self, topic: str) -> Dict[str, Any]:
+        """
+        Async version of generate(), safe to call from inside the event loop.
+
+        The default implementation runs generate() in a worker thread so it never
+        blocks the loop. Providers with a native async client should override it.
+        """
+        return await asyncio.to_thread(self.generate, topic)
+
+    async def astream(self, topic: str, feedback: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Yields the raw model output in chunks as they arrive; feed the joined
+        text to parse_output() to get the result dict.
+
+        Providers that validate while streaming raise MalformedOutput mid-stream;
+        `feedback` is then the retry instruction to send along with the prompt.
+
+        The default implementation has nothing to stream and yields the whole
+        agenerate() result as one JSON chunk. Errors are raised, not turned into placeholders.
+        """
+        result = await self.agenerate(topic)
+        yield json.dumps(result, ensure_ascii=False)
+
+    def parse_output(self, topic: str, text: str) -> Dict[str, Any]:
+        """Turns the complete streamed text into the result dict."""
+        return json.loads(text)
+
+
+def error_result(topic: str, error: Exception) -> Dict[str, Any]:
+    """The placeholder dict returned when a provider call fails."""
+    return {
+        "title": f"Error generating for {topic}",
+        "content": f"Failed to generate content. Error: {str(error)}",
+        "image_prompt": "Error icon"
+    }
+
+
+def is_error_result(result: Dict[str, Any]) -> bool:
+    """True for the placeholder dict the wrappers return when a provider call fails."""
+    return str(result.get("title", "")).startswith("Error generating for")
+
+
+def result_problems(result: Any) -> List[str]:
+    """
+    Schema check for a generated post (POST_SCHEMA, the same rules the streaming parser
+    enforces). Returns what is wrong with it (an empty list means the result is usable).
+    """
+    if isinstance(result, dict) and is_error_result(result):
+        return ["provider returned the error placeholder"]
+    return POST_SCHEMA.validate(result)
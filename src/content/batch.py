@@ -0,0 +1,186 @@
+import asyncio
+import json
+import sys
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, Optional, TextIO, Union
+
+from .base import ContentGenerator, is_error_result
+from .dedup import NearDuplicateIndex
+from src.utils.stats import summarize_latencies
+
+
+def read_topics(source: Iterable[str]) -> Iterator[str]:
+    """
+    Yields one topic per non-empty line. Lines starting with '#' are comments.
+    The source is consumed lazily, so huge files are never loaded at once.
+    """
+    for line in source:
+        topic = line.strip()
+        if topic and not topic.startswith("#"):
+            yield topic
+
+
+async def aread_topics(source: TextIO) -> AsyncIterator[str]:
+    """
+    read_topics() for a source whose reads may block, such as stdin fed from a pipe:
+    each line is read in a worker thread, so generations in flight keep running meanwhile.
+    """
+    while True:
+        line = await asyncio.to_thread(source.readline)
+        if not line:
+            return
+        for topic in read_topics([line]):
+            yield topic
+
+
+class BatchRunner:
+    """
+    Runs one ContentGenerator over many topics with bounded concurrency.
+
+    Each result is written to the output as a JSON line as soon as it completes
+    (so output order follows completion order, not input order).
+
+    With a NearDuplicateIndex, a topic that is a near-duplicate of one produced before
+    (in this run or an earlier one) costs no provider call: its record reuses the earlier
+    result ("reuse") or only notes the duplicate ("skip"). Generated posts that come out
+    nearly identical to an earlier post are flagged with content_duplicate_of.
+
+    Attributes:
+        generator (ContentGenerator): Strategy used for every topic.
+        concurrency (int): Maximum number of generations in flight.
+        dedup (NearDuplicateIndex): Index of produced topics and posts, None to disable.
+        dedup_mode (str): "reuse" or "skip".
+    """
+    def __init__(self, generator: ContentGenerator, concurrency: int = 8,
+                 dedup: Optional[NearDuplicateIndex] = None, dedup_mode: str = "reuse"):
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        if dedup_mode not in ("reuse", "skip"):
+            raise ValueError(f"Unknown dedup mode '{dedup_mode}' (expected reuse or skip)")
+        self.generator = generator
+        self.concurrency = concurrency
+        self.dedup = dedup
+        self.dedup_mode = dedup_mode
+        # Index entry id -> result of a generation still in flight, for near-duplicates arriving meanwhile
+        self._pending: Dict[int, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+
+    async def _generate_one(self, index: int, topic: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        record: Dict[str, Any] = {"index": index, "topic": topic}
+        try:
+            if self.dedup is None:
+                record["result"] = await self.generator.agenerate(topic)
+            else:
+                await self._generate_deduplicated(topic, record)
+        except Exception as e:
+            record["error"] = str(e)
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 2)
+        return record
+
+    async def _generate_deduplicated(self, topic: str, record: Dict[str, Any]):
+        match = self.dedup.find_topic(topic)
+        if match is not None:
+            result = match["result"]
+            if result is None and match["id"] in self._pending:
+                result = await asyncio.shield(self._pending[match["id"]])
+            if result is not None:
+                record["duplicate_of"] = {"topic": match["topic"], "similarity": match["similarity"]}
+                if self.dedup_mode == "reuse":
+                    record["result"] = result
+                else:
+                    record["skipped"] = True
+                return
+            # The earlier generation failed (or was interrupted in another run): generate after all
+
+        entry_id = self.dedup.add(topic)
+        pending = asyncio.get_running_loop().create_future()
+        self._pending[entry_id] = pending
+        result = None
+        try:
+            result = await self.generator.agenerate(topic)
+            record["result"] = result
+            if not is_error_result(result):
+                duplicate = self.dedup.find_content(result, exclude=entry_id)
+                if duplicate is not None:
+                    record["content_duplicate_of"] = {"topic": duplicate["topic"],
+                                                      "similarity": duplicate["similarity"]}
+        finally:
+            # Waiters are released first: an index write that fails must not leave them hanging
+            pending.set_result(None if result is None or is_error_result(result) else result)
+            del self._pending[entry_id]
+            # Error placeholders and failures drop the entry, so the topic is retried next time
+            if result is None:
+                self.dedup.remove(entry_id)
+            else:
+                self.dedup.set_result(entry_id, result)
+
+    async def run(self, topics: Union[Iterable[str], AsyncIterable[str]], output: TextIO) -> Dict[str, Any]:
+        """
+        Processes all topics (an iterable, or an async iterable such as aread_topics())
+        and returns a summary with latency and throughput.
+        """
+        # Bounded queue: the reader never gets more than a few items ahead of the workers
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        latencies = []
+        errors = 0
+        deduplicated = {"reused": 0, "skipped": 0, "content_duplicates": 0}
+
+        async def producer():
+            if isinstance(topics, AsyncIterable):
+                index = 0
+                async for topic in topics:
+                    await queue.put((index, topic))
+                    index += 1
+            else:
+                for index, topic in enumerate(topics):
+                    await queue.put((index, topic))
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def worker():
+            nonlocal errors
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                record = await self._generate_one(*item)
+                latencies.append(record["latency_ms"])
+                if "error" in record:
+                    errors += 1
+                if "duplicate_of" in record:
+                    deduplicated["skipped" if record.get("skipped") else "reused"] += 1
+                if "content_duplicate_of" in record:
+                    deduplicated["content_duplicates"] += 1
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+
+        start = time.perf_counter()
+        await asyncio.gather(producer(), *(worker() for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - start
+
+        summary = {
+            "items": len(latencies),
+            "errors": errors,
+            "concurrency": self.concurrency,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+            "latency_ms": summarize_latencies(latencies),
+        }
+        if self.dedup is not None:
+            summary["dedup"] = deduplicated
+        return summary
+
+
+def print_summary(summary: Dict[str, Any], stream: Optional[TextIO] = None):
+    """Prints a batch summary (to stderr by default, so it never mixes with JSONL on stdout)."""
+    stream = stream or sys.stderr
+    latency = summary["latency_ms"]
+    print("\n" + "="*30, file=stream)
+    print(f"Items: {summary['items']} (errors: {summary['errors']}, concurrency: {summary['concurrency']})", file=stream)
+    print(f"Elapsed: {summary['elapsed_s']}s, throughput: {summary['throughput_per_s']} items/s", file=stream)
+    print(f"Latency ms: p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} max={latency['max']}", file=stream)
+    if "dedup" in summary:
+        dedup = summary["dedup"]
+        print(f"Near-duplicates: {dedup['reused']} reused, {dedup['skipped']} skipped, "
+              f"{dedup['content_duplicates']} generated posts similar to earlier ones", file=stream)
+    print("="*30, file=stream)
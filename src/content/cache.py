@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .base import ContentGenerator, is_error_result
+
+
+class ResponseCache:
+    """
+    SQLite-backed store for generated content with TTL and LRU eviction.
+
+    Attributes:
+        path (str): SQLite database file.
+        ttl (float): Seconds an entry stays valid (0 or less means no expiry).
+        max_entries (int): Size bound; least recently used entries are evicted beyond it.
+        stats (dict): hits / misses / expired / evictions counters for this process.
+    """
+    def __init__(self, path: str = "user_data/generation_cache.sqlite3", ttl: float = 7 * 24 * 3600, max_entries: int = 10000):
+        self.path = os.path.abspath(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # agenerate() may call us from worker threads, so share one connection behind a lock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(parts: Dict[str, Any]) -> str:
+        """Content-addressed key: sha256 of the canonical JSON of the key parts."""
+        canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            value, created_at = row
+            if self.ttl > 0 and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.stats["hits"] += 1
+        return json.loads(value)
+
+    def put(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (overflow,),
+            )
+            self.stats["evictions"] += overflow
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedGenerator(ContentGenerator):
+    """
+    Decorator that adds a response cache in front of any ContentGenerator.
+
+    Attributes:
+        inner (ContentGenerator): The wrapped strategy.
+        cache (ResponseCache): Where results are stored.
+        bypass (bool): If True, always call the provider (results are still stored,
+            so this acts as a cache refresh).
+    """
+    def __init__(self, inner: ContentGenerator, cache: Optional[ResponseCache] = None, bypass: bool = False):
+        self.inner = inner
+        self.cache = cache or ResponseCache()
+        self.bypass = bypass
+
+    def cache_key_parts(self, topic: str) -> Dict[str, Any]:
+        return self.inner.cache_key_parts(topic)
+
+    def _lookup(self, topic: str):
+        key = ResponseCache.make_key(self.inner.cache_key_parts(topic))
+        if self.bypass:
+            return key, None
+        return key, self.cache.get(key)
+
+    def _store(self, key: str, result: Dict[str, Any]):
+        # Never cache the placeholder returned on provider errors
+        if not is_error_result(result):
+            self.cache.put(key, result)
+
+    def generate(self, topic: str) -> Dict[str, Any]:
+        key, cached = self._lookup(topic)
+        if cached is not None:
+            return cached
+        result = self.inner.generate(topic)
+        self._store(key, result)
+        return result
+
+    async def agenerate(self, topic: str) -> Dict[str, Any]:
+        key, cached = self._lookup(topic)
+        if cached is not None:
+            return cached
+        result = await self.inner.agenerate(topic)
+        self._store(key, result)
+        return result
+
+    def parse_output(self, topic: str, text: str) -> Dict[str, Any]:
+        return self.inner.parse_output(topic, text)
+
+    async def astream(self, topic: str, feedback: Optional[str] = None) -> AsyncIterator[str]:
+        key, cached = self._lookup(topic)
+        # A retry means the previous answer was rejected: never serve it from the cache
+        if cached is not None and feedback is None:
+            yield json.dumps(cached, ensure_ascii=False)
+            return
+        chunks = []
+        async for chunk in self.inner.astream(topic, feedback):
+            chunks.append(chunk)
+            yield chunk
+        self._store(key, self.inner.parse_output(topic, "".join(chunks)))
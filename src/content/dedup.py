@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional
+
+from .base import is_error_result
+
+# Mersenne prime for the universal hash family of the MinHash permutations
+_PRIME = (1 << 61) - 1
+_MASK32 = 0xFFFFFFFF
+# Everything that isn't a letter, digit or CJK character (punctuation, emoji, spaces)
+_NOISE = re.compile(r"[\W_]+", re.UNICODE)
+
+TOPIC = "topic"
+CONTENT = "content"
+
+
+def shingles(text: str, size: int = 2) -> List[str]:
+    """
+    Character n-grams of the normalized text. Characters rather than words, since
+    Chinese has no spaces; bigrams keep short topics comparable when a word or number
+    changes. Case, punctuation, emoji and whitespace are ignored, unless that is all the
+    text has (e.g. "???" or a row of emoji): then the stripped text itself is shingled.
+    """
+    normalized = _NOISE.sub("", text.lower()) or "".join(text.lower().split())
+    if len(normalized) <= size:
+        return [normalized] if normalized else []
+    return list({normalized[i:i + size] for i in range(len(normalized) - size + 1)})
+
+
+def similarity(a: bytes, b: bytes) -> float:
+    """Estimated Jaccard similarity: the share of equal MinHash positions."""
+    left, right = array("I", a), array("I", b)
+    return sum(1 for x, y in zip(left, right) if x == y) / len(left)
+
+
+class NearDuplicateIndex:
+    """
+    MinHash / LSH index of past topics and generated posts, answering "have we effectively
+    produced this already?" without a provider call.
+
+    Topics and contents get separate MinHash signatures. Each signature is cut into bands;
+    entries sharing any band bucket are candidates, confirmed by their estimated Jaccard
+    similarity. Band buckets live in an indexed SQLite table, so a lookup is one index query
+    plus a few signature comparisons however many entries there are, and nothing has to be
+    loaded into memory at startup.
+
+    Args:
+        path: SQLite database file.
+        topic_threshold: Similarity from which a topic counts as a near-duplicate.
+        content_threshold: Same for generated content.
+        num_perm: MinHash signature length.
+        bands: LSH bands (num_perm must be divisible by it). More bands find lower similarities.
+        shingle_size: Characters per shingle.
+
+    Attributes:
+        stats (dict): lookups, topic_hits, content_hits, added, lookup_ms (total).
+    """
+    def __init__(self, path: str = "user_data/dedup.sqlite3", topic_threshold: float = 0.7,
+                 content_threshold: float = 0.8, num_perm: int = 64, bands: int = 16, shingle_size: int = 2):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.path = os.path.abspath(path)
+        self.topic_threshold = topic_threshold
+        self.content_threshold = content_threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        # Fixed seed: signatures must stay comparable across runs
+        rng = random.Random(1)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        # Signature of a text with no shingles (blank): never indexed, never matched
+        self._blank = array("I", [_MASK32] * num_perm).tobytes()
+        self.stats = {"lookups": 0, "topic_hits": 0, "content_hits": 0, "added": 0, "lookup_ms": 0.0}
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                topic TEXT NOT NULL,
+                topic_sig BLOB NOT NULL,
+                content_sig BLOB,
+                result TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS buckets (
+                key INTEGER NOT NULL,
+                entry_id INTEGER NOT NULL,
+                PRIMARY KEY (key, entry_id)
+            ) WITHOUT ROWID;
+        """)
+        self._check_params()
+        self._conn.commit()
+
+    def _check_params(self):
+        params = json.dumps({"num_perm": self.num_perm, "bands": self.bands, "shingle_size": self.shingle_size})
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if row is None:
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('params', ?)", (params,))
+        elif row["value"] != params:
+            raise ValueError(f"Index {self.path} was built with {row['value']}; signatures are not comparable")
+
+    def signature(self, text: str) -> bytes:
+        values = [_MASK32] * self.num_perm
+        for shingle in shingles(text, self.shingle_size):
+            base = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+            for i, (a, b) in enumerate(self._perms):
+                hashed = ((a * base + b) % _PRIME) & _MASK32
+                if hashed < values[i]:
+                    values[i] = hashed
+        return array("I", values).tobytes()
+
+    def _bucket_keys(self, kind: str, sig: bytes) -> List[int]:
+        width = self.rows * 4
+        return [
+            int.from_bytes(hashlib.blake2b(f"{kind}:{band}:".encode() + sig[band * width:(band + 1) * width],
+                                           digest_size=8).digest(), "little", signed=True)
+            for band in range(self.bands)
+        ]
+
+    def _index(self, kind: str, sig: bytes, entry_id: int):
+        if sig != self._blank:
+            self._conn.executemany("INSERT OR IGNORE INTO buckets (key, entry_id) VALUES (?, ?)",
+                                   [(key, entry_id) for key in self._bucket_keys(kind, sig)])
+
+    def _best_match(self, kind: str, sig: bytes, threshold: float, exclude: Optional[int]) -> Optional[Dict[str, Any]]:
+        if sig == self._blank:
+            return None
+        keys = self._bucket_keys(kind, sig)
+        column = "topic_sig" if kind == TOPIC else "content_sig"
+        rows = self._conn.execute(
+            f"SELECT DISTINCT e.id, e.topic, e.{column} AS sig, e.result FROM buckets b"
+            f" JOIN entries e ON e.id = b.entry_id WHERE b.key IN ({','.join('?' * len(keys))})",
+            keys,
+        ).fetchall()
+        best = None
+        for row in rows:
+            if row["id"] == exclude or row["sig"] is None:
+                continue
+            score = similarity(sig, row["sig"])
+            if score >= threshold and (best is None or score > best["similarity"]):
+                best = {"id": row["id"], "topic": row["topic"], "similarity": round(score, 3),
+                        "result": json.loads(row["result"]) if row["result"] else None}
+        return best
+
+    def _lookup(self, kind: str, text: str, threshold: float, exclude: Optional[int]) -> Optional[Dict[str, Any]]:
+        start = time.perf_counter()
+        sig = self.signature(text)
+        with self._lock:
+            match = self._best_match(kind, sig, threshold, exclude)
+            self.stats["lookups"] += 1
+            self.stats[f"{kind}_hits"] += match is not None
+            self.stats["lookup_ms"] += (time.perf_counter() - start) * 1000
+        return match
+
+    def find_topic(self, topic: str) -> Optional[Dict[str, Any]]:
+        """
+        The most similar past topic at or above topic_threshold, or None. The match is a dict
+        with id, topic, similarity and result (None while its generation is still pending).
+        """
+        return self._lookup(TOPIC, topic, self.topic_threshold, None)
+
+    @staticmethod
+    def content_text(result: Dict[str, Any]) -> str:
+        return f"{result.get('title', '')}\n{result.get('content', '')}"
+
+    def find_content(self, result: Dict[str, Any], exclude: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """The past post most similar to a generated result at or above content_threshold, or None."""
+        return self._lookup(CONTENT, self.content_text(result), self.content_threshold, exclude)
+
+    def add(self, topic: str, result: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Indexes a topic (before generation, so concurrent near-duplicates can wait for it)
+        and, if given, its result. Returns the entry id.
+        """
+        sig = self.signature(topic)
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO entries (topic, topic_sig, created_at) VALUES (?, ?, ?)", (topic, sig, time.time())
+            )
+            entry_id = cursor.lastrowid
+            self._index(TOPIC, sig, entry_id)
+            self.stats["added"] += 1
+            self._conn.commit()
+        if result is not None:
+            self.set_result(entry_id, result)
+        return entry_id
+
+    def set_result(self, entry_id: int, result: Dict[str, Any]):
+        """Stores a generated result and indexes its content. Error placeholders drop the entry instead."""
+        if is_error_result(result):
+            self.remove(entry_id)
+            return
+        sig = self.signature(self.content_text(result))
+        with self._lock:
+            self._conn.execute("UPDATE entries SET content_sig = ?, result = ? WHERE id = ?",
+                               (sig, json.dumps(result, ensure_ascii=False), entry_id))
+            self._index(CONTENT, sig, entry_id)
+            self._conn.commit()
+
+    def remove(self, entry_id: int):
+        """Drops an entry, e.g. when its generation failed and the topic should be retried later."""
+        with self._lock:
+            row = self._conn.execute("SELECT topic_sig, content_sig FROM entries WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                return
+            keys = self._bucket_keys(TOPIC, row["topic_sig"])
+            if row["content_sig"] is not None:
+                keys += self._bucket_keys(CONTENT, row["content_sig"])
+            self._conn.executemany("DELETE FROM buckets WHERE key = ? AND entry_id = ?",
+                                   [(key, entry_id) for key in keys])
+            self._conn.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
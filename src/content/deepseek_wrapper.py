@@ -1,76 +1,148 @@
 import os
-from openai import OpenAI
-from typing import Dict, Any
-from .base import ContentGenerator
-import json
-import re
+from openai import AsyncOpenAI
+from typing import Dict, Any, AsyncIterator, List, Optional
+from .base import ContentGenerator, error_result
+from .output_parser import IncrementalPostParser, MalformedOutput, parse_post, retry_instruction
+from .prompts import get_post_template, prompt_cache_stats, record_usage, usage_tokens
+from src.utils.http_clients import get_openai_client, get_async_openai_client
+from src.utils.rate_limit import estimate_request_tokens, get_rate_limiter
+from src.utils.tracing import span
 
 class DeepSeekGenerator(ContentGenerator):
     """
     Implementation using DeepSeek API (OpenAI-compatible).
+
+    Args:
+        raise_on_error: Raise provider errors instead of returning the error placeholder
+            (used by HedgedGenerator to fail over to another provider).
+        max_retries: Targeted retries when the output fails the post schema.
+        prompt_version: Post template version (default: PROMPT_VERSION env var, else the latest).
     """
-    
-    def __init__(self):
+
+    def __init__(self, raise_on_error: bool = False, max_retries: int = 1, prompt_version: Optional[str] = None):
         api_key = os.getenv("DEEPSEEK_API_KEY")
         if not api_key:
             raise ValueError("DEEPSEEK_API_KEY not found in environment variables.")
-        
-        # DeepSeek uses OpenAI client but with a different base URL
-        self.client = OpenAI(
-            api_key=api_key,
-            base_url="https://api.deepseek.com"
-        )
+
+        # DeepSeek uses OpenAI client but with a different base URL.
+        # Clients come from the shared registry so connections are pooled process-wide.
+        self.api_key = api_key
+        self.base_url = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+        self.client = get_openai_client(self.base_url, api_key)
         self.model = "deepseek-chat"
+        self.raise_on_error = raise_on_error
+        self.max_retries = max_retries
+        self.template = get_post_template(prompt_version)
+        # Shared with SmartLocator: both spend the same DeepSeek quota
+        self.limiter = get_rate_limiter("deepseek")
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        # Resolved per call: async clients belong to the running event loop
+        return get_async_openai_client(self.base_url, self.api_key)
+
+    def _build_messages(self, topic: str, feedback: Optional[str] = None) -> List[Dict[str, str]]:
+        # Static system + instructions first so DeepSeek's prefix cache can serve them
+        return self.template.render_messages(topic, feedback)
+
+    def cache_key_parts(self, topic: str) -> Dict[str, Any]:
+        return {
+            "provider": "deepseek",
+            "model": self.model,
+            "prompt": self._build_messages(topic),
+            "params": {"response_format": "json_object", "template": self.template.version},
+        }
+
+    def parse_output(self, topic: str, text: str) -> Dict[str, Any]:
+        # Skips markdown fences / chatter around the object and enforces the post schema
+        return parse_post(text)
+
+    def _create(self, client, messages: List[Dict[str, str]], **kwargs):
+        # The rate limiter retries 429s with backoff shared across callers, so the SDK must not retry them itself.
+        # The raw response carries the rate-limit headers.
+        return client.with_options(max_retries=0).chat.completions.with_raw_response.create(
+            model=self.model,
+            messages=messages,
+            response_format={ "type": "json_object" }, # DeepSeek supports JSON mode
+            **kwargs
+        )
+
+    @staticmethod
+    def _record_usage(llm_span, response):
+        record_usage(llm_span, "deepseek", getattr(response, "usage", None))
+
+    def _error_result(self, topic: str, e: Exception) -> Dict[str, Any]:
+        print(f"Error calling DeepSeek: {e}")
+        if self.raise_on_error:
+            raise e
+        return error_result(topic, e)
+
+    def _retry_feedback(self, attempt: int, e: MalformedOutput) -> str:
+        if attempt >= self.max_retries:
+            raise e
+        print(f"[DeepSeek] Output rejected ({e.reason}), retrying with feedback...")
+        return retry_instruction(e)
 
     def generate(self, topic: str) -> Dict[str, Any]:
-        system_prompt = """
-        You are a professional social media content creator for Xiaohongshu (Little Red Book).
-        Output strictly in JSON format.
-        """
-        
-        user_prompt = f"""
-        Please generate a post about "{topic}".
-        
-        Requirements:
-        1. Title: Catchy, includes emojis, under 20 chars.
-        2. Content: Engaging, uses emojis, split into paragraphs, includes 3-5 hashtags at the end.
-        3. Image Prompt: A description to generate a cover image for this post using an AI image generator.
-        
-        Output Format (JSON):
-        {{
-            "title": "...",
-            "content": "...",
-            "image_prompt": "..."
-        }}
-        """
-        
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format={ "type": "json_object" } # DeepSeek supports JSON mode
+            feedback = None
+            for attempt in range(self.max_retries + 1):
+                messages = self._build_messages(topic, feedback)
+                with span("llm.call", provider="deepseek", model=self.model, attempt=attempt) as llm_span:
+                    response = self.limiter.call(lambda: self._create(self.client, messages),
+                                                 estimate_request_tokens(messages))
+                    self._record_usage(llm_span, response)
+                try:
+                    return parse_post(response.choices[0].message.content)
+                except MalformedOutput as e:
+                    feedback = self._retry_feedback(attempt, e)
+        except Exception as e:
+            return self._error_result(topic, e)
+
+    async def agenerate(self, topic: str) -> Dict[str, Any]:
+        try:
+            feedback = None
+            for attempt in range(self.max_retries + 1):
+                messages = self._build_messages(topic, feedback)
+                with span("llm.call", provider="deepseek", model=self.model, attempt=attempt) as llm_span:
+                    response = await self.limiter.acall(lambda: self._create(self.async_client, messages),
+                                                        estimate_request_tokens(messages))
+                    self._record_usage(llm_span, response)
+                try:
+                    return parse_post(response.choices[0].message.content)
+                except MalformedOutput as e:
+                    feedback = self._retry_feedback(attempt, e)
+        except Exception as e:
+            return self._error_result(topic, e)
+
+    async def astream(self, topic: str, feedback: Optional[str] = None) -> AsyncIterator[str]:
+        messages = self._build_messages(topic, feedback)
+        # The slot is held for the whole stream; its duration depends on the consumer, so no latency signal
+        async with self.limiter.aslot(estimate_request_tokens(messages), latency_signal=False) as permit:
+            raw = await self._create(
+                self.async_client, messages,
+                stream=True,
+                # The final chunk then carries usage, including prompt cache hits
+                stream_options={"include_usage": True}
             )
-            
-            content_str = response.choices[0].message.content
-            
-            # Parse JSON
+            permit.observe(headers=raw.headers)
+            stream = raw.parse()
+            parser = IncrementalPostParser()
             try:
-                return json.loads(content_str)
-            except json.JSONDecodeError:
-                # Fallback if strict JSON mode fails or returns markdown wrapped json
-                match = re.search(r'\{.*\}', content_str, re.DOTALL)
-                if match:
-                    return json.loads(match.group(0))
-                else:
-                    raise ValueError("Could not parse JSON from response")
-                
-        except Exception as e:
-            print(f"Error calling DeepSeek: {e}")
-            return {
-                "title": f"Error generating for {topic}",
-                "content": f"Failed to generate content. Error: {str(e)}",
-                "image_prompt": "Error icon"
-            }
+                async for chunk in stream:
+                    if getattr(chunk, "usage", None) is not None:
+                        prompt_cache_stats.record("deepseek", usage_tokens(chunk.usage))
+                        permit.observe(used_tokens=chunk.usage.total_tokens)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        text = chunk.choices[0].delta.content
+                        # Raises MalformedOutput as soon as the answer can't be valid;
+                        # closing the stream below stops generating (and paying for) the rest
+                        parser.feed(text)
+                        yield text
+                        # Stop paying once the object is complete. The usage chunk at the very end
+                        # is then never received, so such calls are missing from the cache stats and
+                        # keep their estimated TPM reservation.
+                        if parser.done:
+                            break
+            finally:
+                await stream.close()
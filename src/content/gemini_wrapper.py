@@ -1,69 +1,125 @@
 import os
 import google.generativeai as genai
-from typing import Dict, Any
-from .base import ContentGenerator
+from typing import Dict, Any, AsyncIterator, Optional
+from .base import ContentGenerator, error_result
+from .output_parser import IncrementalPostParser, MalformedOutput, parse_post, retry_instruction
+from .prompts import get_post_template, record_usage
+from src.utils.rate_limit import estimate_request_tokens, get_rate_limiter
+from src.utils.tracing import span
 
 class GeminiGenerator(ContentGenerator):
     """
     Implementation using Google's Gemini API.
+
+    Args:
+        raise_on_error: Raise provider errors instead of returning the error placeholder
+            (used by HedgedGenerator to fail over to another provider).
+        max_retries: Targeted retries when the output fails the post schema.
+        prompt_version: Post template version (default: PROMPT_VERSION env var, else the latest).
     """
-    
-    def __init__(self):
+
+    def __init__(self, raise_on_error: bool = False, max_retries: int = 1, prompt_version: Optional[str] = None):
         api_key = os.getenv("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables.")
-        
+
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel('gemini-pro')
+        self.raise_on_error = raise_on_error
+        self.max_retries = max_retries
+        self.template = get_post_template(prompt_version)
+        self.limiter = get_rate_limiter("gemini")
+
+    def _build_prompt(self, topic: str, feedback: Optional[str] = None) -> str:
+        # Static instructions first, topic last: a stable prefix for context caching
+        return self.template.render_text(topic, feedback)
+
+    def cache_key_parts(self, topic: str) -> Dict[str, Any]:
+        return {
+            "provider": "gemini",
+            "model": self.model.model_name,
+            "prompt": self._build_prompt(topic),
+            "params": {"template": self.template.version},
+        }
+
+    @staticmethod
+    def _parse(topic: str, text: str) -> Dict[str, Any]:
+        # The parser skips chatter around the object and enforces the post schema
+        if "{" in text:
+            return parse_post(text)
+        else:
+            # Fallback if the model answered in plain prose
+            return {
+                "title": f"关于 {topic} 的分享",
+                "content": text,
+                "image_prompt": f"Illustration of {topic}"
+            }
+
+    def parse_output(self, topic: str, text: str) -> Dict[str, Any]:
+        return self._parse(topic, text)
+
+    @staticmethod
+    def _record_usage(llm_span, response):
+        record_usage(llm_span, "gemini", getattr(response, "usage_metadata", None))
+
+    def _error_result(self, topic: str, e: Exception) -> Dict[str, Any]:
+        print(f"Error calling Gemini: {e}")
+        if self.raise_on_error:
+            raise e
+        # Fallback to mock-like behavior on error to prevent crash
+        return error_result(topic, e)
+
+    def _retry_feedback(self, attempt: int, e: MalformedOutput) -> str:
+        if attempt >= self.max_retries:
+            raise e
+        print(f"[Gemini] Output rejected ({e.reason}), retrying with feedback...")
+        return retry_instruction(e)
 
     def generate(self, topic: str) -> Dict[str, Any]:
-        prompt = f"""
-        You are a professional social media content creator for Xiaohongshu (Little Red Book).
-        Please generate a post about "{topic}".
-        
-        Requirements:
-        1. Title: Catchy, includes emojis, under 20 chars.
-        2. Content: Engaging, uses emojis, split into paragraphs, includes 3-5 hashtags at the end.
-        3. Image Prompt: A description to generate a cover image for this post using an AI image generator (like Midjourney).
-        
-        Output Format (JSON):
-        {{
-            "title": "...",
-            "content": "...",
-            "image_prompt": "..."
-        }}
-        """
-        
         try:
-            response = self.model.generate_content(prompt)
-            # Simple cleanup to ensure we get valid JSON-like structure if the model chats too much
-            # In a production app, we would use more robust parsing or Function Calling.
-            text = response.text
-            
-            # Quick and dirty JSON extraction for demo purposes
-            # Ideally, we should use `response.text` and parse it as JSON.
-            # For now, let's assume the model follows instructions well or use a simple parser.
-            import json
-            import re
-            
-            # Find JSON block
-            match = re.search(r'\{.*\}', text, re.DOTALL)
-            if match:
-                json_str = match.group(0)
-                return json.loads(json_str)
-            else:
-                # Fallback if JSON parsing fails
-                return {
-                    "title": f"关于 {topic} 的分享",
-                    "content": text,
-                    "image_prompt": f"Illustration of {topic}"
-                }
-                
+            feedback = None
+            for attempt in range(self.max_retries + 1):
+                prompt = self._build_prompt(topic, feedback)
+                with span("llm.call", provider="gemini", model=self.model.model_name, attempt=attempt) as llm_span:
+                    response = self.limiter.call(lambda: self.model.generate_content(prompt),
+                                                 estimate_request_tokens(prompt))
+                    self._record_usage(llm_span, response)
+                try:
+                    return self._parse(topic, response.text)
+                except MalformedOutput as e:
+                    feedback = self._retry_feedback(attempt, e)
         except Exception as e:
-            print(f"Error calling Gemini: {e}")
-            # Fallback to mock-like behavior on error to prevent crash
-            return {
-                "title": f"Error generating for {topic}",
-                "content": f"Failed to generate content. Error: {str(e)}",
-                "image_prompt": "Error icon"
-            }
+            return self._error_result(topic, e)
+
+    async def agenerate(self, topic: str) -> Dict[str, Any]:
+        try:
+            feedback = None
+            for attempt in range(self.max_retries + 1):
+                # Native async call, does not block the event loop
+                prompt = self._build_prompt(topic, feedback)
+                with span("llm.call", provider="gemini", model=self.model.model_name, attempt=attempt) as llm_span:
+                    response = await self.limiter.acall(lambda: self.model.generate_content_async(prompt),
+                                                        estimate_request_tokens(prompt))
+                    self._record_usage(llm_span, response)
+                try:
+                    return self._parse(topic, response.text)
+                except MalformedOutput as e:
+                    feedback = self._retry_feedback(attempt, e)
+        except Exception as e:
+            return self._error_result(topic, e)
+
+    async def astream(self, topic: str, feedback: Optional[str] = None) -> AsyncIterator[str]:
+        prompt = self._build_prompt(topic, feedback)
+        # The slot is held for the whole stream; its duration depends on the consumer, so no latency signal
+        async with self.limiter.aslot(estimate_request_tokens(prompt), latency_signal=False) as permit:
+            response = await self.model.generate_content_async(prompt, stream=True)
+            parser = IncrementalPostParser()
+            async for chunk in response:
+                if chunk.text:
+                    # Raises MalformedOutput as soon as the answer can't be valid; leaving the
+                    # loop stops consuming the rest of the stream
+                    parser.feed(chunk.text)
+                    yield chunk.text
+                    if parser.done:
+                        break
+            permit.observe_response(response)
@@ -0,0 +1,307 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .base import ContentGenerator, error_result, result_problems
+from src.utils.stats import percentile
+from src.utils.tracing import span
+
+
+# (topic, provider) that won the current task's stream, per HedgedGenerator. astream() sets it and
+# parse_output() reads it in the same task, so concurrent streams (even of one topic) never see
+# each other's winner, and an abandoned stream leaves nothing behind.
+_stream_winner: ContextVar[Dict[int, Tuple[str, ContentGenerator]]] = ContextVar("hedge_stream_winner", default={})
+
+
+class InvalidResult(ValueError):
+    """A provider answered, but the result failed the schema check."""
+
+
+class LatencyWindow:
+    """
+    Recent latencies (seconds) of one provider, used to derive its running p95.
+
+    Attributes:
+        samples (deque): The last `size` observations.
+    """
+    def __init__(self, size: int = 200):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def p95(self, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self.samples) < min_samples:
+                return None
+            return percentile(list(self.samples), 95)
+
+
+class HedgedGenerator(ContentGenerator):
+    """
+    Composite strategy that races providers to cut tail latency.
+
+    The first provider is the primary. The next one is started when
+      - the running attempt is still busy after the hedge delay (hedge): the fixed
+        `hedge_delay`, or the provider's running p95 once `min_samples` latencies are
+        known, whichever is smaller; or
+      - every running attempt failed or returned a result that fails the schema check (failover).
+    The first valid result wins and the other attempts are cancelled. The sync generate()
+    runs attempts in worker threads, which cannot be cancelled: losers finish in the
+    background and their results are dropped. Only when every provider failed is the
+    usual error placeholder returned.
+
+    Args:
+        providers: Generators in priority order. Create them with raise_on_error=True
+            (see create_hedged()) so failures surface as exceptions, not placeholders.
+        hedge_delay: Seconds before a backup is fired (0 races all providers at once).
+            None disables the fixed delay.
+        adaptive: Also hedge when an attempt runs past the provider's running p95.
+        min_samples: Latencies needed before the running p95 is trusted.
+
+    Attributes:
+        stats (dict): calls, hedges, failovers, all_failed, plus wins / failures per provider.
+    """
+    def __init__(self, providers: List[ContentGenerator], hedge_delay: Optional[float] = 3.0,
+                 adaptive: bool = True, min_samples: int = 20):
+        if not providers:
+            raise ValueError("HedgedGenerator needs at least one provider.")
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+        self.adaptive = adaptive
+        self.min_samples = min_samples
+        self.names = [provider.cache_key_parts("")["provider"] for provider in providers]
+        self.latency = [LatencyWindow() for _ in providers]
+        self.ttft = [LatencyWindow() for _ in providers]
+        self.stats: Dict[str, Any] = {"calls": 0, "hedges": 0, "failovers": 0, "all_failed": 0,
+                                      "wins": {name: 0 for name in self.names},
+                                      "failures": {name: 0 for name in self.names}}
+        self._stats_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def cache_key_parts(self, topic: str) -> Dict[str, Any]:
+        return {
+            "provider": "hedged:" + "+".join(self.names),
+            "model": None,
+            "prompt": topic,
+            "params": {"providers": [provider.cache_key_parts(topic) for provider in self.providers]},
+        }
+
+    def _count(self, key: str, name: Optional[str] = None):
+        with self._stats_lock:
+            if name is None:
+                self.stats[key] += 1
+            else:
+                self.stats[key][name] += 1
+
+    def _delay(self, index: int, windows: List[LatencyWindow]) -> Optional[float]:
+        """How long attempt `index` may run before the next provider is fired."""
+        candidates = []
+        if self.hedge_delay is not None:
+            candidates.append(self.hedge_delay)
+        if self.adaptive:
+            p95 = windows[index].p95(self.min_samples)
+            if p95 is not None:
+                candidates.append(p95)
+        return min(candidates) if candidates else None
+
+    def _timeout(self, launched: List[float], windows: List[LatencyWindow]) -> Optional[float]:
+        """Seconds until the next hedge should fire (None: no more hedging)."""
+        if len(launched) >= len(self.providers):
+            return None
+        delay = self._delay(len(launched) - 1, windows)
+        if delay is None:
+            return None
+        return max(0.0, launched[-1] + delay - time.perf_counter())
+
+    def _fired(self, reason: str, index: int):
+        self._count(reason)
+        print(f"[Hedge] {reason[:-1]}: starting {self.names[index]}")
+
+    def _check(self, index: int, result: Dict[str, Any], start: float) -> Dict[str, Any]:
+        problems = result_problems(result)
+        if problems:
+            raise InvalidResult("; ".join(problems))
+        self.latency[index].observe(time.perf_counter() - start)
+        return result
+
+    def _all_failed(self, topic: str, errors: List[str]) -> Dict[str, Any]:
+        self._count("all_failed")
+        print(f"[Hedge] All providers failed for '{topic}'")
+        return error_result(topic, RuntimeError("; ".join(errors)))
+
+    async def _attempt(self, index: int, topic: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = await self.providers[index].agenerate(topic)
+        except asyncio.CancelledError:
+            # The attempt took at least this long; keeps slow samples in the p95 window
+            self.latency[index].observe(time.perf_counter() - start)
+            raise
+        return self._check(index, result, start)
+
+    async def agenerate(self, topic: str) -> Dict[str, Any]:
+        self._count("calls")
+        with span("generate.hedged", topic=topic) as hedge_span:
+            pending: Dict[asyncio.Task, int] = {}
+            launched: List[float] = []
+            errors: List[str] = []
+
+            def launch():
+                index = len(launched)
+                launched.append(time.perf_counter())
+                pending[asyncio.ensure_future(self._attempt(index, topic))] = index
+
+            launch()
+            try:
+                while pending:
+                    done, _ = await asyncio.wait(pending, timeout=self._timeout(launched, self.latency),
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        self._fired("hedges", len(launched))
+                        launch()
+                        continue
+                    for task in done:
+                        index = pending.pop(task)
+                        if task.exception() is None:
+                            self._count("wins", self.names[index])
+                            hedge_span.set(winner=self.names[index], attempts=len(launched))
+                            return task.result()
+                        errors.append(f"{self.names[index]}: {task.exception()}")
+                        self._count("failures", self.names[index])
+                    if not pending and len(launched) < len(self.providers):
+                        self._fired("failovers", len(launched))
+                        launch()
+            finally:
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+            hedge_span.set(attempts=len(launched))
+            return self._all_failed(topic, errors)
+
+    def _sync_attempt(self, index: int, topic: str) -> Dict[str, Any]:
+        start = time.perf_counter()
+        return self._check(index, self.providers[index].generate(topic), start)
+
+    def generate(self, topic: str) -> Dict[str, Any]:
+        self._count("calls")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=2 * len(self.providers), thread_name_prefix="hedge")
+        with span("generate.hedged", topic=topic) as hedge_span:
+            pending: Dict[Any, int] = {}
+            launched: List[float] = []
+            errors: List[str] = []
+
+            def launch():
+                index = len(launched)
+                launched.append(time.perf_counter())
+                pending[self._executor.submit(self._sync_attempt, index, topic)] = index
+
+            launch()
+            while pending:
+                done, _ = wait(pending, timeout=self._timeout(launched, self.latency), return_when=FIRST_COMPLETED)
+                if not done:
+                    self._fired("hedges", len(launched))
+                    launch()
+                    continue
+                for future in done:
+                    index = pending.pop(future)
+                    if future.exception() is None:
+                        self._count("wins", self.names[index])
+                        hedge_span.set(winner=self.names[index], attempts=len(launched))
+                        for loser in pending:
+                            loser.cancel()
+                        return future.result()
+                    errors.append(f"{self.names[index]}: {future.exception()}")
+                    self._count("failures", self.names[index])
+                if not pending and len(launched) < len(self.providers):
+                    self._fired("failovers", len(launched))
+                    launch()
+            hedge_span.set(attempts=len(launched))
+            return self._all_failed(topic, errors)
+
+    async def astream(self, topic: str, feedback: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Hedges on time to first chunk: the first provider to produce output streams
+        the rest of the answer; errors after that point are raised as usual.
+        """
+        self._count("calls")
+        pending: Dict[asyncio.Task, int] = {}
+        iterators: Dict[int, Any] = {}
+        launched: List[float] = []
+        errors: List[str] = []
+        winner: Optional[int] = None
+        first_chunk = ""
+
+        def launch():
+            index = len(launched)
+            launched.append(time.perf_counter())
+            iterators[index] = self.providers[index].astream(topic, feedback).__aiter__()
+            pending[asyncio.ensure_future(iterators[index].__anext__())] = index
+
+        launch()
+        try:
+            while pending and winner is None:
+                done, _ = await asyncio.wait(pending, timeout=self._timeout(launched, self.ttft),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._fired("hedges", len(launched))
+                    launch()
+                    continue
+                for task in done:
+                    index = pending.pop(task)
+                    error = task.exception()
+                    if error is None and winner is None:
+                        winner, first_chunk = index, task.result()
+                        self.ttft[index].observe(time.perf_counter() - launched[index])
+                    elif error is not None:
+                        errors.append(f"{self.names[index]}: {error}")
+                        self._count("failures", self.names[index])
+                if winner is None and not pending and len(launched) < len(self.providers):
+                    self._fired("failovers", len(launched))
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            for index, iterator in iterators.items():
+                if index != winner and hasattr(iterator, "aclose"):
+                    await iterator.aclose()
+
+        if winner is None:
+            self._count("all_failed")
+            raise RuntimeError(f"All providers failed for '{topic}': " + "; ".join(errors))
+        self._count("wins", self.names[winner])
+        # Which provider produced the stream, so parse_output() uses its parser
+        _stream_winner.set({**_stream_winner.get(), id(self): (topic, self.providers[winner])})
+        yield first_chunk
+        async for chunk in iterators[winner]:
+            yield chunk
+
+    def parse_output(self, topic: str, text: str) -> Dict[str, Any]:
+        winners = _stream_winner.get()
+        won_topic, provider = winners.get(id(self), (None, self.providers[0]))
+        if won_topic is not None:
+            _stream_winner.set({key: value for key, value in winners.items() if key != id(self)})
+        if won_topic != topic:
+            provider = self.providers[0]
+        return provider.parse_output(topic, text)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+def create_hedged(names: List[str], **kwargs) -> HedgedGenerator:
+    """Builds a HedgedGenerator over registry providers, configured to raise instead of returning placeholders."""
+    from .registry import get_generator
+    return HedgedGenerator([get_generator(name, raise_on_error=True) for name in names], **kwargs)
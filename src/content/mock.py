@@ -1,5 +1,7 @@
-from typing import Dict, Any
+import json
+from typing import Dict, Any, AsyncIterator, Optional
 from .base import ContentGenerator
+from .output_parser import POST_SCHEMA
 
 class MockGenerator(ContentGenerator):
     """
@@ -9,7 +11,18 @@ class MockGenerator(ContentGenerator):
     
     def generate(self, topic: str) -> Dict[str, Any]:
         return {
-            "title": f"[Mock] 5 Tips for {topic}",
+            # Within the title limit, so mock results pass the schema check (e.g. inside a hedge)
+            "title": f"[Mock] {topic}"[:POST_SCHEMA.max_title_chars],
             "content": f"This is a mock post about {topic}.\n\n1. Tip One\n2. Tip Two\n3. Tip Three\n\n#mock #test",
             "image_prompt": f"A beautiful illustration of {topic}, minimal style"
         }
+
+    async def agenerate(self, topic: str) -> Dict[str, Any]:
+        # Nothing to wait on, no need for a worker thread
+        return self.generate(topic)
+
+    async def astream(self, topic: str, feedback: Optional[str] = None) -> AsyncIterator[str]:
+        # Emit the JSON in small pieces so the streaming path can be exercised offline
+        text = json.dumps(self.generate(topic), ensure_ascii=False)
+        for start in range(0, len(text), 16):
+            yield text[start:start + 16]
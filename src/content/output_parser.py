@@ -0,0 +1,287 @@
+import json
+import re
+from typing import Any, Dict, List, Optional
+
+_WHITESPACE = " \t\r\n"
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_NUMBER = re.compile(r"-?(0|[1-9]\d*)(\.\d+)?([eE][+-]?\d+)?$")
+_LITERALS = ("true", "false", "null")
+
+
+class MalformedOutput(ValueError):
+    """
+    The model output cannot become a valid post.
+
+    Attributes:
+        reason (str): What is wrong, phrased so it can be sent back to the model.
+        field (str): The offending field, if the problem is tied to one.
+        position (int): Characters of output consumed when the problem was detected.
+    """
+    def __init__(self, reason: str, field: Optional[str] = None, position: int = 0):
+        super().__init__(reason)
+        self.reason = reason
+        self.field = field
+        self.position = position
+
+
+class PostSchema:
+    """
+    The post format every provider is asked for: a JSON object with string fields.
+
+    Args:
+        max_title_chars: Longest allowed title (Xiaohongshu limit: 20 characters).
+        required: Fields that must be present and non-empty.
+        optional: Fields that may be missing but must be strings when present.
+    """
+    def __init__(self, max_title_chars: int = 20, required=("title", "content"), optional=("image_prompt",)):
+        self.max_title_chars = max_title_chars
+        self.required = tuple(required)
+        self.optional = tuple(optional)
+
+    @property
+    def string_fields(self):
+        return self.required + self.optional
+
+    def check_length(self, field: str, length: int) -> Optional[str]:
+        """Checked while a value is still streaming, so an overlong title aborts at once."""
+        if field == "title" and length > self.max_title_chars:
+            return f"the title is longer than {self.max_title_chars} characters"
+        return None
+
+    def validate(self, result: Any) -> List[str]:
+        if not isinstance(result, dict):
+            return ["the output is not a JSON object"]
+        problems = []
+        for field in self.required:
+            value = result.get(field)
+            if not isinstance(value, str) or not value.strip():
+                problems.append(f"'{field}' is missing or empty")
+        for field in self.string_fields:
+            if field in result and not isinstance(result[field], str):
+                problems.append(f"'{field}' must be a string")
+        title = result.get("title")
+        if isinstance(title, str):
+            problem = self.check_length("title", len(title))
+            if problem:
+                problems.append(problem)
+        return problems
+
+
+POST_SCHEMA = PostSchema()
+
+
+class IncrementalPostParser:
+    """
+    Push parser for a post object in model output, fed chunk by chunk.
+
+    Text before the first '{' (chatter, a ```json fence) is skipped and everything after
+    the matching '}' is ignored, so prose around the object never leaks into it. The JSON
+    grammar and the schema are checked as characters arrive: feed() raises MalformedOutput
+    as soon as the output can no longer become a valid post (e.g. a syntax error, a non-string
+    title, or the 21st title character), which lets the caller stop the stream right there.
+
+    Args:
+        schema: Rules for the object (defaults to POST_SCHEMA).
+        max_preamble: Characters to skip while looking for '{' before giving up (None: no limit).
+
+    Attributes:
+        done (bool): The object is complete and valid; `result` holds it.
+        position (int): Characters consumed so far.
+    """
+    def __init__(self, schema: Optional[PostSchema] = None, max_preamble: Optional[int] = 2000):
+        self.schema = schema or POST_SCHEMA
+        self.max_preamble = max_preamble
+        self.done = False
+        self.result: Optional[Dict[str, Any]] = None
+        self.position = 0
+        self._text: List[str] = []
+        self._started = False
+        self._stack: List[str] = []
+        self._expect = "value"
+        self._in_string = False
+        self._is_key = False
+        self._escape = False
+        self._unicode_left = 0
+        self._unicode_digits = ""
+        self._string_len = 0
+        self._key_chars: List[str] = []
+        self._scalar = ""
+        self._field: Optional[str] = None
+
+    def _fail(self, reason: str, field: Optional[str] = None):
+        raise MalformedOutput(reason, field, self.position)
+
+    def feed(self, chunk: str) -> Optional[Dict[str, Any]]:
+        """Consumes the next piece of output; returns the result once the object is complete."""
+        for char in chunk:
+            if self.done:
+                break
+            self.position += 1
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._text.append(char)
+                    self._stack.append("{")
+                    self._expect = "key_or_end"
+                elif self.max_preamble is not None and self.position > self.max_preamble:
+                    self._fail(f"no JSON object in the first {self.max_preamble} characters")
+                continue
+            self._text.append(char)
+            self._step(char)
+        return self.result
+
+    def close(self) -> Dict[str, Any]:
+        """Call at the end of the output; returns the result or raises MalformedOutput."""
+        if self.done:
+            return self.result
+        if not self._started:
+            self._fail("the output contains no JSON object")
+        self._fail("the output ended before the JSON object was complete")
+
+    def _step(self, char: str):
+        if self._in_string:
+            self._string_char(char)
+            return
+        if self._scalar:
+            if char not in _WHITESPACE and char not in ",}]":
+                self._scalar += char
+                if self._scalar[0] in "tfn":
+                    if not any(literal.startswith(self._scalar) for literal in _LITERALS):
+                        self._fail(f"invalid literal {self._scalar!r}")
+                elif not re.fullmatch(r"[-+.eE0-9]*", self._scalar):
+                    self._fail(f"invalid number {self._scalar!r}")
+                return
+            self._end_scalar()
+        if char in _WHITESPACE:
+            return
+
+        expect = self._expect
+        if expect in ("value", "value_or_end"):
+            if char == "]" and expect == "value_or_end":
+                self._close(char)
+            else:
+                self._start_value(char)
+        elif expect in ("key", "key_or_end"):
+            if char == "}" and expect == "key_or_end":
+                self._close(char)
+            elif char == '"':
+                self._start_string(is_key=True)
+            else:
+                self._fail(f"expected a field name, got {char!r}")
+        elif expect == "colon":
+            if char != ":":
+                self._fail(f"expected ':' after a field name, got {char!r}")
+            self._expect = "value"
+        elif expect == "comma_or_end":
+            if char == ",":
+                self._expect = "key" if self._stack[-1] == "{" else "value"
+            elif char in "}]":
+                self._close(char)
+            else:
+                self._fail(f"expected ',' or the end of the object, got {char!r}")
+
+    def _start_value(self, char: str):
+        field = self._field if len(self._stack) == 1 else None
+        if field in self.schema.string_fields and char != '"':
+            self._fail(f"'{field}' must be a string", field)
+        if char == "{":
+            self._stack.append("{")
+            self._expect = "key_or_end"
+        elif char == "[":
+            self._stack.append("[")
+            self._expect = "value_or_end"
+        elif char == '"':
+            self._start_string(is_key=False)
+        elif char in "-0123456789tfn":
+            self._scalar = char
+        else:
+            self._fail(f"unexpected {char!r} where a value should start")
+
+    def _end_scalar(self):
+        if self._scalar not in _LITERALS and not _NUMBER.match(self._scalar):
+            self._fail(f"invalid value {self._scalar!r}")
+        self._scalar = ""
+        self._expect = "comma_or_end"
+
+    def _close(self, char: str):
+        opened = self._stack.pop()
+        if (opened, char) not in (("{", "}"), ("[", "]")):
+            self._fail(f"mismatched {char!r}")
+        if self._stack:
+            self._expect = "comma_or_end"
+        else:
+            self._complete()
+
+    def _start_string(self, is_key: bool):
+        self._in_string = True
+        self._is_key = is_key
+        self._string_len = 0
+        self._key_chars = []
+
+    def _string_char(self, char: str):
+        if self._unicode_left:
+            if char not in "0123456789abcdefABCDEF":
+                self._fail("invalid \\u escape")
+            self._unicode_left -= 1
+            self._unicode_digits += char
+            if not self._unicode_left:
+                code = int(self._unicode_digits, 16)
+                # A high surrogate is half an emoji: count the pair once, at its low half,
+                # as len() of the decoded string does
+                self._add_char(chr(code), counted=not 0xD800 <= code <= 0xDBFF)
+        elif self._escape:
+            self._escape = False
+            if char == "u":
+                self._unicode_left = 4
+                self._unicode_digits = ""
+            elif char in _ESCAPES:
+                self._add_char(_ESCAPES[char])
+            else:
+                self._fail(f"invalid escape '\\{char}'")
+        elif char == "\\":
+            self._escape = True
+        elif char == '"':
+            self._in_string = False
+            if self._is_key:
+                if len(self._stack) == 1:
+                    self._field = "".join(self._key_chars)
+                self._expect = "colon"
+            else:
+                self._expect = "comma_or_end"
+        else:
+            self._add_char(char)
+
+    def _add_char(self, char: str, counted: bool = True):
+        self._string_len += counted
+        if self._is_key:
+            self._key_chars.append(char)
+        elif len(self._stack) == 1 and self._field:
+            problem = self.schema.check_length(self._field, self._string_len)
+            if problem:
+                self._fail(problem, self._field)
+
+    def _complete(self):
+        # The grammar was checked on the fly; strict=False accepts raw newlines in strings
+        result = json.loads("".join(self._text), strict=False)
+        problems = self.schema.validate(result)
+        if problems:
+            self._fail("; ".join(problems))
+        self.result = result
+        self.done = True
+
+
+def parse_post(text: str, schema: Optional[PostSchema] = None) -> Dict[str, Any]:
+    """Extracts and validates the post object from a complete response."""
+    parser = IncrementalPostParser(schema, max_preamble=None)
+    parser.feed(text)
+    return parser.close()
+
+
+def retry_instruction(error: MalformedOutput, schema: Optional[PostSchema] = None) -> str:
+    """The follow-up message for a targeted retry: tells the model exactly what to fix."""
+    schema = schema or POST_SCHEMA
+    return (
+        f"Your previous answer was rejected: {error.reason}. "
+        f"Reply again with only the JSON object with the fields {', '.join(schema.string_fields)}. "
+        f"The title must be at most {schema.max_title_chars} characters, emojis included."
+    )
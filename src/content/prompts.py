@@ -0,0 +1,166 @@
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from .output_parser import POST_SCHEMA
+
+# Providers cache prompt prefixes (DeepSeek in 64-token blocks, OpenAI from 1024 tokens,
+# Gemini via cached contents): a request only hits the cache when its beginning is
+# byte-identical to an earlier one. Templates therefore keep every static instruction in
+# one constant prefix and put the variable parts (topic, retry feedback) last.
+
+
+class PromptTemplate:
+    """
+    A versioned prompt split into a static prefix and a variable suffix.
+
+    Args:
+        version: Identifier recorded in cache keys and traces (change it whenever the text changes).
+        system: Static system instructions.
+        instructions: Static task description, sent right after the system text.
+        variable: Format string for the per-request part; gets {topic}.
+    """
+    def __init__(self, version: str, system: str, instructions: str, variable: str):
+        self.version = version
+        self.system = system.strip()
+        self.instructions = instructions.strip()
+        self.variable = variable.strip()
+
+    @property
+    def static_prefix(self) -> str:
+        """The byte-identical text every request starts with."""
+        return f"{self.system}\n\n{self.instructions}"
+
+    def render_messages(self, topic: str, feedback: Optional[str] = None) -> List[Dict[str, str]]:
+        """Chat messages: static system message first, then the variable user message."""
+        messages = [
+            {"role": "system", "content": self.static_prefix},
+            {"role": "user", "content": self.variable.format(topic=topic)},
+        ]
+        if feedback:
+            messages.append({"role": "user", "content": feedback})
+        return messages
+
+    def render_text(self, topic: str, feedback: Optional[str] = None) -> str:
+        """Single-string prompt for providers without chat roles; same prefix, variable part last."""
+        text = f"{self.static_prefix}\n\n{self.variable.format(topic=topic)}"
+        if feedback:
+            text += f"\n\n{feedback}"
+        return text
+
+
+_POST_INSTRUCTIONS = f"""
+Write one post for the topic given at the end of this message.
+
+Requirements:
+1. Title: Catchy, includes emojis, at most {POST_SCHEMA.max_title_chars} characters.
+2. Content: Engaging, uses emojis, split into paragraphs, includes 3-5 hashtags at the end.
+3. Image Prompt: A description to generate a cover image for this post using an AI image generator.
+
+Output strictly one JSON object and nothing else:
+{{
+    "title": "...",
+    "content": "...",
+    "image_prompt": "..."
+}}
+"""
+
+TEMPLATES: Dict[str, PromptTemplate] = {
+    "xhs-post/1": PromptTemplate(
+        version="xhs-post/1",
+        system="You are a professional social media content creator for Xiaohongshu (Little Red Book). "
+               "Output strictly in JSON format.",
+        instructions=_POST_INSTRUCTIONS,
+        # The fake benchmark server finds the topic via 'post about "..."'
+        variable='Topic: please generate a post about "{topic}".',
+    ),
+}
+DEFAULT_POST_TEMPLATE = "xhs-post/1"
+
+LOCATOR_SYSTEM = """
+You are a helpful QA automation engineer locating elements for browser automation.
+You get the interactive and labelled elements of a page, one per line, each starting
+with its element id in square brackets, followed by the description of the element wanted.
+Return ONLY the id of the matching element (for example: e1a2b3c). Do not include any explanation.
+If there are multiple matches, choose the most specific one.
+""".strip()
+
+
+def get_post_template(version: Optional[str] = None) -> PromptTemplate:
+    """The post template for a version (default: PROMPT_VERSION env var, else the latest)."""
+    version = version or os.getenv("PROMPT_VERSION") or DEFAULT_POST_TEMPLATE
+    try:
+        return TEMPLATES[version]
+    except KeyError:
+        raise ValueError(f"Unknown prompt template '{version}'. Available: {', '.join(TEMPLATES)}")
+
+
+def usage_tokens(usage: Any) -> Dict[str, int]:
+    """
+    Normalizes provider usage objects to tokens_in / tokens_out / cached_tokens.
+
+    cached_tokens comes from DeepSeek's prompt_cache_hit_tokens, OpenAI's
+    prompt_tokens_details.cached_tokens or Gemini's cached_content_token_count.
+    """
+    if usage is None:
+        return {}
+    if hasattr(usage, "prompt_token_count"):
+        # Gemini usage_metadata
+        return {
+            "tokens_in": usage.prompt_token_count or 0,
+            "tokens_out": usage.candidates_token_count or 0,
+            "cached_tokens": getattr(usage, "cached_content_token_count", 0) or 0,
+        }
+    cached = getattr(usage, "prompt_cache_hit_tokens", None)
+    if cached is None:
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+    if cached is None and isinstance(getattr(usage, "model_extra", None), dict):
+        # Fields the SDK doesn't model (e.g. DeepSeek's) end up in model_extra
+        cached = usage.model_extra.get("prompt_cache_hit_tokens")
+    return {
+        "tokens_in": usage.prompt_tokens or 0,
+        "tokens_out": usage.completion_tokens or 0,
+        "cached_tokens": cached or 0,
+    }
+
+
+class PromptCacheStats:
+    """
+    Process-wide share of input tokens served from provider prompt caches.
+
+    Attributes:
+        by_provider (dict): provider -> {"calls", "tokens_in", "cached_tokens"}.
+    """
+    def __init__(self):
+        self.by_provider: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, tokens: Dict[str, int]):
+        if not tokens:
+            return
+        with self._lock:
+            entry = self.by_provider.setdefault(provider, {"calls": 0, "tokens_in": 0, "cached_tokens": 0})
+            entry["calls"] += 1
+            entry["tokens_in"] += tokens.get("tokens_in", 0)
+            entry["cached_tokens"] += tokens.get("cached_tokens", 0)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                provider: dict(entry, cached_share=round(entry["cached_tokens"] / entry["tokens_in"], 4)
+                               if entry["tokens_in"] else 0.0)
+                for provider, entry in self.by_provider.items()
+            }
+
+
+prompt_cache_stats = PromptCacheStats()
+
+
+def record_usage(llm_span, provider: str, usage: Any) -> Dict[str, int]:
+    """Puts token usage (including cached tokens) on the span and into prompt_cache_stats."""
+    tokens = usage_tokens(usage)
+    if tokens:
+        llm_span.set(**tokens)
+        prompt_cache_stats.record(provider, tokens)
+    return tokens
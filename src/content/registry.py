@@ -0,0 +1,40 @@
+import importlib
+import inspect
+from typing import Dict, List, Type
+
+from .base import ContentGenerator
+
+# Provider name -> "module:ClassName". Modules are only imported when the provider
+# is actually used, so e.g. the mock provider never pays for the Gemini / OpenAI SDKs.
+PROVIDERS: Dict[str, str] = {
+    "mock": "src.content.mock:MockGenerator",
+    "gemini": "src.content.gemini_wrapper:GeminiGenerator",
+    "deepseek": "src.content.deepseek_wrapper:DeepSeekGenerator",
+}
+
+
+def provider_names() -> List[str]:
+    return list(PROVIDERS)
+
+
+def register_provider(name: str, target: str):
+    """Registers (or overrides) a provider as "module:ClassName"."""
+    PROVIDERS[name] = target
+
+
+def load_generator_class(name: str) -> Type[ContentGenerator]:
+    """Imports and returns the generator class for a provider name."""
+    try:
+        target = PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown provider '{name}'. Available: {', '.join(PROVIDERS)}")
+    module_name, class_name = target.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def get_generator(name: str, **kwargs) -> ContentGenerator:
+    """Instantiates a provider; keyword arguments go to the generator class
+    (e.g. raise_on_error=True, which generators without that option ignore)."""
+    cls = load_generator_class(name)
+    accepted = inspect.signature(cls.__init__).parameters
+    return cls(**{key: value for key, value in kwargs.items() if key in accepted})
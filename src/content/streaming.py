@@ -0,0 +1,76 @@
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .base import ContentGenerator, error_result
+from .output_parser import MalformedOutput, retry_instruction
+from src.utils.tracing import span
+
+
+class StreamMetrics:
+    """
+    Latency of one streamed generation.
+
+    Attributes:
+        ttft_ms (float): Time to first chunk (what the user perceives as latency).
+        total_ms (float): Time until the stream finished.
+        chunks (int): Number of chunks received.
+        chars (int): Length of the complete output.
+        retries (int): Streams aborted as malformed and retried with feedback.
+        wasted_chars (int): Output received in aborted attempts.
+    """
+    def __init__(self):
+        self.ttft_ms: Optional[float] = None
+        self.total_ms = 0.0
+        self.chunks = 0
+        self.chars = 0
+        self.retries = 0
+        self.wasted_chars = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"ttft_ms": self.ttft_ms, "total_ms": self.total_ms, "chunks": self.chunks, "chars": self.chars,
+                "retries": self.retries, "wasted_chars": self.wasted_chars}
+
+
+async def stream_generate(generator: ContentGenerator, topic: str,
+                          on_chunk: Optional[Callable[[str], None]] = None,
+                          max_retries: int = 1) -> Tuple[Dict[str, Any], StreamMetrics]:
+    """
+    Runs generator.astream(), calling on_chunk for every chunk as it arrives,
+    and returns the parsed result together with TTFT / total latency.
+    Output that fails the post schema is retried up to max_retries times with a
+    targeted instruction. On failure the usual error placeholder is returned.
+    """
+    metrics = StreamMetrics()
+    start = time.perf_counter()
+    with span("generate.stream", provider=type(generator).__name__, topic=topic) as stream_span:
+        try:
+            feedback = None
+            for attempt in range(max_retries + 1):
+                chunks = []
+                try:
+                    async for chunk in generator.astream(topic, feedback):
+                        if metrics.ttft_ms is None:
+                            metrics.ttft_ms = round((time.perf_counter() - start) * 1000, 2)
+                        metrics.chunks += 1
+                        chunks.append(chunk)
+                        if on_chunk:
+                            on_chunk(chunk)
+                    text = "".join(chunks)
+                    metrics.chars = len(text)
+                    result = generator.parse_output(topic, text)
+                    break
+                except MalformedOutput as e:
+                    # The provider stopped the stream as soon as the output was provably bad
+                    metrics.wasted_chars += sum(len(chunk) for chunk in chunks)
+                    if attempt >= max_retries:
+                        raise
+                    metrics.retries += 1
+                    print(f"\n[Retry] Output rejected after {e.position} chars ({e.reason}), retrying...")
+                    feedback = retry_instruction(e)
+        except Exception as e:
+            print(f"\nError during streamed generation: {e}")
+            result = error_result(topic, e)
+            stream_span.set(error=str(e))
+        metrics.total_ms = round((time.perf_counter() - start) * 1000, 2)
+        stream_span.set(**metrics.as_dict())
+    return result, metrics
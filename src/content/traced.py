@@ -0,0 +1,49 @@
+from typing import Any, AsyncIterator, Dict, Optional
+
+from .base import ContentGenerator, is_error_result
+from src.utils.tracing import span
+
+
+class TracedGenerator(ContentGenerator):
+    """
+    Decorator that records a "generate" span around every call of the wrapped strategy.
+    Provider-level spans (llm.call with token usage) nest inside it.
+
+    Other attributes (e.g. the `cache` of a CachedGenerator) are forwarded to the inner
+    generator, so the wrapper can go on the outside of the decorator stack.
+
+    Attributes:
+        inner (ContentGenerator): The wrapped strategy.
+    """
+    def __init__(self, inner: ContentGenerator):
+        self.inner = inner
+
+    def __getattr__(self, name: str):
+        return getattr(self.inner, name)
+
+    def _provider(self) -> str:
+        return self.inner.cache_key_parts("")["provider"]
+
+    def cache_key_parts(self, topic: str) -> Dict[str, Any]:
+        return self.inner.cache_key_parts(topic)
+
+    def parse_output(self, topic: str, text: str) -> Dict[str, Any]:
+        return self.inner.parse_output(topic, text)
+
+    def generate(self, topic: str) -> Dict[str, Any]:
+        with span("generate", provider=self._provider(), topic=topic) as generate_span:
+            result = self.inner.generate(topic)
+            generate_span.set(placeholder=is_error_result(result))
+            return result
+
+    async def agenerate(self, topic: str) -> Dict[str, Any]:
+        with span("generate", provider=self._provider(), topic=topic) as generate_span:
+            result = await self.inner.agenerate(topic)
+            generate_span.set(placeholder=is_error_result(result))
+            return result
+
+    async def astream(self, topic: str, feedback: Optional[str] = None) -> AsyncIterator[str]:
+        # No span here: a span held open across yields would adopt whatever the consumer
+        # runs in between. stream_generate() records "generate.stream" around the loop.
+        async for chunk in self.inner.astream(topic, feedback):
+            yield chunk
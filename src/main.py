@@ -1,17 +1,19 @@
 import asyncio
 import argparse
+import json
 import sys
 import os
+import time
 
 # Add src to python path to ensure imports work correctly
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from src.browser.context import BrowserManager
-from src.browser.xhs import XHSOperator
-
-from src.content.mock import MockGenerator
-from src.content.gemini_wrapper import GeminiGenerator
-from src.content.deepseek_wrapper import DeepSeekGenerator
+# Only cheap imports at module level: provider SDKs, Playwright and Pillow are
+# imported inside the tasks that need them, so e.g. `generate --provider mock`
+# starts without loading any of them.
+from src.content.base import ContentGenerator
+from src.content.registry import get_generator, provider_names
+from src.utils.tracing import get_tracer, load_spans, summarize_spans
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -22,10 +24,13 @@ async def login_task():
     Task to perform manual login and save session.
     """
     # For login, we want to see the browser (headless=False)
+    from src.browser.context import BrowserManager
+    from src.browser.xhs import XHSOperator
+
     browser_manager = BrowserManager(headless=False)
     try:
         await browser_manager.launch()
-        xhs = XHSOperator(browser_manager.page)
+        xhs = XHSOperator(browser_manager.page, browser_manager.router, browser_manager.user_data_dir)
         await xhs.login()
         
         # Keep browser open for a few seconds to let user see success
@@ -36,21 +41,59 @@ async def login_task():
     finally:
         await browser_manager.close()
 
-def generate_task(topic: str, provider: str) -> dict:
+def create_generator(provider: str, cache_mode: str = "off") -> ContentGenerator:
     """
-    Task to generate content. Returns the result dict.
+    Factory for the content generation strategy.
+
+    Args:
+        provider: A name from the provider registry (mock / gemini / deepseek), or several
+            comma-separated names to hedge across them in that order (e.g. "deepseek,gemini";
+            the hedge delay in seconds comes from HEDGE_DELAY, default 3).
+        cache_mode: "off", "on" (serve from the response cache) or
+            "refresh" (bypass cached entries but store new results).
     """
-    print(f"Generating content for topic: '{topic}' using {provider}...")
-    
-    if provider == "gemini":
-        generator = GeminiGenerator()
-    elif provider == "deepseek":
-        generator = DeepSeekGenerator()
+    if "," in provider:
+        from src.content.hedged import create_hedged
+        generator = create_hedged(provider.split(","), hedge_delay=float(os.getenv("HEDGE_DELAY", "3")))
     else:
-        generator = MockGenerator()
-        
-    result = generator.generate(topic)
-    
+        generator = get_generator(provider)
+
+    if cache_mode != "off":
+        from src.content.cache import CachedGenerator
+        generator = CachedGenerator(generator, bypass=(cache_mode == "refresh"))
+    if get_tracer().enabled:
+        from src.content.traced import TracedGenerator
+        generator = TracedGenerator(generator)
+    return generator
+
+def print_cache_stats(generator: ContentGenerator):
+    # Checked via the attribute so the cache module doesn't need importing when unused
+    if hasattr(generator, "cache") and hasattr(generator.cache, "hit_rate"):
+        stats = generator.cache.stats
+        print(f"[Cache] hits={stats['hits']} misses={stats['misses']} expired={stats['expired']} "
+              f"evictions={stats['evictions']} hit_rate={generator.cache.hit_rate():.0%}", file=sys.stderr)
+    # Only loaded (and only populated) when a real provider ran
+    prompts = sys.modules.get("src.content.prompts")
+    if prompts is not None:
+        for provider, usage in prompts.prompt_cache_stats.summary().items():
+            print(f"[PromptCache] {provider}: {usage['cached_tokens']}/{usage['tokens_in']} input tokens served from "
+                  f"the provider cache ({usage['cached_share']:.0%}) over {usage['calls']} calls", file=sys.stderr)
+    rate_limit = sys.modules.get("src.utils.rate_limit")
+    if rate_limit is not None:
+        for state in rate_limit.rate_limit_states():
+            stats = state["stats"]
+            print(f"[RateLimit] {state['provider']}: limit={state['concurrency_limit']} calls={stats['calls']} "
+                  f"throttled={stats['throttled']} retries={stats['retries']} queued={stats['queued_s']:.1f}s "
+                  f"latency_ewma={state['latency_ewma_ms']}ms", file=sys.stderr)
+    # The hedged generator sits below the cache / tracing decorators
+    while generator is not None and not hasattr(generator, "providers"):
+        generator = getattr(generator, "inner", None)
+    if generator is not None:
+        stats = generator.stats
+        print(f"[Hedge] calls={stats['calls']} hedges={stats['hedges']} failovers={stats['failovers']} "
+              f"all_failed={stats['all_failed']} wins={stats['wins']}", file=sys.stderr)
+
+def print_result(result: dict):
     print("\n" + "="*30)
     print(f"TITLE: {result.get('title')}")
     print("-" * 30)
@@ -58,51 +101,392 @@ def generate_task(topic: str, provider: str) -> dict:
     print("-" * 30)
     print(f"IMAGE PROMPT: {result.get('image_prompt')}")
     print("="*30 + "\n")
+
+def generate_task(topic: str, provider: str, cache_mode: str = "off") -> dict:
+    """
+    Task to generate content. Returns the result dict.
+    """
+    print(f"Generating content for topic: '{topic}' using {provider}...")
+    
+    generator = create_generator(provider, cache_mode)
+    result = generator.generate(topic)
+    print_result(result)
+    print_cache_stats(generator)
     
     return result
 
-async def publish_task(topic: str, provider: str):
+async def agenerate_task(topic: str, provider: str, cache_mode: str = "off") -> dict:
     """
-    Task to generate AND publish content.
+    Async version of generate_task, for use inside the event loop.
+    """
+    print(f"Generating content for topic: '{topic}' using {provider}...")
+    
+    generator = create_generator(provider, cache_mode)
+    result = await generator.agenerate(topic)
+    print_result(result)
+    print_cache_stats(generator)
+    
+    return result
+
+async def stream_generate_task(topic: str, provider: str, cache_mode: str = "off") -> dict:
     """
-    # 1. Generate Content
-    content_data = generate_task(topic, provider)
+    Task to generate content with incremental output: model text is printed as it arrives.
+    Time-to-first-token and total latency are reported separately.
+    """
+    from src.content.streaming import stream_generate
+
+    print(f"Streaming content for topic: '{topic}' using {provider}...\n")
     
-    # 2. Prepare Image (Using local test image for now)
-    image_path = os.path.abspath("test_image.jpg")
-    if not os.path.exists(image_path):
-        print(f"Error: Test image not found at {image_path}. Please run 'curl -o test_image.jpg https://picsum.photos/800/600' first.")
+    generator = create_generator(provider, cache_mode)
+    result, metrics = await stream_generate(
+        generator, topic, on_chunk=lambda chunk: print(chunk, end="", flush=True)
+    )
+    print()
+    print_result(result)
+    print(f"[Latency] time to first token: {metrics.ttft_ms} ms, total: {metrics.total_ms} ms "
+          f"({metrics.chunks} chunks, {metrics.retries} retries)", file=sys.stderr)
+    print_cache_stats(generator)
+    
+    return result
+
+async def batch_generate_task(topics_file: str, provider: str, concurrency: int, output_path: str, cache_mode: str = "off",
+                              dedup_mode: str = "off", dedup_db: str = "user_data/dedup.sqlite3",
+                              dedup_threshold: float = 0.7):
+    """
+    Task to generate content for many topics (one per line) in a single process.
+    Results are streamed to output_path as JSONL; '-' means stdin / stdout.
+    With dedup_mode reuse / skip, near-duplicate topics are answered from the dedup index.
+    """
+    from src.content.batch import BatchRunner, aread_topics, read_topics, print_summary
+    from src.content.dedup import NearDuplicateIndex
+
+    generator = create_generator(provider, cache_mode)
+    dedup = NearDuplicateIndex(dedup_db, topic_threshold=dedup_threshold) if dedup_mode != "off" else None
+    runner = BatchRunner(generator, concurrency=concurrency, dedup=dedup,
+                         dedup_mode=dedup_mode if dedup is not None else "reuse")
+
+    topics_source = sys.stdin if topics_file == "-" else open(topics_file, "r", encoding="utf-8")
+    output = sys.stdout if output_path == "-" else open(output_path, "w", encoding="utf-8")
+    try:
+        # A pipe may block on every line; read it off the event loop so generations keep running
+        topics = aread_topics(topics_source) if topics_source is sys.stdin else read_topics(topics_source)
+        summary = await runner.run(topics, output)
+    finally:
+        if topics_source is not sys.stdin:
+            topics_source.close()
+        if output is not sys.stdout:
+            output.close()
+        if dedup is not None:
+            dedup.close()
+
+    print_summary(summary)
+    print_cache_stats(generator)
+    return summary
+
+async def publish_task(topic: str, provider: str, cache_mode: str = "off", images: list = None):
+    """
+    Task to generate AND publish content.
+    """
+    from src.browser.context import BrowserManager
+    from src.browser.xhs import XHSOperator
+    from src.content.assets import AssetPipeline
+
+    # 1. Check the images (defaults to the local test image)
+    images = images or ["test_image.jpg"]
+    try:
+        AssetPipeline.collect(images)
+    except FileNotFoundError as e:
+        print(f"Error: {e}. Please run 'curl -o test_image.jpg https://picsum.photos/800/600' first.")
         return
 
+    # 2. Generate Content and prepare images in the background,
+    # so both overlap with browser startup and the login check
+    generation = asyncio.create_task(agenerate_task(topic, provider, cache_mode))
+    assets = AssetPipeline()
+    asset_prep = asyncio.create_task(assets.prepare(images))
+
     # 3. Publish via Browser
     print("Launching browser for publishing...")
     # headless=False so we can see what's happening
     browser_manager = BrowserManager(headless=False)
     try:
         await browser_manager.launch()
-        xhs = XHSOperator(browser_manager.page)
+        xhs = XHSOperator(browser_manager.page, browser_manager.router, browser_manager.user_data_dir)
         
         # Ensure logged in
         if not await xhs.check_login_status():
             print("Not logged in! Please run 'login' command first.")
             return
 
+        content_data = await generation
+        image_paths = await asset_prep
+
         await xhs.publish_note(
             title=content_data.get("title"),
             content=content_data.get("content"),
-            image_path=image_path
+            image_paths=image_paths
         )
-        
-        # Keep open briefly to see result
-        await asyncio.sleep(10)
-        
+
+        # publish_note only returns once the site confirmed the publish (or raises),
+        # so there is no need to keep the browser open "just in case".
+
     except Exception as e:
         print(f"Error during publishing: {e}")
     finally:
+        for task in (generation, asset_prep):
+            if not task.done():
+                task.cancel()
+        assets.close()
         await browser_manager.close()
 
+async def serve_task(jobs_file: str, headless: bool, max_jobs_per_context: int, cache_mode: str = "off"):
+    """
+    Runs a resident browser pool and publishes jobs read from a JSONL queue
+    (a file, a FIFO, or stdin with '-'). Lines are processed as they arrive.
+
+    Each line is either {"title", "content"} or {"topic", "provider"}, plus optional
+    "images" (list of files / directories, default test_image.jpg) and "profile"
+    (browser user data directory).
+    """
+    from src.browser.pool import BrowserPool, PublishJob
+    from src.content.assets import AssetPipeline
+
+    pool = BrowserPool(headless=headless, max_jobs_per_context=max_jobs_per_context)
+    assets = AssetPipeline()
+    generators = {}
+    # Jobs still running; finished ones drop out so a long-lived server doesn't accumulate them
+    pending = set()
+
+    async def handle(line_no: int, job_spec: dict):
+        try:
+            if "title" not in job_spec:
+                provider = job_spec.get("provider", "mock")
+                if provider not in generators:
+                    generators[provider] = create_generator(provider, cache_mode)
+                content_data = await generators[provider].agenerate(job_spec["topic"])
+            else:
+                content_data = job_spec
+            job = PublishJob(
+                title=content_data.get("title"),
+                content=content_data.get("content"),
+                image_paths=await assets.prepare(job_spec.get("images", ["test_image.jpg"])),
+                profile=job_spec.get("profile", "user_data/browser_context"),
+            )
+            latency = await pool.publish(job)
+            print(f"[Serve] Job {line_no} published in {latency:.1f}s")
+        except Exception as e:
+            print(f"[Serve] Job {line_no} failed: {e}")
+
+    source = sys.stdin if jobs_file == "-" else open(jobs_file, "r", encoding="utf-8")
+    try:
+        line_no = 0
+        while True:
+            # readline blocks, so keep it off the loop while the pool is working
+            line = await asyncio.to_thread(source.readline)
+            if not line:
+                break
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                job_spec = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"[Serve] Skipping malformed job line {line_no}: {e}")
+                continue
+            task = asyncio.create_task(handle(line_no, job_spec))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        await asyncio.gather(*pending)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        print(f"[Serve] Pool stats: {pool.stats()}, asset stats: {assets.stats}")
+        assets.close()
+        await pool.shutdown()
+
+async def pipeline_task(topics_file: str, provider: str, profiles: list, generate_concurrency: int,
+                        publish_concurrency: int, queue_size: int, headless: bool, cache_mode: str = "off",
+                        images: list = None, dedup_db: str = None, dedup_threshold: float = 0.7):
+    """
+    Generates and publishes many topics with generation overlapping browser work.
+    With dedup_db, topics and posts near-identical to ones published before are skipped.
+    """
+    from src.browser.pool import BrowserPool
+    from src.content.assets import AssetPipeline
+    from src.content.batch import aread_topics, read_topics
+    from src.content.dedup import NearDuplicateIndex
+    from src.pipeline.publish import apublish_inputs, build_publish_pipeline, publish_inputs
+
+    generator = create_generator(provider, cache_mode)
+    pool = BrowserPool(headless=headless)
+    assets = AssetPipeline()
+    dedup = NearDuplicateIndex(dedup_db, topic_threshold=dedup_threshold) if dedup_db else None
+    executor = build_publish_pipeline(
+        generator, pool, assets, images=images or ["test_image.jpg"],
+        generate_concurrency=generate_concurrency,
+        publish_concurrency=publish_concurrency,
+        queue_size=queue_size,
+        dedup=dedup,
+    )
+
+    def on_item_done(item):
+        timings = " ".join(f"{name}={seconds:.2f}s" for name, seconds in item.timings.items())
+        status = f"FAILED at {item.failed_stage}: {item.error}" if item.error else "OK"
+        print(f"[Pipeline] #{item.index} '{item.data['topic']}' {status} ({timings})")
+
+    topics_source = sys.stdin if topics_file == "-" else open(topics_file, "r", encoding="utf-8")
+    # A pipe can block on every line: read stdin off the event loop so running items keep moving
+    if topics_source is sys.stdin:
+        inputs = apublish_inputs(aread_topics(topics_source), profiles)
+    else:
+        inputs = publish_inputs(read_topics(topics_source), profiles)
+    try:
+        report = await executor.run(inputs, on_item_done)
+    finally:
+        if topics_source is not sys.stdin:
+            topics_source.close()
+        assets.close()
+        await pool.shutdown()
+        if dedup is not None:
+            dedup.close()
+
+    print(json.dumps(report, indent=2))
+    print(f"[Assets] {assets.stats}")
+    print_cache_stats(generator)
+    return report
+
+def jobs_add_task(db: str, topic: str, topics_file: str, provider: str, profiles: list, images: list = None,
+                  at: str = None, delay: float = 0, max_attempts: int = 3) -> list:
+    """
+    Queues generate-and-publish jobs in the job store; profiles are assigned round-robin.
+    """
+    from datetime import datetime
+    from src.content.batch import read_topics
+    from src.pipeline.jobs import JobStore
+
+    run_at = datetime.fromisoformat(at).timestamp() if at else time.time() + delay
+    if topic:
+        topics = [topic]
+    else:
+        topics_source = sys.stdin if topics_file == "-" else open(topics_file, "r", encoding="utf-8")
+        try:
+            topics = list(read_topics(topics_source))
+        finally:
+            if topics_source is not sys.stdin:
+                topics_source.close()
+
+    store = JobStore(db)
+    try:
+        ids = store.add_many({"topic": item, "provider": provider, "profile": profiles[index % len(profiles)],
+                              "images": images, "run_at": run_at, "max_attempts": max_attempts}
+                             for index, item in enumerate(topics))
+        print(f"[Jobs] Queued {len(ids)} job(s) (ids {ids[0]}..{ids[-1]}), due {time.ctime(run_at)}" if ids
+              else "[Jobs] No topics to queue")
+        print(f"[Jobs] Queue: {store.counts()}")
+    finally:
+        store.close()
+    return ids
+
+async def jobs_run_task(db: str, concurrency: int, per_profile: int, headless: bool, until_idle: bool,
+                        cache_mode: str = "off", images: list = None):
+    """
+    Runs the job scheduler: claims due jobs and resumes interrupted ones at their last completed stage.
+    """
+    from src.browser.pool import BrowserPool
+    from src.content.assets import AssetPipeline
+    from src.pipeline.jobs import JobStore
+    from src.pipeline.scheduler import JobScheduler
+
+    store = JobStore(db)
+    pool = BrowserPool(headless=headless)
+    assets = AssetPipeline()
+    generators = {}
+
+    def generator_for(provider: str) -> ContentGenerator:
+        if provider not in generators:
+            generators[provider] = create_generator(provider, cache_mode)
+        return generators[provider]
+
+    scheduler = JobScheduler(store, generator_for, pool, assets, images=images or ["test_image.jpg"],
+                             concurrency=concurrency, per_profile=per_profile)
+    try:
+        return await scheduler.run(until_idle=until_idle)
+    finally:
+        assets.close()
+        await pool.shutdown()
+        store.close()
+
+def jobs_list_task(db: str, state: str = None, limit: int = 50, job_id: int = None):
+    """Prints queue counts and recent jobs, or one job with its event log."""
+    from src.pipeline.jobs import JobStore
+
+    store = JobStore(db)
+    try:
+        if job_id is not None:
+            job = store.get(job_id)
+            if job is None:
+                print(f"No job {job_id}")
+                return
+            print(json.dumps(dict(job.as_dict(), events=store.events(job_id)), indent=2, ensure_ascii=False))
+            return
+        print(f"[Jobs] Queue: {store.counts()}")
+        for job in store.list(state, limit):
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job.run_at))
+            error = f"  error: {job.error}" if job.error else ""
+            print(f"#{job.id:<6} {job.state:<8} stage={job.stage or '-':<9} attempts={job.attempts}/{job.max_attempts} "
+                  f"due={when} {job.provider:<8} '{job.topic}'{error}")
+    finally:
+        store.close()
+
+async def _run_and_close(coro):
+    try:
+        return await coro
+    finally:
+        # Close pooled LLM connections while the loop is still alive. Only if a provider
+        # actually opened them: importing the module would pull in httpx / openai.
+        http_clients = sys.modules.get("src.utils.http_clients")
+        if http_clients is not None:
+            await http_clients.aclose_all()
+
+def run_async(coro):
+    """asyncio.run() plus cleanup of the shared HTTP clients."""
+    return asyncio.run(_run_and_close(coro))
+
+def flush_trace():
+    path = get_tracer().flush()
+    if path:
+        print(f"[Trace] Spans appended to {get_tracer().jsonl_path}", file=sys.stderr)
+        print(f"[Trace] Chrome trace written to {path} (open in chrome://tracing or ui.perfetto.dev)", file=sys.stderr)
+
+def trace_summary_task(paths, as_json: bool = False):
+    """Prints per-span latency percentiles across one or more traced runs."""
+    summary = summarize_spans(load_spans(paths))
+    if as_json:
+        print(json.dumps(summary, indent=2))
+        return summary
+    if not summary:
+        print("No spans found.")
+        return summary
+    width = max(len(name) for name in summary)
+    print(f"{'span':<{width}} {'count':>6} {'errors':>6} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, stats in summary.items():
+        print(f"{name:<{width}} {stats['count']:>6} {stats['errors']:>6} {stats['mean']:>9} "
+              f"{stats['p50']:>9} {stats['p95']:>9} {stats['p99']:>9} {stats['max']:>9}")
+    return summary
+
+PROVIDER_HELP = f"AI Provider ({', '.join(provider_names())}); comma-separate several to hedge across them"
+
+def provider_spec(value: str) -> str:
+    """argparse type: one registry name, or a comma-separated list for hedged generation."""
+    unknown = [name for name in value.split(",") if name not in provider_names()]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown provider(s): {', '.join(unknown)}")
+    return value
+
 def main():
     parser = argparse.ArgumentParser(description="AI Self-Media Operation Tool")
+    parser.add_argument("--trace-dir", default=os.getenv("TRACE_DIR"),
+                        help="Record spans to <dir>/spans.jsonl and write a Chrome trace per run (env: TRACE_DIR)")
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     # Login command
@@ -110,24 +494,135 @@ def main():
 
     # Generate command
     gen_parser = subparsers.add_parser("generate", help="Generate content")
-    gen_parser.add_argument("--topic", required=True, help="Topic to generate content for")
-    gen_parser.add_argument("--provider", default="mock", choices=["mock", "gemini", "deepseek"], help="AI Provider")
+    gen_topics = gen_parser.add_mutually_exclusive_group(required=True)
+    gen_topics.add_argument("--topic", help="Topic to generate content for")
+    gen_topics.add_argument("--topics-file", help="Batch mode: file with one topic per line ('-' for stdin)")
+    gen_parser.add_argument("--provider", default="mock", type=provider_spec,
+                            help=PROVIDER_HELP)
+    gen_parser.add_argument("--stream", action="store_true", help="Print the model output as it arrives")
+    gen_parser.add_argument("--concurrency", type=int, default=8, help="Batch mode: max generations in flight")
+    gen_parser.add_argument("--output", default="-", help="Batch mode: JSONL output file ('-' for stdout)")
+    gen_parser.add_argument("--cache", dest="cache_mode", default="off", choices=["off", "on", "refresh"],
+                            help="Response cache: off, on, or refresh (bypass reads, store new results)")
+    gen_parser.add_argument("--dedup", dest="dedup_mode", default="off", choices=["off", "reuse", "skip"],
+                            help="Batch mode: for topics near-identical to ones produced before, reuse the earlier "
+                                 "result or skip them, instead of calling the provider")
+    gen_parser.add_argument("--dedup-db", default="user_data/dedup.sqlite3", help="Near-duplicate index (SQLite)")
+    gen_parser.add_argument("--dedup-threshold", type=float, default=0.7,
+                            help="Topic similarity (0-1) from which topics count as near-duplicates")
 
     # Publish command
     pub_parser = subparsers.add_parser("publish", help="Generate and Publish content")
     pub_parser.add_argument("--topic", required=True, help="Topic to publish")
-    pub_parser.add_argument("--provider", default="mock", choices=["mock", "gemini", "deepseek"], help="AI Provider")
+    pub_parser.add_argument("--provider", default="mock", type=provider_spec,
+                            help=PROVIDER_HELP)
+    pub_parser.add_argument("--images", nargs="+", help="Image files or directories to upload (default: test_image.jpg)")
+    pub_parser.add_argument("--cache", dest="cache_mode", default="off", choices=["off", "on", "refresh"],
+                            help="Response cache: off, on, or refresh (bypass reads, store new results)")
+
+    # Serve command
+    serve_parser = subparsers.add_parser("serve", help="Run a resident browser pool that publishes queued jobs")
+    serve_parser.add_argument("--jobs", default="-", help="JSONL job queue: file, FIFO, or '-' for stdin")
+    serve_parser.add_argument("--headless", action="store_true", help="Run browsers headless")
+    serve_parser.add_argument("--max-jobs-per-context", type=int, default=20, help="Recycle a browser context after N jobs")
+    serve_parser.add_argument("--cache", dest="cache_mode", default="off", choices=["off", "on", "refresh"],
+                              help="Response cache: off, on, or refresh (bypass reads, store new results)")
+
+    # Pipeline command
+    pipe_parser = subparsers.add_parser("pipeline", help="Generate and publish many topics with overlapping stages")
+    pipe_parser.add_argument("--topics-file", required=True, help="File with one topic per line ('-' for stdin)")
+    pipe_parser.add_argument("--provider", default="mock", type=provider_spec,
+                             help=PROVIDER_HELP)
+    pipe_parser.add_argument("--profiles", default="user_data/browser_context",
+                             help="Comma-separated browser profile directories, used round-robin")
+    pipe_parser.add_argument("--generate-concurrency", type=int, default=2, help="Generations in flight")
+    pipe_parser.add_argument("--publish-concurrency", type=int, default=1, help="Publishes in flight (max one per profile)")
+    pipe_parser.add_argument("--queue-size", type=int, default=2, help="Capacity of the queues between stages")
+    pipe_parser.add_argument("--images", nargs="+", help="Image files or directories for every post (default: test_image.jpg)")
+    pipe_parser.add_argument("--headless", action="store_true", help="Run browsers headless")
+    pipe_parser.add_argument("--cache", dest="cache_mode", default="off", choices=["off", "on", "refresh"],
+                             help="Response cache: off, on, or refresh (bypass reads, store new results)")
+    pipe_parser.add_argument("--dedup-db", help="Skip topics / posts near-identical to ones published before, "
+                                                "using this index (SQLite, e.g. user_data/published.sqlite3)")
+    pipe_parser.add_argument("--dedup-threshold", type=float, default=0.7,
+                             help="Topic similarity (0-1) from which topics count as near-duplicates")
+
+    # Job queue commands
+    jobs_parser = subparsers.add_parser("jobs", help="Durable job queue: add, run and inspect scheduled jobs")
+    jobs_parser.add_argument("--db", default="user_data/jobs.sqlite3", help="Job store (SQLite)")
+    jobs_commands = jobs_parser.add_subparsers(dest="jobs_command", help="Job commands")
+    jobs_add = jobs_commands.add_parser("add", help="Queue generate-and-publish jobs")
+    jobs_add_topics = jobs_add.add_mutually_exclusive_group(required=True)
+    jobs_add_topics.add_argument("--topic", help="Topic for a single job")
+    jobs_add_topics.add_argument("--topics-file", help="One job per line ('-' for stdin)")
+    jobs_add.add_argument("--provider", default="mock", type=provider_spec, help=PROVIDER_HELP)
+    jobs_add.add_argument("--profiles", default="user_data/browser_context",
+                          help="Comma-separated browser profile directories, used round-robin")
+    jobs_add.add_argument("--images", nargs="+", help="Image files or directories (default: the runner's images)")
+    jobs_add.add_argument("--at", help="Due time, ISO format (e.g. 2025-01-31T09:00)")
+    jobs_add.add_argument("--delay", type=float, default=0, help="Due in N seconds")
+    jobs_add.add_argument("--max-attempts", type=int, default=3, help="Attempts before a job is marked failed")
+    jobs_run = jobs_commands.add_parser("run", help="Run the scheduler (resumes interrupted jobs)")
+    jobs_run.add_argument("--concurrency", type=int, default=4, help="Jobs in flight")
+    jobs_run.add_argument("--per-profile", type=int, default=1, help="Jobs running at once per profile directory")
+    jobs_run.add_argument("--until-idle", action="store_true", help="Exit when no job is running or due")
+    jobs_run.add_argument("--images", nargs="+", help="Default images (default: test_image.jpg)")
+    jobs_run.add_argument("--headless", action="store_true", help="Run browsers headless")
+    jobs_run.add_argument("--cache", dest="cache_mode", default="off", choices=["off", "on", "refresh"],
+                          help="Response cache: off, on, or refresh (bypass reads, store new results)")
+    jobs_list = jobs_commands.add_parser("list", help="Show queue counts and jobs")
+    jobs_list.add_argument("--state", choices=["queued", "running", "done", "failed"])
+    jobs_list.add_argument("--limit", type=int, default=50)
+    jobs_list.add_argument("--id", type=int, help="Show one job with its event log")
+
+    # Trace summary command
+    trace_parser = subparsers.add_parser("trace-summary", help="Per-span latency percentiles across traced runs")
+    trace_parser.add_argument("paths", nargs="+", help="spans.jsonl files, trace directories or glob patterns")
+    trace_parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
 
     args = parser.parse_args()
 
+    if args.trace_dir and args.command != "trace-summary":
+        get_tracer().configure(args.trace_dir)
+
     if args.command == "login":
-        asyncio.run(login_task())
+        run_async(login_task())
     elif args.command == "generate":
-        generate_task(args.topic, args.provider)
+        if args.topics_file:
+            run_async(batch_generate_task(args.topics_file, args.provider, args.concurrency, args.output, args.cache_mode,
+                                          args.dedup_mode, args.dedup_db, args.dedup_threshold))
+        elif args.stream:
+            run_async(stream_generate_task(args.topic, args.provider, args.cache_mode))
+        elif "," in args.provider:
+            # Hedged: the async path cancels losing attempts, while sync worker threads would
+            # keep the process alive until the slowest provider gave up
+            run_async(agenerate_task(args.topic, args.provider, args.cache_mode))
+        else:
+            generate_task(args.topic, args.provider, args.cache_mode)
     elif args.command == "publish":
-        asyncio.run(publish_task(args.topic, args.provider))
+        run_async(publish_task(args.topic, args.provider, args.cache_mode, args.images))
+    elif args.command == "pipeline":
+        run_async(pipeline_task(args.topics_file, args.provider, args.profiles.split(","),
+                                  args.generate_concurrency, args.publish_concurrency, args.queue_size,
+                                  args.headless, args.cache_mode, args.images, args.dedup_db, args.dedup_threshold))
+    elif args.command == "serve":
+        run_async(serve_task(args.jobs, args.headless, args.max_jobs_per_context, args.cache_mode))
+    elif args.command == "jobs":
+        if args.jobs_command == "add":
+            jobs_add_task(args.db, args.topic, args.topics_file, args.provider, args.profiles.split(","),
+                          args.images, args.at, args.delay, args.max_attempts)
+        elif args.jobs_command == "run":
+            run_async(jobs_run_task(args.db, args.concurrency, args.per_profile, args.headless, args.until_idle,
+                                    args.cache_mode, args.images))
+        elif args.jobs_command == "list":
+            jobs_list_task(args.db, args.state, args.limit, args.id)
+        else:
+            jobs_parser.print_help()
+    elif args.command == "trace-summary":
+        trace_summary_task(args.paths, args.json)
     else:
         parser.print_help()
+    flush_trace()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,135 @@
+import asyncio
+import time
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+
+from src.utils.stats import summarize_latencies
+
+
+class PipelineItem:
+    """
+    One unit of work flowing through the pipeline.
+
+    Attributes:
+        index (int): Position in the input.
+        data (dict): Payload; every stage reads from and adds to it.
+        timings (dict): Stage name -> seconds spent in that stage.
+        error (str): Set when a stage failed; the item then skips the remaining stages.
+    """
+    def __init__(self, index: int, data: Dict[str, Any]):
+        self.index = index
+        self.data = data
+        self.timings: Dict[str, float] = {}
+        self.error: Optional[str] = None
+        self.failed_stage: Optional[str] = None
+
+
+class Stage:
+    """
+    A pipeline stage: an async function applied to each item by `concurrency` workers.
+
+    Args:
+        name: Stage name used in reports.
+        func: async (data: dict) -> dict, returning the updated payload.
+        concurrency: Number of workers for this stage.
+        queue_size: Capacity of this stage's input queue. When it is full the
+            upstream stage blocks, which is what provides back-pressure.
+    """
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 concurrency: int = 1, queue_size: int = 2):
+        if concurrency < 1:
+            raise ValueError(f"Stage '{name}': concurrency must be >= 1")
+        self.name = name
+        self.func = func
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.latencies: List[float] = []
+        self.errors = 0
+
+
+class PipelineExecutor:
+    """
+    Runs items through a chain of stages joined by bounded queues, so that
+    e.g. generation of item N+1 overlaps with publishing of item N.
+    """
+    def __init__(self, stages: List[Stage]):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+
+    async def _stage_worker(self, stage: Stage, inbox: asyncio.Queue, outbox: asyncio.Queue):
+        while True:
+            item = await inbox.get()
+            if item is None:
+                return
+            if item.error is None:
+                start = time.perf_counter()
+                try:
+                    item.data = await stage.func(item.data)
+                except Exception as e:
+                    stage.errors += 1
+                    item.error = str(e)
+                    item.failed_stage = stage.name
+                elapsed = time.perf_counter() - start
+                item.timings[stage.name] = elapsed
+                stage.latencies.append(elapsed * 1000)
+            await outbox.put(item)
+
+    async def run(self, inputs: Union[Iterable[Dict[str, Any]], AsyncIterable[Dict[str, Any]]],
+                  on_item_done: Optional[Callable[[PipelineItem], None]] = None) -> Dict[str, Any]:
+        """
+        Feeds all inputs (an iterable, or an async iterable for sources whose reads may block)
+        through the pipeline and returns a report with per-stage latency, error counts and
+        overall throughput.
+        """
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        done_queue: asyncio.Queue = asyncio.Queue()
+        completed: List[PipelineItem] = []
+
+        async def feed():
+            if isinstance(inputs, AsyncIterable):
+                index = 0
+                async for data in inputs:
+                    await queues[0].put(PipelineItem(index, data))
+                    index += 1
+            else:
+                for index, data in enumerate(inputs):
+                    await queues[0].put(PipelineItem(index, data))
+            # One sentinel per worker: each worker exits on the first one it reads
+            for _ in range(self.stages[0].concurrency):
+                await queues[0].put(None)
+
+        async def run_stage(position: int):
+            stage = self.stages[position]
+            is_last = position + 1 == len(self.stages)
+            outbox = done_queue if is_last else queues[position + 1]
+            await asyncio.gather(*(self._stage_worker(stage, queues[position], outbox)
+                                   for _ in range(stage.concurrency)))
+            # All workers of this stage are done: release the workers of the next one
+            downstream_workers = 1 if is_last else self.stages[position + 1].concurrency
+            for _ in range(downstream_workers):
+                await outbox.put(None)
+
+        async def collect():
+            while True:
+                item = await done_queue.get()
+                if item is None:
+                    return
+                completed.append(item)
+                if on_item_done:
+                    on_item_done(item)
+
+        start = time.perf_counter()
+        await asyncio.gather(feed(), collect(), *(run_stage(i) for i in range(len(self.stages))))
+        elapsed = time.perf_counter() - start
+
+        failed = sum(1 for item in completed if item.error)
+        return {
+            "items": len(completed),
+            "failed": failed,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_per_s": round(len(completed) / elapsed, 3) if elapsed > 0 else 0.0,
+            "stages": {
+                stage.name: dict(summarize_latencies(stage.latencies), errors=stage.errors, concurrency=stage.concurrency)
+                for stage in self.stages
+            },
+        }
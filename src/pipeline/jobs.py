@@ -0,0 +1,319 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+# Job states. A job is "running" only while a scheduler holds its lease; a lease that
+# expires (the process crashed) puts the job back to "queued" at its last completed stage,
+# or to "failed" once it has used up its attempts.
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+# Completed stages, in order
+GENERATED, PUBLISHED = "generated", "published"
+
+
+class Job:
+    """
+    One generate-and-publish job as stored in the JobStore.
+
+    Attributes:
+        id (int): Row id.
+        topic (str): Topic to generate content for.
+        provider (str): Provider spec for create_generator().
+        profile (str): Absolute browser profile directory the job publishes from.
+        images (list): Image files or directories (None: the scheduler's default images).
+        state (str): queued / running / done / failed.
+        stage (str): Last completed stage (None, "generated" or "published").
+        result (dict): The generated content, once stage is "generated".
+        attempts (int): Times the job has been claimed.
+        max_attempts (int): Claims allowed before the job is marked failed.
+        run_at (float): Unix time the job becomes due.
+        error (str): Last error, if any.
+    """
+    def __init__(self, row: sqlite3.Row):
+        self.id = row["id"]
+        self.topic = row["topic"]
+        self.provider = row["provider"]
+        self.profile = row["profile"]
+        self.images = json.loads(row["images"]) if row["images"] else None
+        self.state = row["state"]
+        self.stage = row["stage"]
+        self.result = json.loads(row["result"]) if row["result"] else None
+        self.attempts = row["attempts"]
+        self.max_attempts = row["max_attempts"]
+        self.run_at = row["run_at"]
+        self.error = row["error"]
+        self.lease_owner = row["lease_owner"]
+        self.created_at = row["created_at"]
+        self.updated_at = row["updated_at"]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {key: value for key, value in vars(self).items()}
+
+
+class JobStore:
+    """
+    Durable SQLite queue of generate/publish jobs with a per-job event log.
+
+    Claiming runs in a BEGIN IMMEDIATE transaction, so several schedulers (threads or
+    processes) can share one database without handing out the same job twice. Every
+    lookup the scheduler does is served by an index, so claim cost stays flat with
+    tens of thousands of queued jobs.
+
+    Attributes:
+        path (str): SQLite database file.
+    """
+    def __init__(self, path: str = "user_data/jobs.sqlite3"):
+        self.path = os.path.abspath(path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Autocommit mode: transactions are opened explicitly where they matter
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " topic TEXT NOT NULL,"
+            " provider TEXT NOT NULL,"
+            " profile TEXT NOT NULL,"
+            " images TEXT,"
+            " state TEXT NOT NULL,"
+            " stage TEXT,"
+            " result TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " max_attempts INTEGER NOT NULL,"
+            " run_at REAL NOT NULL,"
+            " error TEXT,"
+            " lease_owner TEXT,"
+            " lease_expires REAL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL);"
+            # Due queued jobs, and running jobs by lease expiry
+            "CREATE INDEX IF NOT EXISTS idx_jobs_state_run_at ON jobs(state, run_at);"
+            "CREATE INDEX IF NOT EXISTS idx_jobs_state_lease ON jobs(state, lease_expires);"
+            # Next due job of one profile: a single index seek per profile
+            "CREATE INDEX IF NOT EXISTS idx_jobs_state_profile_run_at ON jobs(state, profile, run_at, id);"
+            # The (small) set of profiles ever used, so claims never scan the jobs table for them
+            "CREATE TABLE IF NOT EXISTS profiles (profile TEXT PRIMARY KEY);"
+            "CREATE TABLE IF NOT EXISTS job_events ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " job_id INTEGER NOT NULL,"
+            " at REAL NOT NULL,"
+            " event TEXT NOT NULL,"
+            " detail TEXT);"
+            "CREATE INDEX IF NOT EXISTS idx_job_events_job ON job_events(job_id, id);"
+        )
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction that takes the database lock up front (no upgrade deadlocks)."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _event(conn: sqlite3.Connection, job_id: int, event: str, detail: Any = None, now: Optional[float] = None):
+        conn.execute(
+            "INSERT INTO job_events (job_id, at, event, detail) VALUES (?, ?, ?, ?)",
+            (job_id, now or time.time(), event,
+             None if detail is None else json.dumps(detail, ensure_ascii=False, default=str)),
+        )
+
+    def add(self, topic: str, provider: str = "mock", profile: str = "user_data/browser_context",
+            images: Optional[List[str]] = None, run_at: Optional[float] = None, max_attempts: int = 3) -> int:
+        """Queues a job (due at run_at, default now) and returns its id."""
+        return self.add_many([{"topic": topic, "provider": provider, "profile": profile, "images": images,
+                               "run_at": run_at, "max_attempts": max_attempts}])[0]
+
+    def add_many(self, specs: Iterable[Dict[str, Any]]) -> List[int]:
+        """Queues many jobs (dicts with add()'s arguments) in one transaction. Returns their ids."""
+        now = time.time()
+        ids = []
+        with self._transaction() as conn:
+            for spec in specs:
+                profile = os.path.abspath(spec.get("profile") or "user_data/browser_context")
+                images = spec.get("images")
+                conn.execute("INSERT OR IGNORE INTO profiles (profile) VALUES (?)", (profile,))
+                cursor = conn.execute(
+                    "INSERT INTO jobs (topic, provider, profile, images, state, max_attempts, run_at, created_at, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (spec["topic"], spec.get("provider") or "mock", profile, json.dumps(images) if images else None,
+                     QUEUED, spec.get("max_attempts") or 3, spec.get("run_at") or now, now, now),
+                )
+                self._event(conn, cursor.lastrowid, "state", {"to": QUEUED}, now)
+                ids.append(cursor.lastrowid)
+        return ids
+
+    def recover_expired(self) -> int:
+        """
+        Re-queues running jobs whose lease expired (their scheduler died or hung), or fails
+        them if they have no attempts left. Returns the count.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            return self._recover(conn, now)
+
+    def _recover(self, conn: sqlite3.Connection, now: float) -> int:
+        rows = conn.execute("SELECT id, stage, attempts, max_attempts FROM jobs WHERE state = ? AND lease_expires < ?",
+                            (RUNNING, now)).fetchall()
+        for row in rows:
+            # A job that keeps crashing or hanging its scheduler must not be claimed forever
+            if row["attempts"] >= row["max_attempts"]:
+                error = f"lease expired on attempt {row['attempts']}/{row['max_attempts']}"
+                conn.execute("UPDATE jobs SET state = ?, error = ?, lease_owner = NULL, lease_expires = NULL,"
+                             " updated_at = ? WHERE id = ?", (FAILED, error, now, row["id"]))
+                self._event(conn, row["id"], "state", {"to": FAILED, "reason": "lease expired", "error": error}, now)
+                continue
+            conn.execute("UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+                         (QUEUED, now, row["id"]))
+            self._event(conn, row["id"], "state", {"to": QUEUED, "reason": "lease expired", "resume_stage": row["stage"]}, now)
+        return len(rows)
+
+    def claim(self, owner: str, lease_seconds: float = 900, per_profile: int = 1) -> Optional[Job]:
+        """
+        Atomically takes the next due job whose profile has fewer than per_profile running jobs.
+        Returns None when nothing is claimable right now.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            self._recover(conn, now)
+            running = {profile: count for profile, count in conn.execute(
+                "SELECT profile, COUNT(*) FROM jobs WHERE state = ? GROUP BY profile", (RUNNING,))}
+            row = None
+            for (profile,) in conn.execute("SELECT profile FROM profiles").fetchall():
+                if running.get(profile, 0) >= per_profile:
+                    continue
+                candidate = conn.execute(
+                    "SELECT * FROM jobs WHERE state = ? AND profile = ? AND run_at <= ? ORDER BY run_at, id LIMIT 1",
+                    (QUEUED, profile, now),
+                ).fetchone()
+                if candidate and (row is None or (candidate["run_at"], candidate["id"]) < (row["run_at"], row["id"])):
+                    row = candidate
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated_at = ?"
+                " WHERE id = ?",
+                (RUNNING, owner, now + lease_seconds, now, row["id"]),
+            )
+            self._event(conn, row["id"], "state", {"to": RUNNING, "owner": owner, "attempt": row["attempts"] + 1,
+                                                   "resume_stage": row["stage"]}, now)
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return Job(row)
+
+    def heartbeat(self, job_id: int, owner: str, lease_seconds: float = 900) -> bool:
+        """Extends the lease; False means the job was taken away (lease expired and reclaimed)."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                (now + lease_seconds, now, job_id, RUNNING, owner),
+            )
+        return cursor.rowcount == 1
+
+    def record_generation(self, job_id: int, owner: str, result: Dict[str, Any]) -> bool:
+        """
+        Persists the generated content, so a crash before publishing doesn't lose it.
+        False means owner no longer holds the lease and nothing was written.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET stage = ?, result = ?, updated_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                (GENERATED, json.dumps(result, ensure_ascii=False), now, job_id, RUNNING, owner),
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._event(conn, job_id, "stage", {"stage": GENERATED, "title": result.get("title")}, now)
+        return True
+
+    def record_publish_attempt(self, job_id: int, ok: bool, seconds: float, error: Optional[str] = None):
+        with self._transaction() as conn:
+            self._event(conn, job_id, "publish_attempt", {"ok": ok, "seconds": round(seconds, 2), "error": error})
+
+    def complete(self, job_id: int, owner: str) -> bool:
+        """Marks the job done. False means owner no longer holds the lease and nothing was written."""
+        now = time.time()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, stage = ?, error = NULL, lease_owner = NULL, lease_expires = NULL,"
+                " updated_at = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                (DONE, PUBLISHED, now, job_id, RUNNING, owner),
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._event(conn, job_id, "state", {"to": DONE}, now)
+        return True
+
+    def fail(self, job_id: int, owner: str, error: str, retry_delay: float = 60) -> Optional[str]:
+        """
+        Records a failed attempt. The job is re-queued after retry_delay (doubled per attempt)
+        while it has attempts left, otherwise marked failed. Returns the new state, or None
+        if owner no longer holds the lease (nothing was written).
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND state = ? AND lease_owner = ?",
+                               (job_id, RUNNING, owner)).fetchone()
+            if row is None:
+                return None
+            state = QUEUED if row["attempts"] < row["max_attempts"] else FAILED
+            run_at = now + retry_delay * (2 ** (row["attempts"] - 1))
+            conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, run_at = ?, lease_owner = NULL, lease_expires = NULL,"
+                " updated_at = ? WHERE id = ?",
+                (state, error, run_at, now, job_id),
+            )
+            self._event(conn, job_id, "state", {"to": state, "error": error}, now)
+        return state
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(row) if row else None
+
+    def list(self, state: Optional[str] = None, limit: int = 50) -> List[Job]:
+        with self._lock:
+            if state:
+                rows = self._conn.execute("SELECT * FROM jobs WHERE state = ? ORDER BY run_at, id LIMIT ?",
+                                          (state, limit)).fetchall()
+            else:
+                rows = self._conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [Job(row) for row in rows]
+
+    def events(self, job_id: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT at, event, detail FROM job_events WHERE job_id = ? ORDER BY id",
+                                      (job_id,)).fetchall()
+        return [{"at": row["at"], "event": row["event"], "detail": json.loads(row["detail"]) if row["detail"] else None}
+                for row in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        return {row["state"]: row["n"] for row in rows}
+
+    def next_due(self) -> Optional[float]:
+        """run_at of the earliest queued job (None if the queue is empty)."""
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(run_at) AS run_at FROM jobs WHERE state = ?", (QUEUED,)).fetchone()
+        return row["run_at"]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def new_owner_id() -> str:
+    """Lease owner id for one scheduler process."""
+    return f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
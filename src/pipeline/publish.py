@@ -0,0 +1,98 @@
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set
+
+from src.browser.pool import BrowserPool, PublishJob
+from src.content.assets import AssetPipeline
+from src.content.base import ContentGenerator, is_error_result
+from src.content.dedup import NearDuplicateIndex
+from .executor import PipelineExecutor, Stage
+
+
+def build_publish_pipeline(generator: ContentGenerator, pool: BrowserPool, assets: AssetPipeline, images: List[str],
+                           generate_concurrency: int = 2, asset_concurrency: int = 1,
+                           publish_concurrency: int = 1, queue_size: int = 2,
+                           dedup: Optional[NearDuplicateIndex] = None) -> PipelineExecutor:
+    """
+    Builds the generate -> asset prep -> publish pipeline.
+
+    Input items are dicts with "topic" and "profile", and optionally "images"
+    (files or directories) overriding the default images. Publishing in one profile is
+    serialized by the pool, so publish_concurrency > 1 only helps with several profiles.
+    With a NearDuplicateIndex, items whose topic or generated post is a near-duplicate of
+    one produced before fail at "generate" (the topic check runs before any provider call).
+    """
+    # Entries reserved by this pipeline whose generation is still running
+    in_flight: Set[int] = set()
+
+    async def generate(data: Dict[str, Any]) -> Dict[str, Any]:
+        entry_id = None
+        if dedup is not None:
+            match = dedup.find_topic(data["topic"])
+            # An entry with no result that isn't in flight here was left by an interrupted run
+            if match is not None and (match["result"] is not None or match["id"] in in_flight):
+                raise RuntimeError(f"near-duplicate of '{match['topic']}' (similarity {match['similarity']})")
+            # Reserved before the provider call, so a near-duplicate topic arriving meanwhile is caught too
+            entry_id = dedup.add(data["topic"])
+            in_flight.add(entry_id)
+        try:
+            result = await generator.agenerate(data["topic"])
+            # Never publish the placeholder the wrappers return on provider errors
+            if is_error_result(result):
+                raise RuntimeError(result.get("content"))
+            if dedup is not None:
+                match = dedup.find_content(result, exclude=entry_id)
+                if match is not None:
+                    raise RuntimeError(f"generated post is a near-duplicate of the one for '{match['topic']}' "
+                                       f"(similarity {match['similarity']})")
+                # Indexed right away, so near-duplicates later in this run are caught before publishing
+                dedup.set_result(entry_id, result)
+        except BaseException:
+            if entry_id is not None:
+                dedup.remove(entry_id)
+            raise
+        finally:
+            in_flight.discard(entry_id)
+        if entry_id is not None:
+            data["dedup_id"] = entry_id
+        data["content_data"] = result
+        return data
+
+    async def prepare_assets(data: Dict[str, Any]) -> Dict[str, Any]:
+        data["image_paths"] = await assets.prepare(data.get("images", images))
+        return data
+
+    async def publish(data: Dict[str, Any]) -> Dict[str, Any]:
+        content_data = data["content_data"]
+        job = PublishJob(
+            title=content_data.get("title"),
+            content=content_data.get("content"),
+            image_paths=data["image_paths"],
+            profile=data["profile"],
+        )
+        try:
+            await pool.publish(job)
+        except Exception:
+            # Not published after all: the topic may be produced again later
+            if dedup is not None and "dedup_id" in data:
+                dedup.remove(data["dedup_id"])
+            raise
+        return data
+
+    return PipelineExecutor([
+        Stage("generate", generate, concurrency=generate_concurrency, queue_size=queue_size),
+        Stage("assets", prepare_assets, concurrency=asset_concurrency, queue_size=queue_size),
+        Stage("publish", publish, concurrency=publish_concurrency, queue_size=queue_size),
+    ])
+
+
+def publish_inputs(topics: Iterable[str], profiles: List[str]) -> Iterator[Dict[str, Any]]:
+    """Pairs topics with profiles round-robin."""
+    for index, topic in enumerate(topics):
+        yield {"topic": topic, "profile": profiles[index % len(profiles)]}
+
+
+async def apublish_inputs(topics: AsyncIterable[str], profiles: List[str]) -> AsyncIterator[Dict[str, Any]]:
+    """publish_inputs() for an async topic source such as aread_topics()."""
+    index = 0
+    async for topic in topics:
+        yield {"topic": topic, "profile": profiles[index % len(profiles)]}
+        index += 1
@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import Callable, Dict, List, Optional
+
+from src.browser.pool import BrowserPool, PublishJob
+from src.content.assets import AssetPipeline
+from src.content.base import ContentGenerator, is_error_result
+from src.utils.tracing import span
+from .jobs import GENERATED, Job, JobStore, new_owner_id
+
+
+class JobScheduler:
+    """
+    Runs due jobs from a JobStore: generate -> asset prep -> publish.
+
+    Each stage's outcome is written to the store as soon as it completes, so a job
+    interrupted by a crash resumes at its last completed stage: paid-for content is
+    never generated twice. Publishing is at-least-once: a crash between the publish
+    click and the "done" write publishes the note again on resume. Store calls run in
+    worker threads: with several schedulers on one database, a call may wait on SQLite's
+    lock, and that must not stall the jobs in flight (or let their heartbeats slip).
+
+    Args:
+        store: The job queue.
+        generator_for: Returns the generator for a job's provider spec (memoize it).
+        pool: Browser pool that publishes (one warm context per profile).
+        assets: Image pipeline.
+        images: Default images for jobs without their own.
+        concurrency: Jobs in flight in this scheduler.
+        per_profile: Jobs allowed to run at once per profile directory, across all schedulers.
+        lease_seconds: How long a claim lasts without a heartbeat before another scheduler may resume the job.
+        poll_interval: Seconds between claim attempts when nothing is due.
+        retry_delay: Base delay before a failed job is retried (doubled per attempt).
+    """
+    def __init__(self, store: JobStore, generator_for: Callable[[str], ContentGenerator], pool: BrowserPool,
+                 assets: AssetPipeline, images: List[str], concurrency: int = 4, per_profile: int = 1,
+                 lease_seconds: float = 900, poll_interval: float = 1.0, retry_delay: float = 60):
+        self.store = store
+        self.generator_for = generator_for
+        self.pool = pool
+        self.assets = assets
+        self.images = images
+        self.concurrency = concurrency
+        self.per_profile = per_profile
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.owner = new_owner_id()
+        self.stats = {"claimed": 0, "done": 0, "requeued": 0, "failed": 0, "resumed": 0, "lost": 0}
+        self._active: Dict[int, asyncio.Task] = {}
+        self._slot_freed = asyncio.Event()
+
+    async def _heartbeat(self, job: Job, worker: asyncio.Task):
+        """Extends the lease until cancelled; stops the worker if another scheduler took the job over."""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            if not await asyncio.to_thread(self.store.heartbeat, job.id, self.owner, self.lease_seconds):
+                print(f"[Jobs] Lost the lease on job {job.id}, stopping it")
+                worker.cancel()
+                return
+
+    def _lost(self, job: Job, stage: str):
+        self.stats["lost"] += 1
+        print(f"[Jobs] Job {job.id} is no longer ours ({stage} not recorded)")
+
+    async def _process(self, job: Job):
+        heartbeat = asyncio.create_task(self._heartbeat(job, asyncio.current_task()))
+        try:
+            with span("job", job_id=job.id, provider=job.provider, resume_stage=job.stage):
+                content_data = job.result
+                if job.stage is None:
+                    content_data = await self.generator_for(job.provider).agenerate(job.topic)
+                    # Never publish the placeholder the wrappers return on provider errors
+                    if is_error_result(content_data):
+                        raise RuntimeError(content_data.get("content"))
+                    if not await asyncio.to_thread(self.store.record_generation, job.id, self.owner, content_data):
+                        self._lost(job, "generation")
+                        return
+                else:
+                    self.stats["resumed"] += 1
+                    print(f"[Jobs] Job {job.id} resumes after stage '{job.stage}'")
+
+                image_paths = await self.assets.prepare(job.images or self.images)
+                start = time.perf_counter()
+                try:
+                    await self.pool.publish(PublishJob(
+                        title=content_data.get("title"),
+                        content=content_data.get("content"),
+                        image_paths=image_paths,
+                        profile=job.profile,
+                    ))
+                except Exception as e:
+                    await asyncio.to_thread(self.store.record_publish_attempt, job.id, False,
+                                            time.perf_counter() - start, str(e))
+                    raise
+                await asyncio.to_thread(self.store.record_publish_attempt, job.id, True, time.perf_counter() - start)
+            if not await asyncio.to_thread(self.store.complete, job.id, self.owner):
+                self._lost(job, "completion")
+                return
+            self.stats["done"] += 1
+            print(f"[Jobs] Job {job.id} '{job.topic}' done")
+        except asyncio.CancelledError:
+            # Cancelled by the heartbeat: the new owner runs the job, nothing left to record
+            if heartbeat.done() and not heartbeat.cancelled():
+                self._lost(job, "cancellation")
+                return
+            raise
+        except Exception as e:
+            state = await asyncio.to_thread(self.store.fail, job.id, self.owner, str(e), self.retry_delay)
+            if state is None:
+                self._lost(job, "failure")
+                return
+            self.stats["requeued" if state == "queued" else "failed"] += 1
+            print(f"[Jobs] Job {job.id} failed (attempt {job.attempts}/{job.max_attempts}, now {state}): {e}")
+        finally:
+            heartbeat.cancel()
+            self._active.pop(job.id, None)
+            self._slot_freed.set()
+
+    async def _wait_time(self) -> float:
+        next_due = await asyncio.to_thread(self.store.next_due)
+        if next_due is None:
+            return self.poll_interval
+        return min(self.poll_interval, max(0.0, next_due - time.time()))
+
+    async def run(self, until_idle: bool = False):
+        """
+        Claims and runs jobs until cancelled. With until_idle, returns once nothing is
+        running and no queued job is due.
+        """
+        print(f"[Jobs] Scheduler {self.owner} started: {await asyncio.to_thread(self.store.counts)}")
+        try:
+            while True:
+                while len(self._active) < self.concurrency:
+                    job = await asyncio.to_thread(self.store.claim, self.owner, self.lease_seconds, self.per_profile)
+                    if job is None:
+                        break
+                    self.stats["claimed"] += 1
+                    self._active[job.id] = asyncio.create_task(self._process(job))
+                if until_idle and not self._active and await self._idle():
+                    break
+                self._slot_freed.clear()
+                try:
+                    await asyncio.wait_for(self._slot_freed.wait(), timeout=await self._wait_time())
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._active:
+                await asyncio.gather(*self._active.values(), return_exceptions=True)
+        print(f"[Jobs] Scheduler stats: {self.stats}, queue: {await asyncio.to_thread(self.store.counts)}")
+        return self.stats
+
+    async def _idle(self) -> bool:
+        next_due = await asyncio.to_thread(self.store.next_due)
+        return next_due is None or next_due > time.time()
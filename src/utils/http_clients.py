@@ -0,0 +1,83 @@
+import asyncio
+import importlib.util
+import os
+import threading
+import weakref
+from typing import Dict, Tuple
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+# Process-wide registry of OpenAI-compatible clients, keyed by (base_url, api_key).
+# Sharing clients means sharing their keep-alive connection pools, so repeated short
+# LLM calls (e.g. a new SmartLocator per publish) skip TCP + TLS setup.
+_sync_clients: Dict[Tuple[str, str], OpenAI] = {}
+# Async clients are bound to the event loop they were first used on, so they are kept per loop.
+# Keyed by the loop object itself (weakly): a loop id could be reused by a later loop.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, str], AsyncOpenAI]]" = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def http2_enabled() -> bool:
+    """HTTP/2 is used when the optional h2 package is installed (pip install httpx[http2]),
+    unless LLM_HTTP2=0."""
+    if os.getenv("LLM_HTTP2", "auto") == "0":
+        return False
+    return importlib.util.find_spec("h2") is not None
+
+
+def pool_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(_env_float("LLM_HTTP_MAX_CONNECTIONS", 20)),
+        max_keepalive_connections=int(_env_float("LLM_HTTP_MAX_KEEPALIVE", 10)),
+        keepalive_expiry=_env_float("LLM_HTTP_KEEPALIVE_EXPIRY", 60),
+    )
+
+
+def timeouts() -> httpx.Timeout:
+    return httpx.Timeout(
+        _env_float("LLM_HTTP_TIMEOUT", 60),
+        connect=_env_float("LLM_HTTP_CONNECT_TIMEOUT", 10),
+    )
+
+
+def get_openai_client(base_url: str, api_key: str) -> OpenAI:
+    """Returns the shared sync client for (base_url, api_key), creating it on first use."""
+    key = (base_url, api_key)
+    with _lock:
+        client = _sync_clients.get(key)
+        if client is None:
+            http_client = httpx.Client(limits=pool_limits(), timeout=timeouts(), http2=http2_enabled())
+            client = OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            _sync_clients[key] = client
+        return client
+
+
+def get_async_openai_client(base_url: str, api_key: str) -> AsyncOpenAI:
+    """
+    Returns the shared async client for (base_url, api_key) on the running event loop.
+    Must be called from inside the loop.
+    """
+    key = (base_url, api_key)
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            http_client = httpx.AsyncClient(limits=pool_limits(), timeout=timeouts(), http2=http2_enabled())
+            client = AsyncOpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+            clients[key] = client
+        return client
+
+
+async def aclose_all():
+    """Closes the async clients of the running loop (call before the loop shuts down)."""
+    with _lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
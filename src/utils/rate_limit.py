@@ -0,0 +1,485 @@
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from .tracing import get_tracer
+
+# Statuses that mean "slow down": rate limited, or the provider is overloaded
+THROTTLE_STATUSES = (429, 503, 529)
+# Transient server errors worth retrying, without treating them as a capacity signal
+RETRY_STATUSES = (500, 502, 504)
+
+# OpenAI-style rate-limit headers (DeepSeek and other compatible APIs use the same names)
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def _env_float(name: str, default: Optional[float]) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parses "20ms", "1s", "6m0s", "1h2m" or plain seconds into seconds."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        parts = _DURATION_PART.findall(value)
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts) if parts else None
+
+
+def retry_after(headers: Optional[Mapping[str, str]]) -> Optional[float]:
+    """Seconds from retry-after-ms / retry-after (HTTP-date values are ignored)."""
+    if not headers:
+        return None
+    if headers.get("retry-after-ms"):
+        milliseconds = parse_duration(headers["retry-after-ms"])
+        return milliseconds / 1000 if milliseconds is not None else None
+    return parse_duration(headers.get("retry-after"))
+
+
+def error_status(e: BaseException) -> Optional[int]:
+    """HTTP status of a provider SDK error (openai: status_code, google.api_core: code)."""
+    for attribute in ("status_code", "code"):
+        value = getattr(e, attribute, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def error_headers(e: BaseException) -> Optional[Mapping[str, str]]:
+    response = getattr(e, "response", None)
+    return getattr(response, "headers", None)
+
+
+def is_transient(e: BaseException) -> bool:
+    """Connection problems and timeouts, whatever SDK raised them."""
+    if isinstance(e, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    name = type(e).__name__
+    return "Connection" in name or "Timeout" in name
+
+
+def estimate_request_tokens(prompt: Any, expected_output: int = 800) -> int:
+    """
+    Rough token estimate for reserving TPM budget before a call: about two characters per
+    token (mixed Chinese / English) plus the expected answer. The reservation is corrected
+    with the real usage once the response arrives.
+    """
+    if isinstance(prompt, list):
+        prompt = " ".join(str(message.get("content", "")) for message in prompt)
+    return len(str(prompt)) // 2 + expected_output
+
+
+class TokenBucket:
+    """
+    A per-minute budget refilled continuously. reserve() always succeeds and may leave the
+    bucket in debt; it returns how long the caller has to wait until its share is paid back.
+    An unlimited bucket (per_minute=None) never asks anyone to wait.
+
+    Args:
+        per_minute: Budget per minute (requests or tokens); None for unlimited.
+        burst: Bucket capacity (default: one minute's budget).
+    """
+    def __init__(self, per_minute: Optional[float], burst: Optional[float] = None):
+        self.per_minute = per_minute
+        self.capacity = burst or per_minute
+        self.available = self.capacity or 0.0
+        self._updated = time.monotonic()
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.per_minute)
+
+    def _refill(self, now: float):
+        if self.limited:
+            self.available = min(self.capacity, self.available + (now - self._updated) * self.per_minute / 60)
+        self._updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        if not self.limited:
+            return 0.0
+        self._refill(now)
+        self.available -= amount
+        return max(0.0, -self.available * 60 / self.per_minute)
+
+    def refund(self, amount: float, now: float):
+        """Returns (or, if negative, charges) the difference between reserved and used."""
+        if self.limited:
+            self._refill(now)
+            self.available = min(self.capacity, self.available + amount)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """
+        Aligns the bucket with the provider's view from the response headers: learns the
+        limit if none was configured, and never assumes more budget than the provider reports
+        (other processes may share the key).
+        """
+        if limit and not self.limited:
+            self.per_minute = self.capacity = limit
+            self.available = limit if remaining is None else remaining
+            self._updated = now
+            return
+        if remaining is not None and self.limited:
+            self._refill(now)
+            self.available = min(self.available, remaining)
+
+
+class Permit:
+    """One admitted call: holds a concurrency slot and the reserved budget until released."""
+    def __init__(self, controller: "RateLimitController", tokens: int, queued_s: float, latency_signal: bool):
+        self.controller = controller
+        self.tokens = tokens
+        self.queued_s = queued_s
+        self.latency_signal = latency_signal
+        self.started_at = time.monotonic()
+        self.used_tokens: Optional[int] = None
+
+    def observe(self, headers: Optional[Mapping[str, str]] = None, used_tokens: Optional[int] = None):
+        """Feeds rate-limit headers and / or the real token usage of the call back to the controller."""
+        if headers:
+            self.controller.observe_headers(headers)
+        if used_tokens is not None:
+            self.used_tokens = used_tokens
+
+    def observe_response(self, raw: Any) -> Any:
+        """
+        Unwraps an SDK response: raw responses (openai with_raw_response) give their headers
+        and are parsed; token usage is read from openai usage or Gemini usage_metadata.
+        """
+        response = raw
+        if hasattr(raw, "headers") and hasattr(raw, "parse"):
+            self.observe(headers=raw.headers)
+            response = raw.parse()
+        usage = getattr(response, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None) is not None:
+            self.observe(used_tokens=usage.total_tokens)
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is not None and getattr(metadata, "total_token_count", None) is not None:
+            self.observe(used_tokens=metadata.total_token_count)
+        return response
+
+
+class RateLimitController:
+    """
+    Client-side rate limiting and adaptive concurrency for one provider (shared by every
+    generator and SmartLocator talking to it, in all threads and event loops).
+
+    - Requests per minute and tokens per minute are token buckets, kept in line with the
+      x-ratelimit-* response headers.
+    - In-flight calls are capped by an AIMD limit: +1 per window of successful calls while
+      latency stays near its floor, x0.9 when latency climbs, halved on 429 / overload.
+    - Throttled and transient failures are retried with full-jitter exponential backoff
+      (at least the server's retry-after); a 429 also pauses new admissions for everyone.
+
+    Args:
+        provider: Name used in stats and logs.
+        rpm: Requests per minute (None: learned from headers, else unlimited).
+        tpm: Tokens per minute (None: learned from headers, else unlimited).
+        max_concurrency: Upper bound of the adaptive in-flight limit.
+        initial_concurrency: Starting in-flight limit.
+        min_concurrency: Lower bound of the adaptive in-flight limit.
+        max_retries: Retries of throttled / transient failures per call.
+        base_backoff: First backoff ceiling in seconds (doubled per attempt).
+        max_backoff: Backoff ceiling in seconds.
+        latency_tolerance: Latency above floor * tolerance counts as congestion.
+        enabled: If False, calls pass straight through (stats are still kept).
+
+    Attributes:
+        limit (float): Current in-flight limit.
+        stats (dict): calls, succeeded, throttled, retries, errors, queued_s, decreases.
+    """
+    POLL_INTERVAL = 0.02
+
+    def __init__(self, provider: str, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_concurrency: int = 16, initial_concurrency: int = 4, min_concurrency: int = 1,
+                 max_retries: int = 3, base_backoff: float = 1.0, max_backoff: float = 30.0,
+                 latency_tolerance: float = 2.0, enabled: bool = True):
+        self.provider = provider
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.latency_tolerance = latency_tolerance
+        self.enabled = enabled
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.latency_floor: Optional[float] = None
+        self.headers: Dict[str, Any] = {}
+        self.stats = {"calls": 0, "succeeded": 0, "throttled": 0, "retries": 0, "errors": 0,
+                      "queued_s": 0.0, "decreases": 0}
+        self._last_decrease = 0.0
+        self._throttle_streak = 0
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    # --- admission -----------------------------------------------------------------
+
+    def _admit(self, tokens: int) -> Tuple[bool, float]:
+        """(admitted, seconds to wait): the wait is the budget debt if admitted, else when to try again."""
+        with self._lock:
+            now = time.monotonic()
+            if not self.enabled:
+                self.in_flight += 1
+                return True, 0.0
+            if now < self.cooldown_until:
+                return False, self.cooldown_until - now
+            if self.in_flight >= int(self.limit):
+                return False, self.POLL_INTERVAL
+            self.in_flight += 1
+            return True, max(self.requests.reserve(1, now), self.tokens.reserve(tokens, now))
+
+    def _abandon(self, tokens: int):
+        """Undoes an admission that never turned into a call."""
+        with self._lock:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if self.enabled:
+                self.requests.refund(1, now)
+                self.tokens.refund(tokens, now)
+
+    def _permit(self, tokens: int, queued_s: float, latency_signal: bool) -> Permit:
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["queued_s"] = round(self.stats["queued_s"] + queued_s, 3)
+        if queued_s > 0.001:
+            get_tracer().record("rate_limit.wait", queued_s * 1000, provider=self.provider)
+        return Permit(self, tokens, queued_s, latency_signal)
+
+    async def _aacquire(self, tokens: int, latency_signal: bool) -> Permit:
+        start = time.monotonic()
+        while True:
+            admitted, wait = self._admit(tokens)
+            if admitted:
+                break
+            await asyncio.sleep(wait)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                # Cancelled while paying off the budget debt: give the slot and the budget back
+                self._abandon(tokens)
+                raise
+        return self._permit(tokens, time.monotonic() - start, latency_signal)
+
+    def _acquire(self, tokens: int, latency_signal: bool) -> Permit:
+        start = time.monotonic()
+        while True:
+            admitted, wait = self._admit(tokens)
+            if admitted:
+                break
+            time.sleep(wait)
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            except BaseException:
+                self._abandon(tokens)
+                raise
+        return self._permit(tokens, time.monotonic() - start, latency_signal)
+
+    # --- feedback ------------------------------------------------------------------
+
+    def observe_headers(self, headers: Mapping[str, str]):
+        def number(name: str) -> Optional[float]:
+            value = headers.get(name)
+            try:
+                return float(value) if value is not None else None
+            except ValueError:
+                return None
+
+        seen = {
+            "limit_requests": number("x-ratelimit-limit-requests"),
+            "remaining_requests": number("x-ratelimit-remaining-requests"),
+            "reset_requests_s": parse_duration(headers.get("x-ratelimit-reset-requests")),
+            "limit_tokens": number("x-ratelimit-limit-tokens"),
+            "remaining_tokens": number("x-ratelimit-remaining-tokens"),
+            "reset_tokens_s": parse_duration(headers.get("x-ratelimit-reset-tokens")),
+        }
+        seen = {key: value for key, value in seen.items() if value is not None}
+        if not seen:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.headers.update(seen)
+            self.requests.sync(seen.get("limit_requests"), seen.get("remaining_requests"), now)
+            self.tokens.sync(seen.get("limit_tokens"), seen.get("remaining_tokens"), now)
+
+    def _release(self, permit: Permit, error: Optional[BaseException]):
+        with self._lock:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if permit.used_tokens is not None:
+                self.tokens.refund(permit.tokens - permit.used_tokens, now)
+            if error is None:
+                self.stats["succeeded"] += 1
+                self._throttle_streak = 0
+                if permit.latency_signal:
+                    self._on_latency(now - permit.started_at, now)
+            elif isinstance(error, Exception) and error_status(error) in THROTTLE_STATUSES:
+                self.stats["throttled"] += 1
+                self._on_throttled(permit, error, now)
+            elif isinstance(error, Exception):
+                # Cancellations (hedge losers, closed streams) are neither success nor failure
+                self.stats["errors"] += 1
+
+    def _decrease(self, factor: float, permit_started: float, now: float) -> bool:
+        # Calls that started before the last decrease were sent at the old limit: one decrease per window
+        if permit_started < self._last_decrease:
+            return False
+        self.limit = max(float(self.min_concurrency), self.limit * factor)
+        self._last_decrease = now
+        self.stats["decreases"] += 1
+        return True
+
+    def _on_latency(self, latency: float, now: float):
+        self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+        # The floor creeps up slowly so it follows lasting changes (e.g. longer prompts)
+        self.latency_floor = (self.latency_ewma if self.latency_floor is None
+                              else min(self.latency_floor * 1.01, self.latency_ewma))
+        if self.latency_ewma > self.latency_floor * self.latency_tolerance:
+            self._decrease(0.9, now - latency, now)
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+
+    def _on_throttled(self, permit: Permit, error: Exception, now: float):
+        self._decrease(0.5, permit.started_at, now)
+        self._throttle_streak += 1
+        pause = max(retry_after(error_headers(error)) or 0.0, self.backoff(self._throttle_streak - 1))
+        self.cooldown_until = max(self.cooldown_until, now + pause)
+
+    def backoff(self, attempt: int, floor: Optional[float] = None) -> float:
+        """Full-jitter exponential backoff, never shorter than the server's retry-after."""
+        ceiling = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return max(floor or 0.0, self._random.uniform(0, ceiling))
+
+    def retryable(self, e: BaseException) -> bool:
+        return isinstance(e, Exception) and (error_status(e) in THROTTLE_STATUSES + RETRY_STATUSES or is_transient(e))
+
+    # --- call sites ----------------------------------------------------------------
+
+    @asynccontextmanager
+    async def aslot(self, tokens: int = 0, latency_signal: bool = True):
+        """
+        Holds one admitted call for the duration of the block (e.g. a whole stream). Use
+        latency_signal=False when the block's duration depends on the caller (streams).
+        """
+        permit = await self._aacquire(tokens, latency_signal)
+        try:
+            yield permit
+        except BaseException as e:
+            self._release(permit, e)
+            raise
+        self._release(permit, None)
+
+    @contextmanager
+    def slot(self, tokens: int = 0, latency_signal: bool = True) -> Iterator[Permit]:
+        """Blocking variant of aslot() for sync call sites."""
+        permit = self._acquire(tokens, latency_signal)
+        try:
+            yield permit
+        except BaseException as e:
+            self._release(permit, e)
+            raise
+        self._release(permit, None)
+
+    def _log_retry(self, e: Exception, attempt: int, delay: float):
+        with self._lock:
+            self.stats["retries"] += 1
+        print(f"[RateLimit] {self.provider}: {type(e).__name__} (status {error_status(e)}), "
+              f"retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], tokens: int = 0) -> Any:
+        """
+        Runs fn() under admission control, retrying throttled / transient failures with
+        backoff. fn may return a raw response (with_raw_response) to feed its headers back.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.aslot(tokens) as permit:
+                    return permit.observe_response(await fn())
+            except Exception as e:
+                if attempt >= self.max_retries or not self.retryable(e):
+                    raise
+                delay = self.backoff(attempt, retry_after(error_headers(e)))
+                self._log_retry(e, attempt, delay)
+                await asyncio.sleep(delay)
+
+    def call(self, fn: Callable[[], Any], tokens: int = 0) -> Any:
+        """Blocking variant of acall()."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.slot(tokens) as permit:
+                    return permit.observe_response(fn())
+            except Exception as e:
+                if attempt >= self.max_retries or not self.retryable(e):
+                    raise
+                delay = self.backoff(attempt, retry_after(error_headers(e)))
+                self._log_retry(e, attempt, delay)
+                time.sleep(delay)
+
+    # --- monitoring ----------------------------------------------------------------
+
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "provider": self.provider,
+                "enabled": self.enabled,
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "cooldown_s": round(max(0.0, self.cooldown_until - now), 3),
+                "rpm": self.requests.per_minute,
+                "rpm_available": round(self.requests.available, 1) if self.requests.limited else None,
+                "tpm": self.tokens.per_minute,
+                "tpm_available": round(self.tokens.available, 1) if self.tokens.limited else None,
+                "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+                "latency_floor_ms": round(self.latency_floor * 1000, 1) if self.latency_floor is not None else None,
+                "headers": dict(self.headers),
+                "stats": dict(self.stats),
+            }
+
+
+_controllers: Dict[str, RateLimitController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str) -> RateLimitController:
+    """
+    The process-wide controller of a provider, configured from the environment on first use:
+    <PROVIDER>_RPM, <PROVIDER>_TPM, <PROVIDER>_MAX_CONCURRENCY, <PROVIDER>_INITIAL_CONCURRENCY
+    (e.g. DEEPSEEK_RPM=500), LLM_MAX_RETRIES, and LLM_RATE_LIMIT=0 to disable limiting.
+    """
+    with _controllers_lock:
+        controller = _controllers.get(provider)
+        if controller is None:
+            prefix = provider.upper()
+            controller = RateLimitController(
+                provider,
+                rpm=_env_float(f"{prefix}_RPM", None),
+                tpm=_env_float(f"{prefix}_TPM", None),
+                max_concurrency=int(_env_float(f"{prefix}_MAX_CONCURRENCY", 16)),
+                initial_concurrency=int(_env_float(f"{prefix}_INITIAL_CONCURRENCY", 4)),
+                max_retries=int(_env_float("LLM_MAX_RETRIES", 3)),
+                enabled=os.getenv("LLM_RATE_LIMIT", "1") != "0",
+            )
+            _controllers[provider] = controller
+        return controller
+
+
+def rate_limit_states() -> List[Dict[str, Any]]:
+    """State of every controller created in this process, for monitoring."""
+    with _controllers_lock:
+        controllers = list(_controllers.values())
+    return [controller.state() for controller in controllers]
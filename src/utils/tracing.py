@@ -0,0 +1,198 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .stats import summarize_latencies
+
+
+class Span:
+    """
+    One timed operation. Spans nest through a context variable, so a span opened
+    inside another one (also across awaits and child tasks) records it as parent.
+    """
+    def __init__(self, name: str, trace_id: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        # Root span id: concurrent operation trees get separate lanes in the Chrome trace
+        self.root_id = parent.root_id if parent else self.span_id
+        self.attributes = dict(attributes)
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_wall = time.time()
+        self._start = time.perf_counter()
+        self.duration_ms = 0.0
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self):
+        self.duration_ms = round((time.perf_counter() - self._start) * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "root_id": self.root_id,
+            "start": self.start_wall,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled, so call sites never need to check."""
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Collects spans for one process run and exports them as JSONL (one span per line,
+    written as each span ends) and as a Chrome trace-event file (on flush()).
+
+    Disabled until configure() is called with a directory.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.trace_dir: Optional[str] = None
+        self.trace_id = uuid.uuid4().hex
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._jsonl = None
+
+    def configure(self, trace_dir: str):
+        self.trace_dir = os.path.abspath(trace_dir)
+        os.makedirs(self.trace_dir, exist_ok=True)
+        self.enabled = True
+
+    @property
+    def jsonl_path(self) -> str:
+        return os.path.join(self.trace_dir, "spans.jsonl")
+
+    @property
+    def chrome_trace_path(self) -> str:
+        return os.path.join(self.trace_dir, f"trace-{time.strftime('%Y%m%d-%H%M%S')}-{self.trace_id[:8]}.json")
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Any]:
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+        span = Span(name, self.trace_id, _current_span.get(), attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "error"
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end()
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record(self, name: str, duration_ms: float, **attributes):
+        """Records an already-finished operation (timed elsewhere) as a child of the current span."""
+        if not self.enabled:
+            return
+        span = Span(name, self.trace_id, _current_span.get(), attributes)
+        span.start_wall -= duration_ms / 1000
+        span.duration_ms = round(duration_ms, 3)
+        self._finish(span)
+
+    def _finish(self, span: Span):
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str)
+        with self._lock:
+            self.spans.append(span)
+            if self._jsonl is None:
+                self._jsonl = open(self.jsonl_path, "a", encoding="utf-8")
+            self._jsonl.write(line + "\n")
+            self._jsonl.flush()
+
+    def chrome_events(self) -> List[Dict[str, Any]]:
+        """Spans as Chrome trace "complete" events (open in chrome://tracing or Perfetto)."""
+        lanes: Dict[str, int] = {}
+        events = []
+        for span in sorted(self.spans, key=lambda s: s.start_wall):
+            lane = lanes.setdefault(span.root_id, len(lanes) + 1)
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".")[0],
+                "ph": "X",
+                "ts": int(span.start_wall * 1_000_000),
+                "dur": int(span.duration_ms * 1000),
+                "pid": os.getpid(),
+                "tid": lane,
+                "args": dict(span.attributes, status=span.status, error=span.error),
+            })
+        return events
+
+    def flush(self) -> Optional[str]:
+        """Writes the Chrome trace for this run and closes the JSONL file. Returns the trace path."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self._jsonl is not None:
+                self._jsonl.close()
+                self._jsonl = None
+            if not self.spans:
+                return None
+            path = self.chrome_trace_path
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self.chrome_events(), "displayTimeUnit": "ms"}, f, ensure_ascii=False, default=str)
+        return path
+
+
+_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """The process-wide tracer."""
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """Shortcut for get_tracer().span(...)."""
+    return _tracer.span(name, **attributes)
+
+
+def load_spans(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Reads spans from JSONL files; directories and glob patterns are expanded."""
+    for pattern in paths:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*.jsonl")
+        for path in sorted(glob.glob(pattern)):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+def summarize_spans(spans: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per span name: count, errors, and latency percentiles across all runs."""
+    durations: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for record in spans:
+        durations.setdefault(record["name"], []).append(record["duration_ms"])
+        if record.get("status") == "error":
+            errors[record["name"]] = errors.get(record["name"], 0) + 1
+    return {
+        name: dict(summarize_latencies(values), errors=errors.get(name, 0))
+        for name, values in sorted(durations.items())
+    }
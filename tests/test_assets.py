@@ -0,0 +1,72 @@
+import asyncio
+import os
+import random
+
+import pytest
+
+pytest.importorskip("PIL")
+
+from PIL import Image  # noqa: E402
+
+from src.content.assets import AssetPipeline, process_image  # noqa: E402
+
+
+def noisy_image(path, size, mode="RGB"):
+    # Random pixels barely compress, so the byte limit actually bites
+    rng = random.Random(0)
+    channels = len(mode)
+    Image.frombytes(mode, size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * channels))).save(path)
+    return str(path)
+
+
+def test_resizes_into_the_bounding_box(tmp_path):
+    src = noisy_image(tmp_path / "wide.png", (400, 100), mode="RGBA")
+    out = process_image(src, str(tmp_path / "out.jpg"), 200, 200, 1_000_000)
+    with Image.open(out) as img:
+        assert img.format == "JPEG" and img.mode == "RGB"
+        assert img.size == (200, 50)
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_recompresses_under_max_bytes(tmp_path):
+    src = noisy_image(tmp_path / "noise.png", (300, 300))
+    unlimited = os.path.getsize(process_image(src, str(tmp_path / "big.jpg"), 300, 300, 10_000_000))
+    limit = unlimited * 3 // 4
+    assert os.path.getsize(process_image(src, str(tmp_path / "small.jpg"), 300, 300, limit)) <= limit
+
+
+def test_warns_when_the_lowest_quality_is_still_too_big(tmp_path, capsys):
+    src = noisy_image(tmp_path / "noise.png", (300, 300))
+    out = process_image(src, str(tmp_path / "out.jpg"), 300, 300, 1000)
+    assert os.path.getsize(out) > 1000
+    assert "lowest quality" in capsys.readouterr().out
+
+
+def test_cache_hits_and_shared_in_flight_work(tmp_path):
+    first = noisy_image(tmp_path / "a.png", (120, 80))
+    second = tmp_path / "b.png"
+    second.write_bytes(open(first, "rb").read())
+    pipeline = AssetPipeline(cache_dir=str(tmp_path / "cache"), max_workers=1)
+    try:
+        # Same content twice at once: one processing task, shared by both
+        paths = asyncio.run(pipeline.prepare([first, str(second)]))
+        assert paths[0] == paths[1]
+        assert pipeline.stats == {"processed": 1, "cache_hits": 1}
+        assert pipeline._in_flight == {}
+
+        # Later calls are served from the cache directory
+        assert asyncio.run(pipeline.prepare(first)) == [paths[0]]
+        assert pipeline.stats == {"processed": 1, "cache_hits": 2}
+    finally:
+        pipeline.close()
+
+
+def test_limits_are_part_of_the_cache_key(tmp_path):
+    src = noisy_image(tmp_path / "a.png", (120, 80))
+    small = AssetPipeline(cache_dir=str(tmp_path / "cache"), max_width=60, max_workers=1)
+    large = AssetPipeline(cache_dir=str(tmp_path / "cache"), max_width=100, max_workers=1)
+    try:
+        assert asyncio.run(small.prepare(src)) != asyncio.run(large.prepare(src))
+    finally:
+        small.close()
+        large.close()
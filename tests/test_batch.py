@@ -0,0 +1,92 @@
+import asyncio
+import io
+import json
+import os
+import threading
+import sqlite3
+import time
+
+from src.content.base import ContentGenerator
+from src.content.batch import BatchRunner, aread_topics, read_topics
+from src.content.dedup import NearDuplicateIndex
+
+
+class SlowGenerator(ContentGenerator):
+    def __init__(self, delay=0.02):
+        self.delay = delay
+        self.in_flight = 0
+        self.peak = 0
+
+    def generate(self, topic):
+        raise NotImplementedError
+
+    async def agenerate(self, topic):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return {"title": topic, "content": "x"}
+
+
+def records(output):
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_read_topics_skips_blanks_and_comments():
+    assert list(read_topics(["a\n", "\n", "# note\n", "  b  \n"])) == ["a", "b"]
+
+
+def test_bounded_concurrency_and_summary():
+    generator = SlowGenerator()
+    output = io.StringIO()
+    summary = asyncio.run(BatchRunner(generator, concurrency=3).run([f"t{i}" for i in range(10)], output))
+    assert generator.peak == 3
+    assert summary["items"] == 10 and summary["errors"] == 0
+    assert sorted(record["index"] for record in records(output)) == list(range(10))
+
+
+def test_piped_topics_do_not_block_generations():
+    read_fd, write_fd = os.pipe()
+    source = os.fdopen(read_fd, "r")
+    written_at = {}
+
+    def writer():
+        with os.fdopen(write_fd, "w") as pipe:
+            pipe.write("first\n")
+            pipe.flush()
+            # The next line arrives long after the first generation could have finished
+            time.sleep(0.5)
+            written_at["second"] = time.perf_counter()
+            pipe.write("second\n")
+
+    threading.Thread(target=writer, daemon=True).start()
+
+    class Recording(io.StringIO):
+        finished = {}
+
+        def write(self, text):
+            self.finished[json.loads(text)["topic"]] = time.perf_counter()
+            return super().write(text)
+
+    output = Recording()
+    asyncio.run(BatchRunner(SlowGenerator(), concurrency=2).run(aread_topics(source), output))
+    source.close()
+    assert output.finished["first"] < written_at["second"]
+    assert [record["topic"] for record in records(output)] == ["first", "second"]
+
+
+def test_failed_index_write_does_not_strand_waiting_duplicates(tmp_path):
+    class BrokenIndex(NearDuplicateIndex):
+        def set_result(self, entry_id, result):
+            raise sqlite3.OperationalError("database is locked")
+
+    index = BrokenIndex(str(tmp_path / "dedup.sqlite3"))
+    output = io.StringIO()
+    runner = BatchRunner(SlowGenerator(), concurrency=2, dedup=index)
+    topics = ["weekend hiking trip ideas", "weekend hiking trip ideas!"]
+    summary = asyncio.run(asyncio.wait_for(runner.run(topics, output), timeout=2))
+    index.close()
+    by_topic = {record["topic"]: record for record in records(output)}
+    assert "database is locked" in by_topic[topics[0]]["error"]
+    assert by_topic[topics[1]]["duplicate_of"]["topic"] == topics[0]
+    assert summary["items"] == 2 and runner._pending == {}
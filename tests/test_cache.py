@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from src.content.base import error_result
+from src.content.cache import CachedGenerator, ResponseCache
+from src.content.mock import MockGenerator
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    yield cache
+    cache.close()
+
+
+class CountingGenerator(MockGenerator):
+    def __init__(self, fail=False):
+        self.calls = 0
+        self.fail = fail
+
+    def generate(self, topic):
+        self.calls += 1
+        if self.fail:
+            return error_result(topic, RuntimeError("down"))
+        return super().generate(topic)
+
+
+def test_key_is_canonical():
+    assert ResponseCache.make_key({"a": 1, "b": [1, 2]}) == ResponseCache.make_key({"b": [1, 2], "a": 1})
+    assert ResponseCache.make_key({"a": 1}) != ResponseCache.make_key({"a": 2})
+
+
+def test_ttl_expiry(cache):
+    cache.put("k", {"title": "t"})
+    assert cache.get("k") == {"title": "t"}
+    cache._conn.execute("UPDATE responses SET created_at = created_at - ?", (cache.ttl + 1,))
+    assert cache.get("k") is None
+    assert cache.stats["expired"] == 1
+
+
+def test_lru_eviction(cache):
+    cache.put("old", {"n": 1})
+    cache.put("recent", {"n": 2})
+    cache._conn.execute("UPDATE responses SET last_access = 0 WHERE key = 'old'")
+    cache.put("new", {"n": 3})
+    assert cache.get("old") is None
+    assert cache.get("recent") == {"n": 2} and cache.get("new") == {"n": 3}
+    assert cache.stats["evictions"] == 1
+
+
+def test_cached_generator_serves_repeats_and_skips_placeholders(cache):
+    inner = CountingGenerator()
+    generator = CachedGenerator(inner, cache)
+    first = asyncio.run(generator.agenerate("topic"))
+    assert asyncio.run(generator.agenerate("topic")) == first
+    assert generator.generate("topic") == first
+    assert inner.calls == 1
+
+    failing = CountingGenerator(fail=True)
+    generator = CachedGenerator(failing, cache)
+    generator.generate("other")
+    generator.generate("other")
+    assert failing.calls == 2
+
+
+def test_bypass_refreshes(cache):
+    inner = CountingGenerator()
+    CachedGenerator(inner, cache).generate("topic")
+    CachedGenerator(inner, cache, bypass=True).generate("topic")
+    assert inner.calls == 2
+
+
+def test_streams_are_cached_but_retries_are_not(cache):
+    inner = CountingGenerator()
+    generator = CachedGenerator(inner, cache)
+
+    async def stream(feedback=None):
+        return "".join([chunk async for chunk in generator.astream("topic", feedback)])
+
+    text = asyncio.run(stream())
+    assert asyncio.run(stream()) == text
+    assert inner.calls == 1
+    asyncio.run(stream(feedback="fix the title"))
+    assert inner.calls == 2
@@ -0,0 +1,68 @@
+import pytest
+
+from src.content.base import error_result
+from src.content.dedup import NearDuplicateIndex, shingles
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / "dedup.sqlite3"))
+    yield index
+    index.close()
+
+
+def post(title, content="正文"):
+    return {"title": title, "content": content}
+
+
+def test_shingles_ignore_case_punctuation_and_emoji():
+    assert sorted(shingles("AB, c!🔥")) == ["ab", "bc"]
+    assert shingles("a") == ["a"]
+    assert shingles("   ") == []
+
+
+def test_finds_near_duplicate_topics(index):
+    index.add("如何在家做拿铁咖啡", post("拿铁"))
+    match = index.find_topic("如何在家做拿铁咖啡！")
+    assert match is not None and match["topic"] == "如何在家做拿铁咖啡"
+    assert match["result"] == post("拿铁")
+    assert index.find_topic("周末去哪里爬山") is None
+
+
+def test_symbol_only_texts_do_not_match_each_other(index):
+    index.add("🔥🔥🔥", post("fire"))
+    index.add("   ", post("blank"))
+    assert index.find_topic("???") is None
+    assert index.find_topic("\t") is None
+    assert index.find_topic("🔥🔥🔥")["topic"] == "🔥🔥🔥"
+
+
+def test_content_match_excludes_own_entry(index):
+    entry = index.add("topic one", post("同一个标题", "完全相同的正文内容，很长很长"))
+    assert index.find_content(post("同一个标题", "完全相同的正文内容，很长很长"), exclude=entry) is None
+    assert index.find_content(post("同一个标题", "完全相同的正文内容，很长很长"))["id"] == entry
+
+
+def test_pending_entry_and_error_results(index):
+    entry = index.add("pending topic")
+    assert index.find_topic("pending topic")["result"] is None
+    # An error placeholder drops the entry, so the topic is generated again later
+    index.set_result(entry, error_result("pending topic", RuntimeError("boom")))
+    assert index.find_topic("pending topic") is None
+    assert len(index) == 0
+
+
+def test_remove_and_reopen(tmp_path):
+    path = str(tmp_path / "dedup.sqlite3")
+    index = NearDuplicateIndex(path)
+    kept = index.add("kept topic", post("kept"))
+    removed = index.add("removed topic", post("removed"))
+    index.remove(removed)
+    index.close()
+
+    reopened = NearDuplicateIndex(path)
+    assert reopened.find_topic("kept topic")["id"] == kept
+    assert reopened.find_topic("removed topic") is None
+    reopened.close()
+    with pytest.raises(ValueError):
+        NearDuplicateIndex(path, num_perm=32, bands=8)
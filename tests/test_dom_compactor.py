@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("playwright")
+
+from src.browser.dom_compactor import DomCompactor, estimate_tokens  # noqa: E402
+
+
+def node(selector, tag="div", **fields):
+    return dict({"tag": tag, "type": "", "role": "", "text": "", "label": "", "placeholder": "",
+                 "disabled": False, "selector": selector}, **fields)
+
+
+def test_keeps_relevant_nodes_in_document_order():
+    nodes = [
+        node("#nav", tag="a", text="Home"),
+        node("#title", tag="input", placeholder="Enter a title"),
+        node("#publish", tag="button", text="Publish"),
+    ]
+    dom = DomCompactor().compact_nodes(nodes, "the 'Publish' button")
+    assert dom.total_nodes == 3
+    assert [dom.selectors[line.split("]")[0][1:]] for line in dom.lines] == ["#nav", "#title", "#publish"]
+    assert dom.selector_for(f"[{DomCompactor.node_id('#publish')}]") == "#publish"
+
+
+def test_budget_drops_the_least_relevant_nodes():
+    nodes = [node(f"#filler{i}", text=f"unrelated filler text number {i}") for i in range(50)]
+    nodes.insert(25, node("#publish", tag="button", text="Publish"))
+    line_cost = estimate_tokens(DomCompactor.format_node("e000000", nodes[0]))
+    dom = DomCompactor(token_budget=line_cost * 3).compact_nodes(nodes, "the 'Publish' button")
+    assert len(dom.lines) <= 3
+    assert "#publish" in dom.selectors.values()
+
+
+def test_duplicate_selectors_are_listed_once():
+    nodes = [node("#publish", tag="button", text="Publish"), node("#publish", tag="button", text="Publish")]
+    dom = DomCompactor().compact_nodes(nodes, "publish")
+    assert dom.total_nodes == 1 and len(dom.lines) == 1
+
+
+def test_node_ids_are_stable():
+    assert DomCompactor.node_id("#publish") == DomCompactor.node_id("#publish")
+    assert DomCompactor.node_id("#publish") != DomCompactor.node_id("#title")
+
+
+def test_colliding_ids_keep_both_nodes():
+    seen = {}
+    for i in range(100000):
+        selector = f"#node{i}"
+        node_id = DomCompactor.node_id(selector)
+        if node_id in seen:
+            first, second = seen[node_id], selector
+            break
+        seen[node_id] = selector
+    dom = DomCompactor().compact_nodes([node(first, text="a"), node(second, text="b")], "anything")
+    assert dom.total_nodes == 2
+    assert sorted(dom.selectors.values()) == sorted([first, second])
+    assert all(dom.selector_for(line.split("]")[0][1:]) for line in dom.lines)
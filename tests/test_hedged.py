@@ -0,0 +1,124 @@
+import asyncio
+import json
+
+from src.content.base import ContentGenerator, is_error_result
+from src.content.hedged import HedgedGenerator
+from src.content.streaming import stream_generate
+
+
+class Provider(ContentGenerator):
+    """Answers after `delay` seconds, with `result` or by raising `error`."""
+    def __init__(self, name, delay=0.0, result=None, error=None):
+        self.name = name
+        self.delay = delay
+        self.result = result or {"title": name, "content": f"from {name}"}
+        self.error = error
+        self.calls = 0
+        self.cancelled = 0
+        self.stream_timings = []
+
+    def cache_key_parts(self, topic):
+        return {"provider": self.name, "model": None, "prompt": topic, "params": {}}
+
+    def generate(self, topic):
+        raise NotImplementedError
+
+    async def agenerate(self, topic):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        return self.result
+
+    async def astream(self, topic, feedback=None):
+        # Per call: (seconds to the first chunk, seconds between the chunks)
+        first, rest = self.stream_timings.pop(0)
+        await asyncio.sleep(first)
+        yield '{"title": "%s", ' % topic
+        await asyncio.sleep(rest)
+        yield '"content": "x"}'
+
+    def parse_output(self, topic, text):
+        return dict(json.loads(text), parsed_by=self.name)
+
+
+def test_fast_primary_never_hedges():
+    primary, backup = Provider("a"), Provider("b")
+    hedged = HedgedGenerator([primary, backup], hedge_delay=0.5)
+    assert asyncio.run(hedged.agenerate("t"))["title"] == "a"
+    assert backup.calls == 0 and hedged.stats["hedges"] == 0
+
+
+def test_slow_primary_is_hedged_and_cancelled():
+    primary, backup = Provider("a", delay=1.0), Provider("b")
+    hedged = HedgedGenerator([primary, backup], hedge_delay=0.05)
+    assert asyncio.run(hedged.agenerate("t"))["title"] == "b"
+    assert hedged.stats["hedges"] == 1 and hedged.stats["wins"]["b"] == 1
+    assert primary.cancelled == 1
+
+
+def test_fails_over_on_errors_and_invalid_results():
+    broken = Provider("a", error=RuntimeError("down"))
+    overlong = Provider("b", result={"title": "x" * 30, "content": "c"})
+    good = Provider("c")
+    hedged = HedgedGenerator([broken, overlong, good], hedge_delay=None)
+    assert asyncio.run(hedged.agenerate("t"))["title"] == "c"
+    assert hedged.stats["failovers"] == 2
+    assert hedged.stats["failures"] == {"a": 1, "b": 1, "c": 0}
+
+
+def test_all_failed_returns_placeholder():
+    hedged = HedgedGenerator([Provider("a", error=RuntimeError("down"))], hedge_delay=None)
+    assert is_error_result(asyncio.run(hedged.agenerate("t")))
+    assert hedged.stats["all_failed"] == 1
+
+
+def test_concurrent_streams_of_one_topic_use_their_own_winner():
+    primary, backup = Provider("a"), Provider("b")
+    hedged = HedgedGenerator([primary, backup], hedge_delay=0.05)
+    # First stream: the primary is slow, so the backup wins and streams for a while.
+    # Second stream, started meanwhile: the primary wins at once and finishes first.
+    primary.stream_timings = [(1.0, 0.0), (0.0, 0.0)]
+    backup.stream_timings = [(0.0, 0.3)]
+
+    async def scenario():
+        first = asyncio.create_task(stream_generate(hedged, "same"))
+        await asyncio.sleep(0.1)
+        second = asyncio.create_task(stream_generate(hedged, "same"))
+        return await asyncio.gather(first, second)
+
+    (first, _), (second, _) = asyncio.run(scenario())
+    assert first["parsed_by"] == "b"
+    assert second["parsed_by"] == "a"
+
+
+def test_abandoned_stream_leaves_no_winner_behind():
+    primary, backup = Provider("a"), Provider("b")
+    hedged = HedgedGenerator([primary, backup], hedge_delay=0)
+    primary.stream_timings = [(0.2, 0.0)]
+    backup.stream_timings = [(0.0, 0.0)]
+
+    async def abandon():
+        stream = hedged.astream("topic")
+        await stream.__anext__()
+        await stream.aclose()
+
+    async def scenario():
+        await asyncio.create_task(abandon())
+        # The abandoned stream's winner went away with its task: the primary's parser is used
+        return hedged.parse_output("topic", '{"title": "t", "content": "c"}')
+
+    assert asyncio.run(scenario())["parsed_by"] == "a"
+
+
+def test_mock_provider_can_win_a_hedge():
+    from src.content.hedged import create_hedged
+
+    hedged = create_hedged(["mock", "mock"], hedge_delay=None)
+    result = asyncio.run(hedged.agenerate("a rather long topic about weekend trips"))
+    assert not is_error_result(result)
+    assert sum(hedged.stats["wins"].values()) == 1
@@ -0,0 +1,37 @@
+import asyncio
+import gc
+
+import pytest
+
+pytest.importorskip("httpx")
+pytest.importorskip("openai")
+
+from src.utils import http_clients  # noqa: E402
+
+
+def test_clients_are_shared_per_loop_and_dropped_with_it():
+    async def get_twice():
+        first = http_clients.get_async_openai_client("http://localhost:1", "sk-test")
+        second = http_clients.get_async_openai_client("http://localhost:1", "sk-test")
+        return first, second
+
+    loop = asyncio.new_event_loop()
+    first, second = loop.run_until_complete(get_twice())
+    assert first is second
+    loop.close()
+    del loop
+    gc.collect()
+    # A later loop, even one reusing the old loop's id, never gets the old client
+    assert len(http_clients._async_clients) == 0
+    other, _ = asyncio.run(get_twice())
+    assert other is not first
+
+
+def test_aclose_all_closes_only_the_running_loops_clients():
+    async def open_and_close():
+        http_clients.get_async_openai_client("http://localhost:1", "sk-test")
+        assert asyncio.get_running_loop() in http_clients._async_clients
+        await http_clients.aclose_all()
+        return asyncio.get_running_loop() in http_clients._async_clients
+
+    assert asyncio.run(open_and_close()) is False
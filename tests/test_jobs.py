@@ -0,0 +1,92 @@
+import time
+
+import pytest
+
+from src.pipeline.jobs import DONE, FAILED, GENERATED, QUEUED, RUNNING, JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    yield store
+    store.close()
+
+
+def expire_leases(store):
+    store._conn.execute("UPDATE jobs SET lease_expires = ? WHERE state = ?", (time.time() - 1, RUNNING))
+
+
+def test_claim_takes_due_jobs_in_order(store, tmp_path):
+    later = store.add("later", profile=str(tmp_path / "a"), run_at=time.time() + 3600)
+    first = store.add("first", profile=str(tmp_path / "a"))
+    second = store.add("second", profile=str(tmp_path / "b"))
+
+    assert store.claim("owner").id == first
+    assert store.claim("owner").id == second
+    assert store.claim("owner") is None
+    assert store.get(later).state == QUEUED
+
+
+def test_per_profile_cap(store, tmp_path):
+    profile = str(tmp_path / "profile")
+    store.add_many([{"topic": f"t{i}", "profile": profile} for i in range(3)])
+
+    assert store.claim("owner", per_profile=2) is not None
+    assert store.claim("owner", per_profile=2) is not None
+    assert store.claim("owner", per_profile=2) is None
+    assert store.claim("owner", per_profile=3) is not None
+
+
+def test_expired_lease_resumes_at_last_stage(store):
+    job_id = store.add("topic")
+    job = store.claim("crashed")
+    assert store.record_generation(job_id, "crashed", {"title": "t", "content": "c"})
+    expire_leases(store)
+
+    resumed = store.claim("other")
+    assert resumed.id == job.id and resumed.stage == GENERATED
+    assert resumed.result == {"title": "t", "content": "c"}
+    assert resumed.attempts == 2
+
+
+def test_expired_lease_without_attempts_left_fails(store):
+    job_id = store.add("topic", max_attempts=2)
+    for _ in range(2):
+        assert store.claim("hung") is not None
+        expire_leases(store)
+
+    assert store.claim("hung") is None
+    job = store.get(job_id)
+    assert job.state == FAILED and job.attempts == 2
+    assert "lease expired" in job.error
+
+
+def test_fail_backs_off_then_gives_up(store):
+    job_id = store.add("topic", max_attempts=2)
+    store.claim("owner")
+    before = time.time()
+    assert store.fail(job_id, "owner", "boom", retry_delay=60) == QUEUED
+    assert store.get(job_id).run_at >= before + 60
+    assert store.claim("owner") is None
+
+    store._conn.execute("UPDATE jobs SET run_at = 0 WHERE id = ?", (job_id,))
+    store.claim("owner")
+    assert store.fail(job_id, "owner", "boom again", retry_delay=60) == FAILED
+    assert store.get(job_id).error == "boom again"
+
+
+def test_stale_owner_cannot_overwrite_new_owner(store):
+    job_id = store.add("topic")
+    store.claim("stale")
+    expire_leases(store)
+    store.claim("current")
+
+    assert not store.heartbeat(job_id, "stale")
+    assert not store.record_generation(job_id, "stale", {"title": "t", "content": "c"})
+    assert not store.complete(job_id, "stale")
+    assert store.fail(job_id, "stale", "late error") is None
+    job = store.get(job_id)
+    assert job.state == RUNNING and job.lease_owner == "current" and job.stage is None
+
+    assert store.complete(job_id, "current")
+    assert store.get(job_id).state == DONE
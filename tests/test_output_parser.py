@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from src.content.base import error_result, result_problems
+from src.content.output_parser import (POST_SCHEMA, IncrementalPostParser, MalformedOutput, parse_post,
+                                       retry_instruction)
+
+
+def feed_in_chunks(text, size=3):
+    parser = IncrementalPostParser()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+        if parser.done:
+            break
+    return parser
+
+
+def test_skips_preamble_and_trailing_text():
+    text = 'Sure! ```json\n{"title": "早安", "content": "正文\\n第二行", "tags": ["a", 1, true]}\n``` hope it helps'
+    parser = feed_in_chunks(text)
+    assert parser.done
+    assert parser.result == {"title": "早安", "content": "正文\n第二行", "tags": ["a", 1, True]}
+    assert parse_post(text) == parser.result
+
+
+def test_overlong_title_aborts_mid_stream():
+    text = json.dumps({"title": "a" * 25, "content": "x"})
+    with pytest.raises(MalformedOutput) as info:
+        feed_in_chunks(text)
+    assert info.value.field == "title"
+    # Stopped at the 21st title character, long before the end of the output
+    assert info.value.position < text.index("content")
+
+
+@pytest.mark.parametrize("ensure_ascii", [True, False])
+def test_emoji_count_as_one_character_escaped_or_not(ensure_ascii):
+    title = "\U0001F600\U0001F600" + "a" * 17
+    text = json.dumps({"title": title, "content": "x"}, ensure_ascii=ensure_ascii)
+    assert POST_SCHEMA.validate(json.loads(text)) == []
+    assert feed_in_chunks(text).result["title"] == title
+
+    too_long = json.dumps({"title": title + "ab", "content": "x"}, ensure_ascii=ensure_ascii)
+    with pytest.raises(MalformedOutput):
+        feed_in_chunks(too_long)
+
+
+def test_non_string_title_fails_at_once():
+    with pytest.raises(MalformedOutput) as info:
+        IncrementalPostParser().feed('{"title": 123')
+    assert info.value.field == "title"
+
+
+@pytest.mark.parametrize("text", [
+    '{"title": "t" "content": "c"}',
+    '{"title": "t", "content": tru}',
+    '{"title": "t", "content": "c\\x"}',
+])
+def test_syntax_errors(text):
+    with pytest.raises(MalformedOutput):
+        parse_post(text)
+
+
+def test_incomplete_and_missing_output():
+    with pytest.raises(MalformedOutput, match="ended before"):
+        parse_post('{"title": "t", "content": "c"')
+    with pytest.raises(MalformedOutput, match="no JSON object"):
+        parse_post("I can't help with that.")
+    with pytest.raises(MalformedOutput, match="'content' is missing"):
+        parse_post('{"title": "t"}')
+
+
+def test_retry_instruction_names_the_problem():
+    error = MalformedOutput("the title is longer than 20 characters", "title")
+    assert "longer than 20" in retry_instruction(error)
+
+
+def test_result_problems_uses_the_schema():
+    assert result_problems({"title": "t", "content": "c"}) == []
+    assert result_problems({"title": "a" * 21, "content": "c"}) == ["the title is longer than 20 characters"]
+    assert result_problems(["not", "a", "dict"]) == ["the output is not a JSON object"]
+    assert result_problems(error_result("topic", RuntimeError("boom"))) == ["provider returned the error placeholder"]
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from src.content.batch import aread_topics
+from src.pipeline.executor import PipelineExecutor, Stage
+
+
+def test_items_flow_through_all_stages():
+    async def double(data):
+        return dict(data, value=data["value"] * 2)
+
+    async def label(data):
+        return dict(data, label=f"#{data['value']}")
+
+    done = []
+    report = asyncio.run(PipelineExecutor([Stage("double", double, concurrency=2), Stage("label", label)])
+                         .run(({"value": i} for i in range(5)), done.append))
+    assert report["items"] == 5 and report["failed"] == 0
+    assert sorted(item.data["label"] for item in done) == ["#0", "#2", "#4", "#6", "#8"]
+    assert set(report["stages"]) == {"double", "label"}
+
+
+def test_failed_item_skips_later_stages():
+    seen = []
+
+    async def check(data):
+        if data["value"] == 1:
+            raise ValueError("bad item")
+        return data
+
+    async def record(data):
+        seen.append(data["value"])
+        return data
+
+    done = []
+    report = asyncio.run(PipelineExecutor([Stage("check", check), Stage("record", record)])
+                         .run(({"value": i} for i in range(3)), done.append))
+    assert seen == [0, 2]
+    assert report["failed"] == 1 and report["stages"]["check"]["errors"] == 1
+    failed = next(item for item in done if item.error)
+    assert failed.failed_stage == "check" and failed.error == "bad item"
+
+
+def test_stages_overlap():
+    async def slow(data):
+        await asyncio.sleep(0.05)
+        return data
+
+    start = time.perf_counter()
+    asyncio.run(PipelineExecutor([Stage("a", slow), Stage("b", slow)]).run({"i": i} for i in range(4)))
+    # Serial would take 8 x 50ms; pipelined it is about (4 + 1) x 50ms
+    assert time.perf_counter() - start < 0.35
+
+
+def test_bounded_queues_apply_back_pressure():
+    fed = []
+    release = None
+
+    def inputs():
+        for i in range(20):
+            fed.append(i)
+            yield {"i": i}
+
+    async def blocked(data):
+        await release.wait()
+        return data
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        run = asyncio.create_task(PipelineExecutor([Stage("blocked", blocked, queue_size=2)]).run(inputs()))
+        await asyncio.sleep(0.05)
+        pulled = len(fed)
+        release.set()
+        await run
+        return pulled
+
+    # One item in the worker, two queued, one waiting to be put
+    assert asyncio.run(scenario()) <= 4
+
+
+def test_piped_inputs_do_not_block_running_items():
+    read_fd, write_fd = os.pipe()
+    source = os.fdopen(read_fd, "r")
+    written_at = {}
+
+    def writer():
+        with os.fdopen(write_fd, "w") as pipe:
+            pipe.write("first\n")
+            pipe.flush()
+            # The next line arrives long after the first item could have finished
+            time.sleep(0.5)
+            written_at["second"] = time.perf_counter()
+            pipe.write("second\n")
+
+    threading.Thread(target=writer, daemon=True).start()
+
+    async def inputs():
+        async for topic in aread_topics(source):
+            yield {"topic": topic}
+
+    async def work(data):
+        await asyncio.sleep(0.02)
+        return data
+
+    finished = {}
+    report = asyncio.run(PipelineExecutor([Stage("work", work)]).run(
+        inputs(), lambda item: finished.setdefault(item.data["topic"], time.perf_counter())))
+    source.close()
+    assert report["items"] == 2
+    assert finished["first"] < written_at["second"]
+
+
+def test_rejects_bad_configuration():
+    with pytest.raises(ValueError):
+        PipelineExecutor([])
+    with pytest.raises(ValueError):
+        Stage("s", None, concurrency=0)
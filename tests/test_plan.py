@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from playwright.async_api import Locator  # noqa: E402
+
+from src.browser.plan import Parallel, PlanExecutor, RoundTripCounter, Step  # noqa: E402
+from src.browser.selector_cache import SelectorCache  # noqa: E402
+from src.browser.waits import FlowTimer  # noqa: E402
+
+
+class FakeLocator(Locator):
+    def __init__(self, page, selector, matches=1):
+        self._page = page
+        self.selector = selector
+        self.matches = matches
+
+    @property
+    def first(self):
+        return FakeLocator(self._page, self.selector, min(self.matches, 1))
+
+    async def count(self):
+        return self.matches
+
+    async def is_visible(self):
+        return self.matches > 0
+
+    async def click(self):
+        self._page.clicked.append(self.selector)
+
+
+class FakePage:
+    def __init__(self, dom_results=None):
+        self.url = "https://creator.example.com/publish/publish"
+        self.dom_results = dom_results
+        self.evaluated = []
+        self.clicked = []
+        self.filled = {}
+
+    def locator(self, selector):
+        return FakeLocator(self, selector)
+
+    async def evaluate(self, script, ops=None):
+        self.evaluated.append(ops)
+        return self.dom_results or [{"ok": True} for _ in ops]
+
+    async def fill(self, selector, value):
+        self.filled[selector] = value
+
+    async def click(self, selector, timeout=None):
+        self.clicked.append(selector)
+
+
+def test_counts_page_and_locator_round_trips():
+    page = RoundTripCounter(FakePage())
+
+    async def scenario():
+        assert await SelectorCache.validate(page, "button.submit")
+        await page.locator("button.submit").first.click()
+
+    asyncio.run(scenario())
+    # count() and is_visible() during validation, then the click; locator() itself is local
+    assert page.round_trips == 3
+    assert page.url == "https://creator.example.com/publish/publish"
+
+
+def test_batchable_steps_share_one_evaluate():
+    page = FakePage()
+    timer = FlowTimer("flow")
+    executor = PlanExecutor(page, timer, {"title": "标题", "content": "正文"})
+
+    async def locate(executor):
+        return executor.page.locator("button.submit")
+
+    asyncio.run(executor.run([
+        Step("switch_tab", "click_text", 5, text="上传图文"),
+        Parallel(
+            Step("fill_title", "fill", 5, selectors=["input"], value="title"),
+            Step("fill_content", "fill", 5, selectors=[".ql-editor"], value="content"),
+            Step("locate_submit", "call", 5, func=locate),
+        ),
+    ]))
+    assert len(page.evaluated) == 2
+    assert [op["op"] for op in page.evaluated[1]] == ["fill", "fill"]
+    assert timer.round_trips == 2
+    assert executor.context["locate_submit"].selector == "button.submit"
+
+
+def test_failed_page_side_op_falls_back_to_playwright():
+    page = FakePage(dom_results=[{"ok": True}, {"ok": False, "reason": "value did not stick"}])
+    timer = FlowTimer("flow")
+    executor = PlanExecutor(page, timer, {"title": "标题", "content": "正文"})
+
+    asyncio.run(executor.run([
+        Step("fill_title", "fill", 5, selectors=["input"], value="title"),
+        Step("fill_content", "fill", 5, selectors=[".ql-editor", "textarea"], value="content"),
+    ]))
+    assert page.filled == {".ql-editor, textarea": "正文"}
+    assert timer.round_trips == 2
+
+
+def test_optional_step_failure_is_logged():
+    page = FakePage(dom_results=[{"ok": False, "reason": "no visible element"}])
+
+    async def missing(selector, timeout=None):
+        raise TimeoutError(selector)
+    page.click = missing
+    executor = PlanExecutor(page, FlowTimer("flow"))
+    asyncio.run(executor.run([Step("switch_tab", "click_text", 1, optional=True, text="上传图文")]))
+    assert executor.round_trips == 2
+
+
+def test_publish_plan_locates_submit_before_the_fills():
+    from src.browser.xhs import XHSOperator
+
+    plan = XHSOperator(page=None)._publish_plan()
+    names = [step.name if isinstance(step, Step) else [inner.name for inner in step.steps] for step in plan]
+    locate = names.index("locate_submit")
+    fills = next(position for position, name in enumerate(names) if isinstance(name, list) and "fill_title" in name)
+    # The selector cache fingerprints the DOM; the form must not be changing meanwhile
+    assert locate < fills and "locate_submit" not in names[fills]
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from src.browser.pool import BrowserPool, BrowserWorker, PublishJob  # noqa: E402
+
+
+class BrokenManager:
+    async def close(self):
+        raise RuntimeError("browser already gone")
+
+
+def test_worker_survives_a_failing_close(monkeypatch, tmp_path):
+    published = []
+
+    async def publish(self, job):
+        self.browser_manager = BrokenManager()
+        if job.title == "bad":
+            raise RuntimeError("publish failed")
+        published.append(job.title)
+
+    monkeypatch.setattr(BrowserWorker, "_publish", publish)
+    monkeypatch.setattr(BrowserWorker, "_maybe_recycle", lambda self: asyncio.sleep(0))
+    profile = str(tmp_path / "profile")
+
+    async def scenario():
+        pool = BrowserPool()
+        bad = pool.submit(PublishJob("bad", "", [], profile))
+        good = pool.submit(PublishJob("good", "", [], profile))
+        with pytest.raises(RuntimeError, match="publish failed"):
+            await asyncio.wait_for(bad, 2)
+        await asyncio.wait_for(good, 2)
+        stats = pool.stats()[profile]
+        await asyncio.wait_for(pool.shutdown(), 2)
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert published == ["good"]
+    assert stats["failures"] == 1 and stats["jobs"] == 1
@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("PIL")
+
+from src.content.dedup import NearDuplicateIndex  # noqa: E402
+from src.pipeline.publish import build_publish_pipeline  # noqa: E402
+
+
+class SlowGenerator:
+    def __init__(self):
+        self.calls = []
+
+    async def agenerate(self, topic):
+        self.calls.append(topic)
+        await asyncio.sleep(0.05)
+        return {"title": topic[:20], "content": f"关于{topic}的正文 {len(self.calls)}"}
+
+
+class Assets:
+    async def prepare(self, images):
+        return images
+
+
+class Pool:
+    def __init__(self, fail=False):
+        self.published = []
+        self.fail = fail
+
+    async def publish(self, job):
+        if self.fail:
+            raise RuntimeError("publish failed")
+        self.published.append(job.title)
+
+
+def run(pipeline, topics):
+    return asyncio.run(pipeline.run({"topic": topic, "profile": "p"} for topic in topics))
+
+
+def test_concurrent_near_duplicate_topics_publish_once(tmp_path):
+    dedup = NearDuplicateIndex(str(tmp_path / "dedup.sqlite3"))
+    generator, pool = SlowGenerator(), Pool()
+    pipeline = build_publish_pipeline(generator, pool, Assets(), images=[], generate_concurrency=2, dedup=dedup)
+
+    report = run(pipeline, ["如何在家做拿铁咖啡", "如何在家做拿铁咖啡！"])
+    assert generator.calls == ["如何在家做拿铁咖啡"]
+    assert len(pool.published) == 1 and report["failed"] == 1
+
+
+def test_failed_publish_releases_the_topic(tmp_path):
+    dedup = NearDuplicateIndex(str(tmp_path / "dedup.sqlite3"))
+    run(build_publish_pipeline(SlowGenerator(), Pool(fail=True), Assets(), images=[], dedup=dedup), ["周末去哪里爬山"])
+    assert len(dedup) == 0
+
+    pool = Pool()
+    run(build_publish_pipeline(SlowGenerator(), pool, Assets(), images=[], dedup=dedup), ["周末去哪里爬山"])
+    assert pool.published == ["周末去哪里爬山"]
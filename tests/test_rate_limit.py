@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+
+from src.utils.rate_limit import RateLimitController, TokenBucket, parse_duration, retry_after
+
+
+class Throttled(Exception):
+    status_code = 429
+
+    def __init__(self):
+        super().__init__("rate limited")
+        self.response = None
+
+
+def test_parse_duration():
+    assert parse_duration("20ms") == pytest.approx(0.02)
+    assert parse_duration("6m0s") == 360
+    assert parse_duration("1.5") == 1.5
+    assert parse_duration("soon") is None
+    assert retry_after({"retry-after-ms": "250"}) == pytest.approx(0.25)
+    assert retry_after({"retry-after": "2"}) == 2
+
+
+def test_token_bucket_debt_and_refund():
+    bucket = TokenBucket(60)
+    now = bucket._updated
+    assert bucket.reserve(60, now) == 0
+    # One more request per minute at 60 rpm is a one second debt
+    assert bucket.reserve(1, now) == pytest.approx(1.0)
+    bucket.refund(1, now)
+    assert bucket.available == pytest.approx(0.0)
+    assert bucket.reserve(1, now + 2) == 0
+
+
+def test_token_bucket_sync_learns_limit_and_never_exceeds_remaining():
+    bucket = TokenBucket(None)
+    now = bucket._updated
+    assert bucket.reserve(1000, now) == 0
+    bucket.sync(limit=100, remaining=40, now=now)
+    assert bucket.per_minute == 100 and bucket.available == 40
+    bucket.sync(limit=100, remaining=10, now=now)
+    assert bucket.available == 10
+
+
+def test_cancelled_during_budget_wait_releases_slot():
+    controller = RateLimitController("test", rpm=1, initial_concurrency=2)
+
+    async def scenario():
+        await controller.acall(_ok)
+        waiting = asyncio.ensure_future(controller.acall(_ok))
+        await asyncio.sleep(0.05)
+        assert controller.state()["in_flight"] == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+    asyncio.run(scenario())
+    state = controller.state()
+    assert state["in_flight"] == 0
+    # The cancelled call's request is refunded
+    assert state["rpm_available"] == pytest.approx(0.0, abs=0.1)
+
+
+def test_throttling_halves_limit_and_retries():
+    controller = RateLimitController("test", initial_concurrency=8, base_backoff=0.01, max_backoff=0.01)
+    attempts = []
+
+    async def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise Throttled()
+        return "ok"
+
+    assert asyncio.run(controller.acall(flaky)) == "ok"
+    # Halved to 4, then +1/limit for the successful retry
+    assert controller.limit == pytest.approx(4.25)
+    assert controller.stats["throttled"] == 1 and controller.stats["retries"] == 1
+    assert controller.in_flight == 0
+
+
+def test_concurrency_is_capped():
+    controller = RateLimitController("test", initial_concurrency=3, max_concurrency=3)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        peak = max(peak, controller.in_flight)
+        await asyncio.sleep(0.01)
+
+    async def scenario():
+        await asyncio.gather(*(controller.acall(work) for _ in range(12)))
+
+    asyncio.run(scenario())
+    assert peak <= 3
+    assert controller.stats["succeeded"] == 12
+
+
+async def _ok():
+    return "ok"
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("playwright")
+pytest.importorskip("PIL")
+
+from src.pipeline.jobs import RUNNING, JobStore  # noqa: E402
+from src.pipeline.scheduler import JobScheduler  # noqa: E402
+
+
+class SlowPool:
+    def __init__(self):
+        self.published = []
+        self.cancelled = False
+
+    async def publish(self, job):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        self.published.append(job)
+
+
+class Assets:
+    async def prepare(self, images):
+        return images
+
+
+class Generator:
+    async def agenerate(self, topic):
+        return {"title": topic, "content": "body", "tags": []}
+
+
+def test_lost_lease_stops_the_job(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.add("topic")
+    pool = SlowPool()
+    scheduler = JobScheduler(store, lambda provider: Generator(), pool, Assets(), images=[], lease_seconds=0.3)
+
+    async def scenario():
+        task = asyncio.create_task(scheduler.run(until_idle=True))
+        await asyncio.sleep(0.05)
+        # Another scheduler takes the job over, as if this one had stalled past its lease
+        store._conn.execute("UPDATE jobs SET lease_expires = 0 WHERE id = ?", (job_id,))
+        assert store.claim("other", lease_seconds=60).id == job_id
+        return await asyncio.wait_for(task, 2)
+
+    stats = asyncio.run(scenario())
+    assert pool.cancelled and not pool.published
+    assert stats["lost"] == 1 and stats["done"] == 0
+    job = store.get(job_id)
+    assert job.state == RUNNING and job.lease_owner == "other"
+    store.close()
+
+
+def test_store_lock_waits_do_not_block_the_loop(tmp_path):
+    class LockedStore(JobStore):
+        # As if another scheduler held the database lock on every poll
+        def next_due(self):
+            time.sleep(0.2)
+            return super().next_due()
+
+    class QuickPool:
+        async def publish(self, job):
+            await asyncio.sleep(0.3)
+
+    store = LockedStore(str(tmp_path / "jobs.sqlite3"))
+    store.add("topic")
+    scheduler = JobScheduler(store, lambda provider: Generator(), QuickPool(), Assets(), images=[])
+    gaps = []
+
+    async def ticker():
+        last = time.perf_counter()
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    async def scenario():
+        ticks = asyncio.create_task(ticker())
+        stats = await asyncio.wait_for(scheduler.run(until_idle=True), 5)
+        ticks.cancel()
+        return stats
+
+    assert asyncio.run(scenario())["done"] == 1
+    assert max(gaps) < 0.1
+    store.close()
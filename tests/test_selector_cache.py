@@ -0,0 +1,36 @@
+import pytest
+
+pytest.importorskip("playwright")
+
+from src.browser.selector_cache import SelectorCache  # noqa: E402
+
+
+def test_url_pattern_drops_query_and_fragment():
+    assert SelectorCache.url_pattern("https://creator.xiaohongshu.com/publish/publish?source=web#top") == \
+        "creator.xiaohongshu.com/publish/publish"
+
+
+def test_url_pattern_masks_id_segments():
+    assert SelectorCache.url_pattern("https://www.xiaohongshu.com/explore/64f1a2b3c4d5e6f7a8b9c0d1") == \
+        "www.xiaohongshu.com/explore/*"
+    assert SelectorCache.url_pattern("https://example.com/user/12345/notes") == "example.com/user/*/notes"
+    # Short hex-looking words are real path names, not ids
+    assert SelectorCache.url_pattern("https://example.com/feed/cafe") == "example.com/feed/cafe"
+
+
+def test_pages_of_the_same_kind_share_keys():
+    first = SelectorCache.make_key("publish button", "https://example.com/note/111?a=1", "fp")
+    second = SelectorCache.make_key("publish button", "https://example.com/note/222", "fp")
+    assert first == second
+    assert first != SelectorCache.make_key("publish button", "https://example.com/note/222", "other")
+
+
+def test_entries_persist(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = SelectorCache(path)
+    cache.put("key", "#publish", description="publish button", url="https://example.com/note/1")
+    reloaded = SelectorCache(path)
+    assert reloaded.get("key") == "#publish"
+    assert reloaded.entries["key"]["url_pattern"] == "example.com/note/*"
+    reloaded.invalidate("key")
+    assert SelectorCache(path).get("key") is None
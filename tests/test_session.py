@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+
+pytest.importorskip("playwright")
+
+from src.browser.session import SessionStateService  # noqa: E402
+
+
+class Response:
+    def __init__(self, status, body):
+        self.status = status
+        self.ok = 200 <= status < 300
+        self._body = body
+
+    async def json(self):
+        return self._body
+
+
+class Request:
+    def __init__(self, response):
+        self.response = response
+        self.calls = 0
+
+    async def get(self, url, timeout=None):
+        self.calls += 1
+        return self.response
+
+
+class Context:
+    def __init__(self, cookies, response=None):
+        self._cookies = cookies
+        self.request = Request(response or Response(200, {"success": True}))
+
+    async def cookies(self):
+        return self._cookies
+
+
+def session_cookie(value="abc", expires=-1):
+    return {"name": "web_session", "value": value, "domain": ".xiaohongshu.com", "expires": expires}
+
+
+def test_context_without_cookies_is_inconclusive(tmp_path):
+    logged_in = tmp_path / "a"
+    assert asyncio.run(SessionStateService(Context([session_cookie()]), str(logged_in)).check()) is True
+
+    # A fresh profile is never vouched for by another profile's login
+    fresh = Context([])
+    assert asyncio.run(SessionStateService(fresh, str(tmp_path / "b")).check()) is None
+    assert fresh.request.calls == 0
+
+
+def test_verification_is_cached_per_profile(tmp_path):
+    first = Context([session_cookie("one")])
+    second = Context([session_cookie("two")])
+    assert asyncio.run(SessionStateService(first, str(tmp_path / "a")).check()) is True
+    assert asyncio.run(SessionStateService(second, str(tmp_path / "b")).check()) is True
+
+    # Both verifications survive; neither profile overwrote the other
+    for context, profile in ((first, "a"), (second, "b")):
+        service = SessionStateService(context, str(tmp_path / profile))
+        assert asyncio.run(service.check()) is True
+        assert service.stats["cached"] == 1
+        assert context.request.calls == 1
+
+
+def test_expired_cookies_fail_without_probe(tmp_path):
+    context = Context([session_cookie(expires=time.time() - 10)])
+    assert asyncio.run(SessionStateService(context, str(tmp_path)).check()) is False
+    assert context.request.calls == 0
+
+
+def test_rejected_probe_invalidates(tmp_path):
+    context = Context([session_cookie()], Response(401, {}))
+    service = SessionStateService(context, str(tmp_path))
+    assert asyncio.run(service.check()) is False
+    assert not (tmp_path / SessionStateService.CACHE_FILE).exists()